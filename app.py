@@ -4,6 +4,7 @@ import logging
 from flask import Flask
 from flask_wtf.csrf import CSRFProtect
 from dotenv import load_dotenv
+import db
 from models import init_db
 from routes.auth import auth_bp
 from routes.main import main_bp
@@ -57,6 +58,7 @@ def create_app():
     app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10 MB
 
     csrf.init_app(app)
+    db.init_app(app)
 
     @app.before_request
     def _load_user():
@@ -106,6 +108,28 @@ def create_app():
 
     csrf.exempt(wbhook_tn)
 
+    # Cola de sincronización con Tiendanube (stock/precio fuera del request)
+    if os.getenv('TN_OUTBOX_WORKER', 'true').lower() == 'true':
+        from services.tn_outbox_service import iniciar_worker_outbox_tn
+        iniciar_worker_outbox_tn()
+
+    # Workers que aplican los webhooks de Tiendanube encolados por /webhook/tiendanube
+    workers_webhook = int(os.getenv('TN_WEBHOOK_WORKERS', '2') or '0')
+    if workers_webhook > 0:
+        from services.tn_webhook_service import iniciar_workers_webhook_tn
+        iniciar_workers_webhook_tn(workers_webhook)
+
+    # Worker de facturación electrónica (CAE en lote fuera del request)
+    if os.getenv('FACTURACION_WORKER', 'true').lower() == 'true':
+        from services.facturacion_service import iniciar_worker_facturacion
+        iniciar_worker_facturacion()
+
+    # Credenciales AFIP validadas al arrancar; el renovador mantiene vigentes
+    # los tickets WSAA (la emisión nunca firma ni hace login)
+    from services.afip_service import iniciar_renovador_wsaa, verificar_credenciales
+    if verificar_credenciales() and os.getenv('AFIP_RENOVADOR', 'true').lower() == 'true':
+        iniciar_renovador_wsaa()
+
     return app
 
 
@@ -0,0 +1,192 @@
+# benchmark.py
+# Uso: python benchmark.py [conexiones] [pdf] [dashboard] [reportes] [-n REPETICIONES]
+#
+# Micro-benchmarks sobre una base temporal con datos de prueba.
+# No toca negocio.db.
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import db
+
+
+def _preparar_db(n_productos=2000, n_ventas=5000):
+    """Crea una base temporal con el esquema completo y datos sintéticos."""
+    from models import init_db
+
+    tmp_dir = tempfile.mkdtemp(prefix='bench_')
+    db.configurar(os.path.join(tmp_dir, 'bench.db'))
+    init_db()
+
+    rnd   = random.Random(42)
+    ahora = datetime.now()
+    conn  = db.get_conn()
+    conn.executemany(
+        "INSERT INTO productos (sku, descripcion, precio, stock, costo) VALUES (?, ?, ?, ?, ?)",
+        [(f"SKU{i:05d}", f"Producto {i}", rnd.uniform(100, 5000), rnd.randint(0, 50),
+          rnd.uniform(50, 2500)) for i in range(n_productos)]
+    )
+    conn.executemany(
+        "INSERT INTO ventas (fecha, cliente_id, total, metodo_pago, subtotal, monto_pagado)"
+        " VALUES (?, 1, ?, 'efectivo', ?, ?)",
+        [((ahora - timedelta(minutes=17 * i)).strftime('%Y-%m-%d %H:%M:%S'), t, t, t)
+         for i, t in ((i, rnd.uniform(500, 50000)) for i in range(n_ventas))]
+    )
+    conn.execute(
+        "INSERT INTO usuarios (username, password_hash, rol_id) VALUES ('bench', '-', 1)"
+    )
+    conn.commit()
+    conn.close()
+
+    from services.agregados_service import reconstruir
+    reconstruir()
+    return tmp_dir
+
+
+def _cliente_logueado(app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id']   = 1
+        sess['username']  = 'bench'
+        sess['rol_nivel'] = 1
+        sess['permisos']  = []
+    return client
+
+
+def _medir(client, url, repeticiones):
+    client.get(url)  # calentamiento
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resp = client.get(url)
+        assert resp.status_code == 200, (url, resp.status_code)
+    return repeticiones / (time.perf_counter() - inicio)
+
+
+def bench_conexiones(repeticiones):
+    """Requests/seg en /inventario y /ventas_historial con y sin pool de conexiones."""
+    from app import create_app
+
+    app    = create_app()
+    client = _cliente_logueado(app)
+    urls   = ['/inventario', '/ventas_historial']
+
+    print(f"{'URL':<20} {'sin pool':>12} {'con pool':>12} {'mejora':>8}")
+    for url in urls:
+        db.POOL_ACTIVO = False
+        antes = _medir(client, url, repeticiones)
+        db.POOL_ACTIVO = True
+        despues = _medir(client, url, repeticiones)
+        print(f"{url:<20} {antes:>10.1f}/s {despues:>10.1f}/s {despues / antes:>7.2f}x")
+
+
+def bench_dashboard(repeticiones):
+    """Requests/seg en / calculando los KPIs de ventas en cada visita vs. cacheados."""
+    from app import create_app
+    from services import dashboard_service
+
+    app    = create_app()
+    client = _cliente_logueado(app)
+
+    print(f"{'URL':<20} {'sin caché':>12} {'con caché':>12} {'mejora':>8}")
+    dashboard_service.CACHE_ACTIVO = False
+    antes = _medir(client, '/', repeticiones)
+    dashboard_service.CACHE_ACTIVO = True
+    despues = _medir(client, '/', repeticiones)
+    print(f"{'/':<20} {antes:>10.1f}/s {despues:>10.1f}/s {despues / antes:>7.2f}x")
+
+
+def _medir_ms(fn, repeticiones):
+    fn()  # calentamiento
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+def bench_pdf(repeticiones):
+    """ms por PDF armando estilos y bloques fijos en cada llamada vs. cacheados (pdf_layout)."""
+    from services import pdf_layout
+    from services.afip_service import _render_pdf_factura
+    from services.presupuesto_service import crear_presupuesto, generar_pdf as pdf_presupuesto
+    from services.remito_service import crear_remito, generar_pdf as pdf_remito
+
+    items = [{'producto_id': i + 1, 'descripcion': f"Producto {i}", 'cantidad': 1 + i % 3,
+              'precio_unitario': 1500.0 + i} for i in range(15)]
+    _, presupuesto_id = crear_presupuesto(1, '2099-12-31', items, observaciones="Entrega a convenir")
+    _, remito_id = crear_remito(1, "Cliente", "Calle 123", items)
+    cliente = {'razon_social': "Cliente SA", 'nombre': "Cliente", 'cuit': '30-11111111-2',
+               'condicion_iva': 'responsable_inscripto'}
+    factura = {'tipo': 'A', 'numero': 1, 'cae': '7' * 14, 'cae_vto': '2099-12-31',
+               'fecha': '2099-01-01', 'imp_neto': 1000.0, 'imp_iva': 210.0}
+    productos = [(it['descripcion'], it['cantidad'], it['precio_unitario']) for it in items]
+
+    documentos = {
+        'factura':     lambda: _render_pdf_factura(1, {'total': 1210.0}, cliente, productos, factura),
+        'presupuesto': lambda: pdf_presupuesto(presupuesto_id),
+        'remito':      lambda: pdf_remito(remito_id),
+    }
+    print(f"{'PDF':<20} {'sin caché':>12} {'con caché':>12} {'mejora':>8}")
+    for nombre, fn in documentos.items():
+        pdf_layout.CACHE_ACTIVO = False
+        antes = _medir_ms(fn, repeticiones)
+        pdf_layout.CACHE_ACTIVO = True
+        despues = _medir_ms(fn, repeticiones)
+        print(f"{nombre:<20} {antes:>9.2f} ms {despues:>9.2f} ms {antes / despues:>7.2f}x")
+
+
+def bench_reportes(repeticiones):
+    """ms por ver un reporte y bajar su Excel y su PDF, recalculando en cada uno
+    vs. con los resultados de services/reportes_cache."""
+    from app import create_app
+    from services import reportes_cache
+
+    app    = create_app()
+    client = _cliente_logueado(app)
+    reportes = {
+        '/resumen':                ['/resumen', '/resumen/excel', '/resumen/pdf'],
+        '/reportes/rentabilidad':  ['/reportes/rentabilidad', '/reportes/rentabilidad/excel',
+                                    '/reportes/rentabilidad/pdf'],
+    }
+
+    def _visita(urls):
+        reportes_cache.limpiar()  # cada visita arranca sin nada guardado
+        for url in urls:
+            resp = client.get(url)
+            assert resp.status_code == 200, (url, resp.status_code)
+
+    print(f"{'URL':<24} {'sin caché':>12} {'con caché':>12} {'mejora':>8}")
+    for nombre, urls in reportes.items():
+        reportes_cache.CACHE_ACTIVO = False
+        antes = _medir_ms(lambda: _visita(urls), repeticiones)
+        reportes_cache.CACHE_ACTIVO = True
+        despues = _medir_ms(lambda: _visita(urls), repeticiones)
+        print(f"{nombre:<24} {antes:>9.2f} ms {despues:>9.2f} ms {antes / despues:>7.2f}x")
+
+
+BENCHMARKS = {
+    'conexiones': bench_conexiones,
+    'pdf':        bench_pdf,
+    'dashboard':  bench_dashboard,
+    'reportes':   bench_reportes,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Micro-benchmarks del sistema")
+    parser.add_argument('nombres', nargs='*', default=list(BENCHMARKS),
+                        help=f"benchmarks a correr ({', '.join(BENCHMARKS)})")
+    parser.add_argument('-n', '--repeticiones', type=int, default=200)
+    args = parser.parse_args()
+
+    tmp_dir = _preparar_db()
+    try:
+        for nombre in args.nombres:
+            print(f"\n== {nombre} ==")
+            BENCHMARKS[nombre](args.repeticiones)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
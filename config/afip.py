@@ -9,6 +9,18 @@ AFIP_CONFIG = {
     'razon_social': os.getenv('AFIP_RAZON_SOCIAL', 'COMENDA DECO SRL').strip(),
     'domicilio':    os.getenv('AFIP_DOMICILIO', '').strip(),
     'punto_venta':  int(os.getenv('AFIP_PUNTO_VENTA', '1') or '1'),
+    # Caché SQLite de WSDL/XSD de zeep: evita descargarlos en cada arranque
+    'wsdl_cache_path': os.getenv('AFIP_WSDL_CACHE', '.afip_wsdl_cache.db').strip(),
+    'wsdl_cache_seg':  int(os.getenv('AFIP_WSDL_CACHE_SEG', str(7 * 24 * 3600)) or '0'),
+    # Comprobantes por FECAESolicitar en la facturación masiva (tope de WSFE: 250)
+    'max_registros_lote': int(os.getenv('AFIP_MAX_LOTE', '250') or '250'),
+    # Horas que una consulta al Padrón A13 se considera vigente; vencida se
+    # sigue mostrando mientras se actualiza en segundo plano
+    'padron_ttl_horas': int(os.getenv('AFIP_PADRON_TTL_HORAS', '168') or '168'),
+    # Días antes del vencimiento del certificado en que se empieza a avisar
+    'cert_aviso_dias': int(os.getenv('AFIP_CERT_AVISO_DIAS', '30') or '30'),
+    # Timeout de las llamadas SOAP (segundos)
+    'timeout':         int(os.getenv('AFIP_TIMEOUT', '30') or '30'),
 }
 
 WSAA_WSDL = {
@@ -0,0 +1,18 @@
+# config/database.py
+import os
+
+DB_CONFIG = {
+    # Conexiones extra por proceso (anidadas o de jobs en segundo plano)
+    'pool_max':        int(os.getenv('DB_POOL_MAX', '8') or '8'),
+    # DB_POOL=0 vuelve al comportamiento anterior: una conexión nueva por llamada
+    'pool_activo':     os.getenv('DB_POOL', '1') != '0',
+    # WAL: los lectores no bloquean al escritor ni viceversa
+    'journal_mode':    os.getenv('DB_JOURNAL_MODE', 'WAL').strip(),
+    # NORMAL es seguro con WAL (solo se arriesga la última transacción ante corte de luz)
+    'synchronous':     os.getenv('DB_SYNCHRONOUS', 'NORMAL').strip(),
+    # Negativo = KiB (20 MB de caché de páginas por conexión)
+    'cache_size':      int(os.getenv('DB_CACHE_SIZE', '-20000') or '-20000'),
+    'mmap_size':       int(os.getenv('DB_MMAP_SIZE', str(128 * 1024 * 1024)) or '0'),
+    # Espera ante "database is locked" antes de fallar
+    'busy_timeout_ms': int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000') or '5000'),
+}
@@ -0,0 +1,14 @@
+# config/pdf.py
+import os
+
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PDF_CONFIG = {
+    # Procesos que renderizan PDF; 0 = en el mismo hilo del request (sin pool)
+    'workers':     int(os.getenv('PDF_WORKERS', str(min(4, os.cpu_count() or 1))) or '0'),
+    # PDFs ya generados, nombrados por el hash de los datos de origen
+    'cache_dir':   os.getenv('PDF_CACHE_DIR', os.path.join(_BASE_DIR, 'cache', 'pdf')),
+    # Se borran los que no se descargaron en este lapso
+    'cache_dias':  int(os.getenv('PDF_CACHE_DIAS', '30') or '30'),
+    'timeout_seg': int(os.getenv('PDF_TIMEOUT_SEG', '60') or '60'),
+}
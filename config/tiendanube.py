@@ -0,0 +1,28 @@
+# config/tiendanube.py
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TN_CONFIG = {
+    'store_id':      os.getenv('TN_STORE_ID'),
+    'token':         os.getenv('TN_ACCESS_TOKEN'),
+    # Se puede apuntar a un servidor local de prueba (p. ej. http://127.0.0.1:8081)
+    'api_base':      os.getenv('TN_API_BASE', 'https://api.tiendanube.com').rstrip('/'),
+    'user_agent':    'Comenda App (mateopatatian@gmail.com)',
+    # Conexiones keep-alive que se mantienen abiertas contra la API
+    'pool_maxsize':  int(os.getenv('TN_POOL_MAXSIZE', '10') or '10'),
+    # Reintentos ante 429 (respetando Retry-After) antes de devolver la respuesta
+    'reintentos_429': int(os.getenv('TN_REINTENTOS_429', '3') or '3'),
+    'espera_429_max': float(os.getenv('TN_ESPERA_429_MAX', '30') or '30'),
+}
+
+# (conexión, lectura) en segundos, por endpoint
+TN_TIMEOUTS = {
+    'default':     (3.05, 15),
+    'products':    (3.05, 30),
+    'stock_price': (3.05, 10),
+    'orders':      (3.05, 10),
+    'webhooks':    (3.05, 10),
+}
@@ -0,0 +1,233 @@
+# db.py
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from config.database import DB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Path absoluto a la DB, resuelto desde la ubicación de este archivo
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, 'negocio.db')
+
+POOL_MAX = DB_CONFIG['pool_max']
+POOL_ACTIVO = DB_CONFIG['pool_activo']
+
+
+class _Conexion(sqlite3.Connection):
+    """Conexión reutilizable: close() la devuelve al pool en lugar de cerrarla."""
+
+    _liberar = None
+
+    def close(self):
+        if self._liberar is None:
+            super().close()
+        else:
+            self._liberar(self)
+
+    def cerrar_definitivo(self):
+        super().close()
+
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_generacion = 0  # cambia con configurar(); descarta conexiones a la DB anterior
+
+
+def _configurar_conexion(conn):
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_CONFIG['busy_timeout_ms'])}")
+    conn.execute(f"PRAGMA synchronous = {DB_CONFIG['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = {int(DB_CONFIG['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(DB_CONFIG['mmap_size'])}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+
+def _conectar(solo_lectura, factory=sqlite3.Connection):
+    if solo_lectura:
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True,
+                               factory=factory, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(DB_PATH, factory=factory, check_same_thread=False)
+    _configurar_conexion(conn)
+    return conn
+
+
+def _en_uso():
+    en_uso = getattr(_local, 'en_uso', None)
+    if en_uso is None:
+        en_uso = _local.en_uso = []
+    return en_uso
+
+
+class _Pool:
+    """Una conexión propia por hilo + un pool compartido acotado para el resto."""
+
+    def __init__(self, nombre, solo_lectura):
+        self.solo_lectura = solo_lectura
+        self._attr        = f"propia_{nombre}"
+        self._cola        = queue.LifoQueue(maxsize=POOL_MAX)
+
+    def tomar(self):
+        conn = getattr(_local, self._attr, None)
+        setattr(_local, self._attr, None)
+        if conn is not None and conn._generacion != _generacion:
+            conn.cerrar_definitivo()
+            conn = None
+        while conn is None:
+            try:
+                conn = self._cola.get_nowait()
+            except queue.Empty:
+                conn = _conectar(self.solo_lectura, factory=_Conexion)
+                conn._generacion = _generacion
+                break
+            if conn._generacion != _generacion:
+                conn.cerrar_definitivo()
+                conn = None
+        conn._liberar = self.liberar
+        _en_uso().append(conn)
+        return conn
+
+    def liberar(self, conn):
+        """Devuelve la conexión: primero a su hilo, si no al pool compartido."""
+        en_uso = _en_uso()
+        if conn in en_uso:
+            en_uso.remove(conn)
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # mismo efecto que cerrar sin commit
+        except sqlite3.Error:
+            conn.cerrar_definitivo()
+            return
+        if conn._generacion != _generacion:
+            conn.cerrar_definitivo()
+            return
+        if getattr(_local, self._attr, None) is None:
+            setattr(_local, self._attr, conn)
+            return
+        try:
+            self._cola.put_nowait(conn)
+        except queue.Full:
+            conn.cerrar_definitivo()
+
+    def vaciar(self):
+        while True:
+            try:
+                self._cola.get_nowait().cerrar_definitivo()
+            except queue.Empty:
+                break
+
+
+_pools = {
+    'rw': _Pool('rw', solo_lectura=False),
+    'ro': _Pool('ro', solo_lectura=True),
+}
+
+
+def get_conn():
+    """Entrega una conexión con row_factory para acceder a columnas por nombre.
+
+    Cada hilo reutiliza su propia conexión; si ya está en uso (llamadas
+    anidadas) se toma una del pool compartido. conn.close() la libera.
+    """
+    if not POOL_ACTIVO:
+        return _conectar(solo_lectura=False)
+    return _pools['rw'].tomar()
+
+
+def get_conn_lectura():
+    """Como get_conn() pero abierta con mode=ro, para reportes y exportaciones.
+
+    Con WAL lee una foto consistente de la base sin bloquear a las ventas.
+    """
+    if not POOL_ACTIVO:
+        return _conectar(solo_lectura=True)
+    return _pools['ro'].tomar()
+
+
+def liberar_conexiones_hilo():
+    """Libera las conexiones que el hilo actual dejó abiertas (rollback incluido)."""
+    for conn in list(_en_uso()):
+        conn.close()
+
+
+# ── Transacciones ────────────────────────────────────────────────────────────
+
+@contextmanager
+def transaction():
+    """Bloque transaccional: commit al salir, rollback ante excepción.
+
+    Anidado dentro de otro transaction() del mismo hilo usa un SAVEPOINT
+    sobre la misma conexión, así las funciones pueden componerse.
+
+        with db.transaction() as conn:
+            conn.execute(...)
+    """
+    pila = getattr(_local, 'transacciones', None)
+    if pila is None:
+        pila = _local.transacciones = []
+
+    if pila:
+        conn = pila[-1]
+        nombre = f"sp_{len(pila)}"
+        conn.execute(f"SAVEPOINT {nombre}")
+        pila.append(conn)
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {nombre}")
+            conn.execute(f"RELEASE {nombre}")
+            raise
+        else:
+            conn.execute(f"RELEASE {nombre}")
+        finally:
+            pila.pop()
+        return
+
+    conn = get_conn()
+    pila.append(conn)
+    try:
+        conn.execute("BEGIN")
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        pila.pop()
+        conn.close()
+
+
+# ── Configuración ────────────────────────────────────────────────────────────
+
+def configurar(db_path):
+    """Apunta el módulo a otra base (tests, benchmarks, scripts)."""
+    global DB_PATH, _generacion
+    with _pool_lock:
+        DB_PATH = db_path
+        _generacion += 1
+        for pool in _pools.values():
+            pool.vaciar()
+
+
+def preparar_base():
+    """Ajustes persistentes del archivo (journal_mode): una vez al arrancar."""
+    conn = _conectar(solo_lectura=False)
+    try:
+        modo = conn.execute(f"PRAGMA journal_mode = {DB_CONFIG['journal_mode']}").fetchone()[0]
+        if modo.lower() != DB_CONFIG['journal_mode'].lower():
+            logger.warning("No se pudo activar journal_mode=%s (quedó %s)",
+                           DB_CONFIG['journal_mode'], modo)
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    """Libera al final de cada request las conexiones que hayan quedado tomadas."""
+    @app.teardown_appcontext
+    def _liberar_conexiones(exc):
+        liberar_conexiones_hilo()
@@ -0,0 +1,81 @@
+# migrations/__init__.py
+"""Migraciones de esquema versionadas.
+
+Cada módulo mNNNN_<descripcion>.py define aplicar(conn) y se ejecuta una
+sola vez, dentro de su propia transacción. La tabla schema_version guarda
+las versiones aplicadas, así un arranque en caliente solo consulta MAX(version).
+
+Para cambiar el esquema se agrega un módulo nuevo con el número siguiente;
+nunca se editan migraciones ya publicadas.
+"""
+import importlib
+import logging
+import pkgutil
+import re
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_PATRON = re.compile(r'^m(\d{4})_\w+$')
+
+
+def _descubrir():
+    """Lista ordenada de (version, nombre_modulo)."""
+    encontradas = []
+    for info in pkgutil.iter_modules(__path__):
+        m = _PATRON.match(info.name)
+        if m:
+            encontradas.append((int(m.group(1)), info.name))
+    encontradas.sort()
+    versiones = [v for v, _ in encontradas]
+    if len(versiones) != len(set(versiones)):
+        raise RuntimeError(f"Números de migración duplicados: {versiones}")
+    return encontradas
+
+
+MIGRACIONES = _descubrir()
+VERSION_ACTUAL = MIGRACIONES[-1][0] if MIGRACIONES else 0
+
+
+def version_aplicada(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+        version     INTEGER PRIMARY KEY,
+        nombre      TEXT NOT NULL,
+        aplicada_en TEXT NOT NULL
+    )''')
+    conn.commit()
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def aplicar_pendientes(conn):
+    """Aplica en orden las migraciones con versión mayor a la registrada.
+
+    Devuelve la lista de nombres aplicados (vacía en un arranque en caliente).
+    """
+    if version_aplicada(conn) >= VERSION_ACTUAL:
+        return []
+
+    aplicadas = []
+    for version, nombre in MIGRACIONES:
+        # BEGIN IMMEDIATE: si arrancan varios workers a la vez, solo uno migra
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ya = conn.execute(
+                "SELECT 1 FROM schema_version WHERE version = ?", (version,)
+            ).fetchone()
+            if ya:
+                conn.rollback()
+                continue
+            importlib.import_module(f"{__name__}.{nombre}").aplicar(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, nombre, aplicada_en) VALUES (?, ?, ?)",
+                (version, nombre, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception("Falló la migración %s", nombre)
+            raise
+        aplicadas.append(nombre)
+        logger.info("Migración aplicada: %s", nombre)
+    return aplicadas
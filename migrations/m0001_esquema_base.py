@@ -0,0 +1,458 @@
+# migrations/m0001_esquema_base.py
+"""Esquema base: tablas, columnas e índices tal como los dejaba init_db.
+
+Es la única migración que inspecciona PRAGMA table_info, porque tiene que
+adoptar bases creadas antes del versionado con cualquier subconjunto de
+columnas. Las migraciones siguientes asumen este esquema.
+"""
+
+
+def aplicar(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS productos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sku TEXT UNIQUE NOT NULL,
+        descripcion TEXT NOT NULL,
+        precio REAL NOT NULL,
+        stock INTEGER DEFAULT 0,
+        variant_id TEXT UNIQUE,
+        product_id TEXT,
+        promotional_price REAL,
+        barcode TEXT,
+        imagen_url TEXT,
+        activo INTEGER DEFAULT 1
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS clientes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        cuit TEXT,
+        telefono TEXT,
+        dni TEXT,
+        email TEXT,
+        tipo INTEGER DEFAULT 0
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS ventas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha TEXT NOT NULL,
+        cliente_id INTEGER NOT NULL,
+        total REAL NOT NULL,
+        metodo_pago TEXT,
+        cuotas INTEGER,
+        order_id TEXT
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS detalle_venta (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        venta_id INTEGER NOT NULL,
+        producto_id INTEGER NOT NULL,
+        cantidad INTEGER NOT NULL,
+        precio_unitario REAL NOT NULL
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS usuarios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL
+    )''')
+
+    # Migraciones seguras: agregar columnas nuevas si no existen
+    columnas_productos = [r[1] for r in conn.execute("PRAGMA table_info(productos)").fetchall()]
+    for col, definition in [
+        ("promotional_price", "REAL"),
+        ("barcode", "TEXT"),
+        ("imagen_url", "TEXT"),
+        ("costo", "REAL"),
+    ]:
+        if col not in columnas_productos:
+            conn.execute(f"ALTER TABLE productos ADD COLUMN {col} {definition}")
+
+    columnas_ventas = [r[1] for r in conn.execute("PRAGMA table_info(ventas)").fetchall()]
+    if "order_id" not in columnas_ventas:
+        conn.execute("ALTER TABLE ventas ADD COLUMN order_id TEXT")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_ventas_order_id ON ventas(order_id)")
+    if "estado" not in columnas_ventas:
+        conn.execute("ALTER TABLE ventas ADD COLUMN estado TEXT NOT NULL DEFAULT 'activa'")
+    if "motivo_cancelacion" not in columnas_ventas:
+        conn.execute("ALTER TABLE ventas ADD COLUMN motivo_cancelacion TEXT")
+    if "monto_recibido" not in columnas_ventas:
+        conn.execute("ALTER TABLE ventas ADD COLUMN monto_recibido REAL")
+    if "vuelto" not in columnas_ventas:
+        conn.execute("ALTER TABLE ventas ADD COLUMN vuelto REAL")
+    for col, defn in [
+        ("factura_emitida",       "INTEGER NOT NULL DEFAULT 0"),
+        ("factura_tipo",          "TEXT"),
+        ("factura_numero",        "INTEGER"),
+        ("factura_cae",           "TEXT"),
+        ("factura_cae_vto",       "TEXT"),
+        ("factura_pdf_path",      "TEXT"),
+        ("factura_fecha",         "TEXT"),
+        ("nota_credito_emitida",  "INTEGER NOT NULL DEFAULT 0"),
+        ("nota_credito_tipo",     "TEXT"),
+        ("nota_credito_numero",   "INTEGER"),
+        ("nota_credito_cae",      "TEXT"),
+        ("nota_credito_cae_vto",  "TEXT"),
+        ("nota_credito_pdf_path", "TEXT"),
+        ("nota_credito_fecha",    "TEXT"),
+        ("nota_credito_motivo",   "TEXT"),
+        # Descuentos
+        ("subtotal",              "REAL"),
+        ("descuento_tipo",        "TEXT NOT NULL DEFAULT 'ninguno'"),
+        ("descuento_valor",       "REAL NOT NULL DEFAULT 0"),
+        # Pagos parciales / señas
+        ("estado_pago",           "TEXT NOT NULL DEFAULT 'pagado_completo'"),
+        ("monto_pagado",          "REAL NOT NULL DEFAULT 0"),
+        ("saldo_pendiente",       "REAL NOT NULL DEFAULT 0"),
+    ]:
+        if col not in columnas_ventas:
+            conn.execute(f"ALTER TABLE ventas ADD COLUMN {col} {defn}")
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS venta_pagos (
+        id             INTEGER PRIMARY KEY AUTOINCREMENT,
+        venta_id       INTEGER NOT NULL,
+        monto          REAL    NOT NULL,
+        metodo_pago    TEXT,
+        fecha_pago     TEXT    NOT NULL,
+        tipo           TEXT    NOT NULL DEFAULT 'saldo_final',
+        registrado_por INTEGER,
+        observaciones  TEXT,
+        FOREIGN KEY (venta_id) REFERENCES ventas(id)
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_venta_pagos_venta ON venta_pagos(venta_id)")
+    columnas_clientes = [r[1] for r in conn.execute("PRAGMA table_info(clientes)").fetchall()]
+    for col, definition in [
+        ("dni",                  "TEXT"),
+        ("email",                "TEXT"),
+        ("tipo",                 "INTEGER DEFAULT 0"),
+        ("razon_social",         "TEXT"),
+        ("condicion_iva",        "TEXT NOT NULL DEFAULT 'consumidor_final'"),
+        ("domicilio_fiscal",     "TEXT"),
+        ("localidad",            "TEXT"),
+        ("provincia",            "TEXT"),
+        ("codigo_postal",        "TEXT"),
+        ("actividad_principal",  "TEXT"),
+        ("estado_afip",          "TEXT"),
+    ]:
+        if col not in columnas_clientes:
+            conn.execute(f"ALTER TABLE clientes ADD COLUMN {col} {definition}")
+
+    # ── Presupuestos ────────────────────────────────────────────────────────
+    conn.execute('''CREATE TABLE IF NOT EXISTS presupuestos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero TEXT UNIQUE NOT NULL,
+        cliente_id INTEGER NOT NULL,
+        fecha TEXT NOT NULL,
+        fecha_validez TEXT NOT NULL,
+        estado TEXT NOT NULL DEFAULT 'borrador',
+        total REAL NOT NULL DEFAULT 0,
+        observaciones TEXT,
+        creado_por INTEGER,
+        FOREIGN KEY (cliente_id) REFERENCES clientes(id)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS presupuesto_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        presupuesto_id INTEGER NOT NULL,
+        producto_id INTEGER,
+        descripcion TEXT NOT NULL,
+        cantidad REAL NOT NULL DEFAULT 1,
+        precio_unitario REAL NOT NULL DEFAULT 0,
+        subtotal REAL NOT NULL DEFAULT 0,
+        FOREIGN KEY (presupuesto_id) REFERENCES presupuestos(id),
+        FOREIGN KEY (producto_id) REFERENCES productos(id)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS presupuesto_historial (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        presupuesto_id INTEGER NOT NULL,
+        estado_anterior TEXT,
+        estado_nuevo TEXT NOT NULL,
+        fecha TEXT NOT NULL,
+        usuario_id INTEGER,
+        nota TEXT,
+        FOREIGN KEY (presupuesto_id) REFERENCES presupuestos(id)
+    )''')
+
+    columnas_presupuestos = [r[1] for r in conn.execute("PRAGMA table_info(presupuestos)").fetchall()]
+    if 'venta_id' not in columnas_presupuestos:
+        conn.execute("ALTER TABLE presupuestos ADD COLUMN venta_id INTEGER REFERENCES ventas(id)")
+
+    # ── Remitos ──────────────────────────────────────────────────────────────
+    conn.execute('''CREATE TABLE IF NOT EXISTS remitos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero TEXT UNIQUE NOT NULL,
+        cliente_id INTEGER,
+        presupuesto_id INTEGER,
+        venta_id INTEGER,
+        destinatario TEXT NOT NULL,
+        direccion TEXT NOT NULL,
+        bultos INTEGER DEFAULT 1,
+        peso REAL,
+        estado TEXT NOT NULL DEFAULT 'pendiente',
+        fecha TEXT NOT NULL,
+        fecha_entrega_estimada TEXT,
+        fecha_entrega_real TEXT,
+        recibido_por TEXT,
+        observaciones TEXT,
+        stock_descontado INTEGER DEFAULT 0,
+        creado_por INTEGER,
+        FOREIGN KEY (cliente_id) REFERENCES clientes(id),
+        FOREIGN KEY (presupuesto_id) REFERENCES presupuestos(id),
+        FOREIGN KEY (venta_id) REFERENCES ventas(id)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS remito_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        remito_id INTEGER NOT NULL,
+        producto_id INTEGER,
+        descripcion TEXT NOT NULL,
+        cantidad REAL NOT NULL DEFAULT 1,
+        FOREIGN KEY (remito_id) REFERENCES remitos(id),
+        FOREIGN KEY (producto_id) REFERENCES productos(id)
+    )''')
+
+    # ── Caja ─────────────────────────────────────────────────────────────────
+    conn.execute('''CREATE TABLE IF NOT EXISTS movimientos_caja (
+        id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        tipo          TEXT NOT NULL,
+        origen        TEXT NOT NULL,
+        referencia_id INTEGER,
+        descripcion   TEXT NOT NULL,
+        monto         REAL NOT NULL,
+        metodo_pago   TEXT,
+        fecha         TEXT NOT NULL,
+        creado_por    INTEGER REFERENCES usuarios(id)
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_caja_fecha  ON movimientos_caja(fecha)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_caja_tipo   ON movimientos_caja(tipo)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_caja_origen ON movimientos_caja(origen)")
+
+    # ── Gastos ───────────────────────────────────────────────────────────────
+    conn.execute('''CREATE TABLE IF NOT EXISTS categorias_gasto (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre      TEXT UNIQUE NOT NULL,
+        descripcion TEXT,
+        activo      INTEGER DEFAULT 1
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS gastos (
+        id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+        categoria_id            INTEGER NOT NULL,
+        descripcion             TEXT NOT NULL,
+        monto                   REAL NOT NULL,
+        fecha                   TEXT NOT NULL,
+        metodo_pago             TEXT,
+        es_recurrente           INTEGER DEFAULT 0,
+        frecuencia              TEXT,
+        gasto_padre_id          INTEGER,
+        fecha_prox_recurrencia  TEXT,
+        archivo_nombre          TEXT,
+        archivo_ruta            TEXT,
+        observaciones           TEXT,
+        creado_por              INTEGER,
+        FOREIGN KEY (categoria_id)   REFERENCES categorias_gasto(id),
+        FOREIGN KEY (gasto_padre_id) REFERENCES gastos(id),
+        FOREIGN KEY (creado_por)     REFERENCES usuarios(id)
+    )''')
+
+    # ── Roles y permisos ──────────────────────────────────────────────────────
+    conn.execute('''CREATE TABLE IF NOT EXISTS roles (
+        id          INTEGER PRIMARY KEY,
+        nombre      TEXT UNIQUE NOT NULL,
+        nivel       INTEGER NOT NULL,
+        descripcion TEXT
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS rol_permisos (
+        rol_id  INTEGER NOT NULL,
+        modulo  TEXT NOT NULL,
+        accion  TEXT NOT NULL,
+        PRIMARY KEY (rol_id, modulo, accion),
+        FOREIGN KEY (rol_id) REFERENCES roles(id)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS audit_log (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario_id INTEGER,
+        username   TEXT,
+        accion     TEXT NOT NULL,
+        modulo     TEXT NOT NULL,
+        detalle    TEXT,
+        ip         TEXT,
+        fecha      TEXT NOT NULL,
+        FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+    )''')
+
+    # Índices para acelerar búsquedas frecuentes
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_productos_sku ON productos(sku)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas(fecha)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_detalle_venta_venta_id ON detalle_venta(venta_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_detalle_venta_producto_id ON detalle_venta(producto_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clientes_email ON clientes(email)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clientes_dni ON clientes(dni)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_presupuestos_cliente ON presupuestos(cliente_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_presupuestos_estado ON presupuestos(estado)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_presupuesto_items ON presupuesto_items(presupuesto_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_remitos_cliente ON remitos(cliente_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_remitos_estado ON remitos(estado)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_remito_items ON remito_items(remito_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_usuario ON audit_log(usuario_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_fecha   ON audit_log(fecha)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_modulo  ON audit_log(modulo)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_gastos_fecha      ON gastos(fecha)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_gastos_categoria  ON gastos(categoria_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_gastos_recurrente ON gastos(es_recurrente)")
+
+    # ── Proveedores (del exterior) ────────────────────────────────────────────
+    conn.execute('''CREATE TABLE IF NOT EXISTS proveedores (
+        id       INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre   TEXT NOT NULL,
+        pais     TEXT,
+        contacto TEXT,
+        telefono TEXT,
+        email    TEXT,
+        notas    TEXT
+    )''')
+
+    # ── Importaciones (orden de compra al exterior) ───────────────────────────
+    conn.execute('''CREATE TABLE IF NOT EXISTS importaciones (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        proveedor_id    INTEGER NOT NULL,
+        numero          TEXT UNIQUE NOT NULL,
+        fecha_pedido    TEXT NOT NULL,
+        fecha_pago      TEXT,
+        fecha_llegada   TEXT,
+        estado          TEXT NOT NULL DEFAULT 'pendiente_pago',
+        moneda_origen   TEXT NOT NULL DEFAULT 'USD',
+        tipo_cambio     REAL NOT NULL DEFAULT 1,
+        observaciones   TEXT,
+        FOREIGN KEY (proveedor_id) REFERENCES proveedores(id)
+    )''')
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS importacion_items (
+        id                   INTEGER PRIMARY KEY AUTOINCREMENT,
+        importacion_id       INTEGER NOT NULL,
+        producto_id          INTEGER,
+        descripcion          TEXT NOT NULL,
+        cantidad             REAL NOT NULL DEFAULT 1,
+        precio_unitario_fob  REAL NOT NULL DEFAULT 0,
+        costo_final_unitario REAL,
+        FOREIGN KEY (importacion_id) REFERENCES importaciones(id),
+        FOREIGN KEY (producto_id)    REFERENCES productos(id)
+    )''')
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS importacion_gastos (
+        id                 INTEGER PRIMARY KEY AUTOINCREMENT,
+        importacion_id     INTEGER NOT NULL,
+        tipo               TEXT NOT NULL,
+        descripcion        TEXT,
+        monto              REAL NOT NULL DEFAULT 0,
+        comprobante_nombre TEXT,
+        comprobante_ruta   TEXT,
+        FOREIGN KEY (importacion_id) REFERENCES importaciones(id)
+    )''')
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_importaciones_proveedor ON importaciones(proveedor_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_importaciones_estado    ON importaciones(estado)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_import_items_imp        ON importacion_items(importacion_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_import_gastos_imp       ON importacion_gastos(importacion_id)")
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS importacion_documentos (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        importacion_id  INTEGER NOT NULL,
+        tipo_documento  TEXT NOT NULL,
+        nombre_archivo  TEXT NOT NULL,
+        ruta_archivo    TEXT NOT NULL,
+        descripcion     TEXT,
+        subido_por      INTEGER,
+        fecha_subida    TEXT NOT NULL,
+        FOREIGN KEY (importacion_id) REFERENCES importaciones(id),
+        FOREIGN KEY (subido_por)     REFERENCES usuarios(id)
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_import_docs_imp ON importacion_documentos(importacion_id)")
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS importacion_pagos (
+        id               INTEGER PRIMARY KEY AUTOINCREMENT,
+        importacion_id   INTEGER NOT NULL,
+        monto            REAL    NOT NULL DEFAULT 0,
+        tipo_cambio      REAL    NOT NULL DEFAULT 1,
+        monto_ars        REAL    NOT NULL DEFAULT 0,
+        fecha_pago       TEXT    NOT NULL,
+        metodo_pago      TEXT,
+        comprobante      TEXT,
+        registrado_por   INTEGER,
+        FOREIGN KEY (importacion_id) REFERENCES importaciones(id),
+        FOREIGN KEY (registrado_por) REFERENCES usuarios(id)
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_import_pagos_imp ON importacion_pagos(importacion_id)")
+
+    # ── Extender proveedores: tipo, cuit, condicion_iva, direccion ────────────
+    _cols_prov = [r[1] for r in conn.execute("PRAGMA table_info(proveedores)").fetchall()]
+    for _col, _def in [
+        ('tipo',          "TEXT NOT NULL DEFAULT 'internacional'"),
+        ('cuit',          'TEXT'),
+        ('condicion_iva', 'TEXT'),
+        ('direccion',     'TEXT'),
+    ]:
+        if _col not in _cols_prov:
+            conn.execute(f"ALTER TABLE proveedores ADD COLUMN {_col} {_def}")
+
+    # ── Compras Nacionales ────────────────────────────────────────────────────
+    conn.execute('''CREATE TABLE IF NOT EXISTS compras (
+        id                       INTEGER PRIMARY KEY AUTOINCREMENT,
+        proveedor_id             INTEGER NOT NULL,
+        numero                   TEXT UNIQUE NOT NULL,
+        fecha                    TEXT NOT NULL,
+        estado                   TEXT NOT NULL DEFAULT 'pendiente_pago',
+        numero_factura_proveedor TEXT,
+        observaciones            TEXT,
+        FOREIGN KEY (proveedor_id) REFERENCES proveedores(id)
+    )''')
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS compra_items (
+        id               INTEGER PRIMARY KEY AUTOINCREMENT,
+        compra_id        INTEGER NOT NULL,
+        producto_id      INTEGER,
+        descripcion      TEXT NOT NULL,
+        cantidad         REAL NOT NULL DEFAULT 1,
+        costo_unitario   REAL NOT NULL DEFAULT 0,
+        cantidad_recibida REAL NOT NULL DEFAULT 0,
+        FOREIGN KEY (compra_id)   REFERENCES compras(id),
+        FOREIGN KEY (producto_id) REFERENCES productos(id)
+    )''')
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS compra_pagos (
+        id             INTEGER PRIMARY KEY AUTOINCREMENT,
+        compra_id      INTEGER NOT NULL,
+        monto          REAL    NOT NULL DEFAULT 0,
+        metodo_pago    TEXT,
+        fecha_pago     TEXT    NOT NULL,
+        comprobante    TEXT,
+        registrado_por INTEGER,
+        FOREIGN KEY (compra_id)      REFERENCES compras(id),
+        FOREIGN KEY (registrado_por) REFERENCES usuarios(id)
+    )''')
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_compras_proveedor ON compras(proveedor_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_compras_estado    ON compras(estado)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_compra_items_cmp  ON compra_items(compra_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_compra_pagos_cmp  ON compra_pagos(compra_id)")
+
+    _cols_imp = [r[1] for r in conn.execute("PRAGMA table_info(importaciones)").fetchall()]
+    for _col, _def in [
+        ('naviera',         'TEXT'),
+        ('numero_tracking', 'TEXT'),
+        ('eta',             'TEXT'),
+        ('contenedor',      'TEXT'),
+    ]:
+        if _col not in _cols_imp:
+            conn.execute(f"ALTER TABLE importaciones ADD COLUMN {_col} {_def}")
+
+    _cols_items = [r[1] for r in conn.execute("PRAGMA table_info(importacion_items)").fetchall()]
+    if 'cantidad_recibida' not in _cols_items:
+        conn.execute("ALTER TABLE importacion_items ADD COLUMN cantidad_recibida REAL DEFAULT 0")
+
+    # ── Migrar remitos: campos de retiro por terceros ────────────────────────
+    columnas_remitos = [r[1] for r in conn.execute("PRAGMA table_info(remitos)").fetchall()]
+    for col, definition in [
+        ("retira_nombre",        "TEXT"),
+        ("retira_dni",           "TEXT"),
+        ("retiro_observaciones", "TEXT"),
+    ]:
+        if col not in columnas_remitos:
+            conn.execute(f"ALTER TABLE remitos ADD COLUMN {col} {definition}")
+
+    # ── Migrar usuarios: agregar rol_id ──────────────────────────────────────
+    columnas_usuarios = [r[1] for r in conn.execute("PRAGMA table_info(usuarios)").fetchall()]
+    if 'rol_id' not in columnas_usuarios:
+        conn.execute("ALTER TABLE usuarios ADD COLUMN rol_id INTEGER REFERENCES roles(id)")
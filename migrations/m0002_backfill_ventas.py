@@ -0,0 +1,8 @@
+# migrations/m0002_backfill_ventas.py
+"""Completa subtotal y monto_pagado en ventas anteriores a esas columnas."""
+
+
+def aplicar(conn):
+    # Retrocompatibilidad: llenar subtotal en ventas anteriores que no lo tienen
+    conn.execute("UPDATE ventas SET subtotal = total WHERE subtotal IS NULL")
+    conn.execute("UPDATE ventas SET monto_pagado = total WHERE monto_pagado = 0 AND estado != 'cancelada'")
@@ -0,0 +1,88 @@
+# migrations/m0003_roles_permisos.py
+"""Roles, permisos por rol y asignación de SuperAdmin a usuarios sin rol."""
+
+
+def aplicar(conn):
+    # ── Seed: roles ──────────────────────────────────────────────────────────
+    _ROLES = [
+        (1, 'SuperAdmin', 1, 'Acceso total al sistema'),
+        (2, 'Admin',      2, 'Gestión completa del negocio'),
+        (3, 'Supervisor', 3, 'Supervisión de operaciones'),
+        (4, 'Vendedor',   4, 'Ventas y presupuestos'),
+        (5, 'Deposito',   5, 'Inventario y logística'),
+    ]
+    for row in _ROLES:
+        conn.execute("INSERT OR IGNORE INTO roles (id, nombre, nivel, descripcion) VALUES (?,?,?,?)", row)
+
+    # ── Seed: permisos por rol (SuperAdmin no necesita filas; se chequea por nivel) ──
+    _PERMISOS = [
+        # Admin (2) — todo excepto que no puede eliminar usuarios
+        (2,'inventario','ver'),   (2,'inventario','crear'), (2,'inventario','editar'),
+        (2,'inventario','eliminar'), (2,'inventario','importar'),
+        (2,'ventas','ver'),       (2,'ventas','crear'),     (2,'ventas','cancelar'),
+        (2,'clientes','ver'),     (2,'clientes','crear'),   (2,'clientes','editar'), (2,'clientes','eliminar'),
+        (2,'presupuestos','ver'), (2,'presupuestos','crear'),(2,'presupuestos','editar'),
+        (2,'presupuestos','eliminar'), (2,'presupuestos','cambiar_estado'),
+        (2,'remitos','ver'),      (2,'remitos','crear'),    (2,'remitos','editar'),
+        (2,'remitos','eliminar'), (2,'remitos','cambiar_estado'),
+        (2,'reportes','ver'),
+        (2,'tiendanube','ver'),   (2,'tiendanube','sincronizar'),
+        (2,'usuarios','ver'),     (2,'usuarios','crear'),   (2,'usuarios','editar'),
+        (2,'audit_log','ver'),
+        (2,'gastos','ver'),       (2,'gastos','crear'),     (2,'gastos','editar'), (2,'gastos','eliminar'),
+        (2,'caja','ver'),         (2,'caja','crear'),
+        (2,'resumen','ver'),
+        # Supervisor (3)
+        (3,'inventario','ver'),
+        (3,'ventas','ver'),       (3,'ventas','crear'),     (3,'ventas','cancelar'),
+        (3,'clientes','ver'),     (3,'clientes','crear'),   (3,'clientes','editar'),
+        (3,'presupuestos','ver'), (3,'presupuestos','crear'),(3,'presupuestos','editar'),
+        (3,'presupuestos','cambiar_estado'),
+        (3,'remitos','ver'),      (3,'remitos','crear'),    (3,'remitos','editar'),
+        (3,'remitos','cambiar_estado'),
+        (3,'reportes','ver'),
+        (3,'gastos','ver'),
+        (3,'caja','ver'),         (3,'caja','crear'),
+        (3,'resumen','ver'),
+        # Vendedor (4)
+        (4,'inventario','ver'),
+        (4,'ventas','ver'),       (4,'ventas','crear'),
+        (4,'clientes','ver'),     (4,'clientes','crear'),
+        (4,'presupuestos','ver'), (4,'presupuestos','crear'),(4,'presupuestos','editar'),
+        (4,'presupuestos','cambiar_estado'),
+        (4,'remitos','ver'),
+        (4,'reportes','ver'),
+        # Depósito (5)
+        (5,'inventario','ver'),   (5,'inventario','crear'), (5,'inventario','editar'),
+        (5,'inventario','importar'),
+        (5,'remitos','ver'),      (5,'remitos','editar'),   (5,'remitos','cambiar_estado'),
+        (5,'clientes','ver'),
+        (5,'reportes','ver'),
+    ]
+    for row in _PERMISOS:
+        conn.execute("INSERT OR IGNORE INTO rol_permisos (rol_id, modulo, accion) VALUES (?,?,?)", row)
+
+    _PERMISOS_IMP = [
+        (2,'importaciones','ver'), (2,'importaciones','crear'), (2,'importaciones','editar'),
+        (2,'importaciones','eliminar'), (2,'importaciones','cerrar'),
+        (3,'importaciones','ver'), (3,'importaciones','crear'), (3,'importaciones','editar'),
+        (3,'importaciones','cerrar'),
+        (4,'importaciones','ver'),
+        (5,'importaciones','ver'),
+    ]
+    for row in _PERMISOS_IMP:
+        conn.execute("INSERT OR IGNORE INTO rol_permisos (rol_id, modulo, accion) VALUES (?,?,?)", row)
+
+    _PERMISOS_COMP = [
+        (2,'compras','ver'), (2,'compras','crear'), (2,'compras','editar'),
+        (2,'compras','eliminar'), (2,'compras','cerrar'),
+        (3,'compras','ver'), (3,'compras','crear'), (3,'compras','editar'),
+        (3,'compras','cerrar'),
+        (4,'compras','ver'),
+        (5,'compras','ver'),
+    ]
+    for row in _PERMISOS_COMP:
+        conn.execute("INSERT OR IGNORE INTO rol_permisos (rol_id, modulo, accion) VALUES (?,?,?)", row)
+
+    # Usuarios existentes sin rol → SuperAdmin
+    conn.execute("UPDATE usuarios SET rol_id = 1 WHERE rol_id IS NULL")
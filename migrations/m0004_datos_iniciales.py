@@ -0,0 +1,24 @@
+# migrations/m0004_datos_iniciales.py
+"""Cliente por defecto y categorías de gasto iniciales."""
+
+
+def aplicar(conn):
+    # Cliente por defecto
+    if conn.execute("SELECT COUNT(*) FROM clientes").fetchone()[0] == 0:
+        conn.execute("INSERT INTO clientes (nombre, telefono, cuit) VALUES ('Consumidor Final', '', '')")
+
+    # ── Seed: categorías de gasto ─────────────────────────────────────────────
+    _CATEGORIAS = [
+        ('Alquiler',     'Alquiler del local u oficina'),
+        ('Servicios',    'Luz, gas, agua, internet, teléfono'),
+        ('Sueldos',      'Sueldos y cargas sociales del personal'),
+        ('Materiales',   'Insumos y materiales de trabajo'),
+        ('Transporte',   'Fletes, combustible y movilidad'),
+        ('Marketing',    'Publicidad y promociones'),
+        ('Impuestos',    'Impuestos, tasas y tributos'),
+        ('Mantenimiento','Reparaciones y mantenimiento'),
+        ('Bancarios',    'Comisiones y gastos bancarios'),
+        ('Otros',        'Gastos varios no categorizados'),
+    ]
+    for nombre, desc in _CATEGORIAS:
+        conn.execute("INSERT OR IGNORE INTO categorias_gasto (nombre, descripcion) VALUES (?,?)", (nombre, desc))
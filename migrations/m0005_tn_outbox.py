@@ -0,0 +1,21 @@
+# migrations/m0005_tn_outbox.py
+"""Cola persistente de sincronizaciones de stock/precio hacia TiendaNube."""
+
+
+def aplicar(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS tn_outbox (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        producto_id     INTEGER NOT NULL,
+        tipo            TEXT    NOT NULL,
+        estado          TEXT    NOT NULL DEFAULT 'pendiente',
+        intentos        INTEGER NOT NULL DEFAULT 0,
+        proximo_intento TEXT    NOT NULL,
+        ultimo_error    TEXT,
+        creado_en       TEXT    NOT NULL,
+        procesado_en    TEXT,
+        FOREIGN KEY (producto_id) REFERENCES productos(id)
+    )''')
+    # Un solo pendiente por (producto, tipo): el worker envía el valor vigente al procesar
+    conn.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_tn_outbox_pendiente
+                    ON tn_outbox(producto_id, tipo) WHERE estado = 'pendiente'""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tn_outbox_estado ON tn_outbox(estado, proximo_intento)")
@@ -0,0 +1,10 @@
+# migrations/m0006_tn_sync_estado.py
+"""Marcas de sincronización con TiendaNube (updated_at del último import)."""
+
+
+def aplicar(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS tn_sync_estado (
+        clave          TEXT PRIMARY KEY,
+        valor          TEXT,
+        actualizado_en TEXT NOT NULL
+    )''')
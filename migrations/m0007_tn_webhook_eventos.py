@@ -0,0 +1,28 @@
+# migrations/m0007_tn_webhook_eventos.py
+"""Cola de eventos de webhook de TiendaNube (se responde al instante y se procesa aparte)."""
+
+
+def aplicar(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS tn_webhook_eventos (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id        TEXT    NOT NULL,
+        evento          TEXT    NOT NULL,
+        estado          TEXT    NOT NULL DEFAULT 'pendiente',
+        intentos        INTEGER NOT NULL DEFAULT 0,
+        proximo_intento TEXT    NOT NULL,
+        ultimo_error    TEXT,
+        recibido_en     TEXT    NOT NULL,
+        procesado_en    TEXT,
+        UNIQUE (order_id, evento)
+    )''')
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_tn_webhook_eventos_estado
+                    ON tn_webhook_eventos(estado, proximo_intento)""")
+
+    # Las bases creadas desde cero no tenían el índice único de ventas.order_id;
+    # es la última defensa contra registrar dos veces la misma orden.
+    duplicadas = conn.execute("""
+        SELECT 1 FROM ventas WHERE order_id IS NOT NULL
+        GROUP BY order_id HAVING COUNT(*) > 1 LIMIT 1
+    """).fetchone()
+    if not duplicadas:
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_ventas_order_id ON ventas(order_id)")
@@ -0,0 +1,14 @@
+# migrations/m0008_afip_secuencias.py
+"""Numeración local de comprobantes AFIP por (punto de venta, tipo)."""
+
+
+def aplicar(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS afip_secuencias (
+        punto_venta     INTEGER NOT NULL,
+        cbte_tipo       INTEGER NOT NULL,
+        ultimo          INTEGER NOT NULL DEFAULT 0,
+        sincronizado    INTEGER NOT NULL DEFAULT 0,
+        bloqueado_hasta TEXT,
+        actualizado_en  TEXT,
+        PRIMARY KEY (punto_venta, cbte_tipo)
+    )''')
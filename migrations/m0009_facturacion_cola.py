@@ -0,0 +1,20 @@
+# migrations/m0009_facturacion_cola.py
+"""Cola de facturación electrónica: la emisión ante AFIP corre fuera del request."""
+
+
+def aplicar(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS facturacion_cola (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        venta_id        INTEGER NOT NULL UNIQUE,
+        estado          TEXT    NOT NULL DEFAULT 'pendiente',
+        intentos        INTEGER NOT NULL DEFAULT 0,
+        proximo_intento TEXT    NOT NULL,
+        ultimo_error    TEXT,
+        usuario_id      INTEGER,
+        username        TEXT,
+        creado_en       TEXT    NOT NULL,
+        procesado_en    TEXT,
+        FOREIGN KEY (venta_id) REFERENCES ventas(id)
+    )''')
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_facturacion_cola_estado
+                    ON facturacion_cola(estado, proximo_intento)""")
@@ -0,0 +1,53 @@
+# migrations/m0010_afip_tickets.py
+"""Tickets de acceso WSAA compartidos entre procesos.
+
+Reemplaza a .afip_ticket_cache.json: si el archivo existe se importan sus
+tickets vigentes, así el primer arranque no pide un TA nuevo a WSAA (que lo
+rechazaría con "CEE ya posee un TA valido").
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+_ARCHIVO_ANTERIOR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    '.afip_ticket_cache.json',
+)
+
+
+def aplicar(conn):
+    # Fechas en UTC ('%Y-%m-%d %H:%M:%S') para compararlas como texto
+    conn.execute('''CREATE TABLE IF NOT EXISTS afip_tickets (
+        cuit            TEXT NOT NULL,
+        modo            TEXT NOT NULL,
+        servicio        TEXT NOT NULL,
+        token           TEXT,
+        sign            TEXT,
+        expira          TEXT,
+        obtenido_en     TEXT,
+        renovando_hasta TEXT,
+        PRIMARY KEY (cuit, modo, servicio)
+    )''')
+
+    if not os.path.exists(_ARCHIVO_ANTERIOR):
+        return
+    from config.afip import AFIP_CONFIG
+    try:
+        with open(_ARCHIVO_ANTERIOR) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    ahora = datetime.now(timezone.utc)
+    for servicio, entry in data.items():
+        try:
+            expira = datetime.fromisoformat(entry['expira']).astimezone(timezone.utc)
+        except (KeyError, TypeError, ValueError):
+            continue
+        if expira <= ahora:
+            continue
+        conn.execute(
+            "INSERT OR IGNORE INTO afip_tickets (cuit, modo, servicio, token, sign, expira)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (AFIP_CONFIG['cuit'], AFIP_CONFIG['modo'], servicio, entry.get('token'),
+             entry.get('sign'), expira.strftime('%Y-%m-%d %H:%M:%S'))
+        )
@@ -0,0 +1,12 @@
+# migrations/m0011_padron_cache.py
+"""Caché local de consultas al Padrón A13 por CUIT."""
+
+
+def aplicar(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS padron_cache (
+        cuit           TEXT PRIMARY KEY,
+        datos          TEXT NOT NULL,
+        actualizado_en TEXT NOT NULL,
+        ultimo_error   TEXT,
+        ultimo_intento TEXT
+    )''')
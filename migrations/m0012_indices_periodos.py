@@ -0,0 +1,24 @@
+# migrations/m0012_indices_periodos.py
+"""Índices para los filtros por período (ver services/periodos.py).
+
+Empiezan por la columna de fecha, así el rango fecha >= ? AND fecha < ? se
+resuelve recorriendo solo ese tramo, y llevan las columnas que suman los
+reportes para no tener que leer la fila. Reemplazan a los índices simples
+sobre la fecha, que quedan como prefijo de estos.
+"""
+
+
+def aplicar(conn):
+    # Totales de ventas (inicio, resumen, rentabilidad); metodo_pago para el filtro por origen
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_ventas_fecha_estado_total
+                    ON ventas(fecha, estado, total, metodo_pago)""")
+    conn.execute("DROP INDEX IF EXISTS idx_ventas_fecha")
+
+    # Totales y categorías de gastos
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_gastos_fecha_categoria_monto
+                    ON gastos(fecha, categoria_id, monto)""")
+    conn.execute("DROP INDEX IF EXISTS idx_gastos_fecha")
+
+    # Pagos de importaciones del mes
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_import_pagos_fecha
+                    ON importacion_pagos(fecha_pago, monto_ars)""")
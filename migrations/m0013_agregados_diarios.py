@@ -0,0 +1,52 @@
+# migrations/m0013_agregados_diarios.py
+"""Totales diarios de ventas, costo de lo vendido y gastos (services/agregados_service.py)."""
+
+
+def aplicar(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS agg_ventas_diarias (
+        dia          TEXT    NOT NULL,
+        metodo_pago  TEXT,
+        cantidad     INTEGER NOT NULL DEFAULT 0,
+        total        REAL    NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, metodo_pago)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS agg_cogs_diario (
+        dia          TEXT    NOT NULL,
+        metodo_pago  TEXT,
+        unidades     REAL    NOT NULL DEFAULT 0,
+        cogs         REAL    NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, metodo_pago)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS agg_gastos_diarios (
+        dia          TEXT    NOT NULL,
+        categoria_id INTEGER NOT NULL,
+        cantidad     INTEGER NOT NULL DEFAULT 0,
+        total        REAL    NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, categoria_id)
+    )''')
+
+    # Carga inicial con lo que ya hay
+    conn.execute("""
+        INSERT INTO agg_ventas_diarias (dia, metodo_pago, cantidad, total)
+        SELECT substr(fecha, 1, 10), metodo_pago, COUNT(*), COALESCE(SUM(total), 0)
+        FROM ventas
+        WHERE estado IS NULL OR estado != 'cancelada'
+        GROUP BY substr(fecha, 1, 10), metodo_pago
+    """)
+    conn.execute("""
+        INSERT INTO agg_cogs_diario (dia, metodo_pago, unidades, cogs)
+        SELECT substr(v.fecha, 1, 10), v.metodo_pago,
+               SUM(dv.cantidad), SUM(dv.cantidad * p.costo)
+        FROM detalle_venta dv
+        JOIN ventas v    ON dv.venta_id    = v.id
+        JOIN productos p ON dv.producto_id = p.id
+        WHERE (v.estado IS NULL OR v.estado != 'cancelada')
+          AND COALESCE(p.costo, 0) > 0
+        GROUP BY substr(v.fecha, 1, 10), v.metodo_pago
+    """)
+    conn.execute("""
+        INSERT INTO agg_gastos_diarios (dia, categoria_id, cantidad, total)
+        SELECT substr(fecha, 1, 10), categoria_id, COUNT(*), COALESCE(SUM(monto), 0)
+        FROM gastos
+        GROUP BY substr(fecha, 1, 10), categoria_id
+    """)
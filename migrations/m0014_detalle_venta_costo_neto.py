@@ -0,0 +1,49 @@
+# migrations/m0014_detalle_venta_costo_neto.py
+"""Costo y neto de cada renglón vendido, fijados al registrar la venta.
+
+costo_unitario: productos.costo en el momento de la venta.
+neto:           cantidad * precio_unitario con la parte proporcional del
+                descuento de la venta (total / subtotal).
+
+Para las ventas anteriores el único costo disponible es el actual del
+producto; se usa ese.
+"""
+
+
+def aplicar(conn):
+    columnas = [r[1] for r in conn.execute("PRAGMA table_info(detalle_venta)").fetchall()]
+    for col, definicion in [
+        ("costo_unitario", "REAL"),
+        ("neto",           "REAL"),
+    ]:
+        if col not in columnas:
+            conn.execute(f"ALTER TABLE detalle_venta ADD COLUMN {col} {definicion}")
+
+    conn.execute("""
+        UPDATE detalle_venta
+        SET costo_unitario = (SELECT p.costo FROM productos p WHERE p.id = detalle_venta.producto_id)
+        WHERE costo_unitario IS NULL
+    """)
+    conn.execute("""
+        UPDATE detalle_venta
+        SET neto = cantidad * precio_unitario * COALESCE((
+            SELECT CASE WHEN COALESCE(v.subtotal, 0) > 0
+                        THEN CAST(v.total AS REAL) / v.subtotal
+                        ELSE 1.0 END
+            FROM ventas v WHERE v.id = detalle_venta.venta_id
+        ), 1.0)
+        WHERE neto IS NULL
+    """)
+
+    # El costo de lo vendido por día pasa a salir del costo fijado
+    conn.execute("DELETE FROM agg_cogs_diario")
+    conn.execute("""
+        INSERT INTO agg_cogs_diario (dia, metodo_pago, unidades, cogs)
+        SELECT substr(v.fecha, 1, 10), v.metodo_pago,
+               SUM(dv.cantidad), SUM(dv.cantidad * dv.costo_unitario)
+        FROM detalle_venta dv
+        JOIN ventas v ON dv.venta_id = v.id
+        WHERE (v.estado IS NULL OR v.estado != 'cancelada')
+          AND COALESCE(dv.costo_unitario, 0) > 0
+        GROUP BY substr(v.fecha, 1, 10), v.metodo_pago
+    """)
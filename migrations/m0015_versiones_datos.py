@@ -0,0 +1,17 @@
+# migrations/m0015_versiones_datos.py
+"""Versión de los datos de ventas y gastos (services/reportes_cache.py).
+
+Sube con cada escritura, en la misma transacción; los reportes guardados en
+memoria con otra versión dejan de servirse.
+"""
+
+
+def aplicar(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS versiones_datos (
+        tabla    TEXT    PRIMARY KEY,
+        version  INTEGER NOT NULL DEFAULT 0
+    )''')
+    conn.executemany(
+        "INSERT OR IGNORE INTO versiones_datos (tabla) VALUES (?)",
+        [('ventas',), ('gastos',)]
+    )
@@ -0,0 +1,24 @@
+# migrations/m0016_facturacion_cola_numeros.py
+"""Números reservados en la cola de facturación.
+
+lote:        identificador del worker que tomó la fila ('procesando').
+cbte_tipo, punto_venta, cbte_numero:
+             comprobante con el que se pidió el CAE. Si AFIP no respondió
+             la fila queda 'dudosa' y se verifica con FECompConsultar antes
+             de volver a emitir con otro número.
+cae:         CAE obtenido para una venta cancelada mientras se emitía
+             (estado 'huerfana'): falta anularlo con nota de crédito.
+"""
+
+
+def aplicar(conn):
+    columnas = [r[1] for r in conn.execute("PRAGMA table_info(facturacion_cola)").fetchall()]
+    for col, definicion in [
+        ("lote",        "TEXT"),
+        ("cbte_tipo",   "INTEGER"),
+        ("punto_venta", "INTEGER"),
+        ("cbte_numero", "INTEGER"),
+        ("cae",         "TEXT"),
+    ]:
+        if col not in columnas:
+            conn.execute(f"ALTER TABLE facturacion_cola ADD COLUMN {col} {definicion}")
@@ -0,0 +1,14 @@
+# migrations/m0017_indices_comprobantes.py
+"""Índices por fecha de emisión para el ZIP de comprobantes
+(services/facturas_export_service.comprobantes_en_rango).
+
+Parciales: solo entran las ventas con el comprobante emitido, que son las
+que filtra la consulta.
+"""
+
+
+def aplicar(conn):
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_ventas_factura_fecha
+                    ON ventas(factura_fecha) WHERE factura_emitida = 1""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_ventas_nota_credito_fecha
+                    ON ventas(nota_credito_fecha) WHERE nota_credito_emitida = 1""")
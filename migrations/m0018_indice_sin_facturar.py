@@ -0,0 +1,15 @@
+# migrations/m0018_indice_sin_facturar.py
+"""Índice de las ventas activas sin factura (services/facturacion_service:
+contar_sin_facturar, encolar_pendientes).
+
+El historial cuenta las ventas sin facturar en cada carga de página, sin
+rango de fechas. Parcial: solo entran las que cumplen el filtro, y lleva
+fecha y metodo_pago (rango y origen) más las columnas del filtro para
+contar sin leer la tabla.
+"""
+
+
+def aplicar(conn):
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_ventas_sin_facturar
+                    ON ventas(fecha, metodo_pago, factura_emitida, estado)
+                    WHERE factura_emitida = 0 AND estado != 'cancelada'""")
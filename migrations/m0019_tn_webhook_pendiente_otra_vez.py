@@ -0,0 +1,14 @@
+# migrations/m0019_tn_webhook_pendiente_otra_vez.py
+"""Eventos de webhook que llegan mientras se procesa el mismo evento.
+
+pendiente_otra_vez = 1: llegó un order/updated u order/cancelled de la orden
+mientras la fila estaba 'procesando'. El worker pudo haber leído la orden
+antes del cambio, así que al terminar la vuelve a dejar pendiente.
+"""
+
+
+def aplicar(conn):
+    columnas = [r[1] for r in conn.execute("PRAGMA table_info(tn_webhook_eventos)").fetchall()]
+    if "pendiente_otra_vez" not in columnas:
+        conn.execute("ALTER TABLE tn_webhook_eventos"
+                     " ADD COLUMN pendiente_otra_vez INTEGER NOT NULL DEFAULT 0")
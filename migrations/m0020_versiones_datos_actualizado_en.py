@@ -0,0 +1,13 @@
+# migrations/m0020_versiones_datos_actualizado_en.py
+"""Momento del último cambio de cada versión de datos (services/reportes_cache).
+
+Los PDF de reportes lo imprimen como "Datos actualizados al ...": sigue
+siendo cierto cuando services/pdf_pool devuelve un PDF ya generado, porque
+entra en los datos que arman la clave.
+"""
+
+
+def aplicar(conn):
+    columnas = [r[1] for r in conn.execute("PRAGMA table_info(versiones_datos)").fetchall()]
+    if "actualizado_en" not in columnas:
+        conn.execute("ALTER TABLE versiones_datos ADD COLUMN actualizado_en TEXT")
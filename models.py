@@ -1,581 +1,18 @@
 # models.py
-import sqlite3
-import os
 from datetime import datetime
-from werkzeug.security import generate_password_hash
-from services.tiendanube_service import actualizar_stock_tn_service
-
-# Path absoluto a la DB, resuelto desde la ubicación de este archivo
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, 'negocio.db')
-
-def get_conn():
-    """Abre una conexión con row_factory para acceder a columnas por nombre."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+from db import get_conn, get_conn_lectura, preparar_base
+from services import agregados_service, dashboard_service
+from services.tn_outbox_service import TIPOS_SYNC, encolar_sync_tn_en_conn, notificar_outbox_tn
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS productos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        sku TEXT UNIQUE NOT NULL,
-        descripcion TEXT NOT NULL,
-        precio REAL NOT NULL,
-        stock INTEGER DEFAULT 0,
-        variant_id TEXT UNIQUE,
-        product_id TEXT,
-        promotional_price REAL,
-        barcode TEXT,
-        imagen_url TEXT,
-        activo INTEGER DEFAULT 1
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS clientes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre TEXT NOT NULL,
-        cuit TEXT,
-        telefono TEXT,
-        dni TEXT,
-        email TEXT,
-        tipo INTEGER DEFAULT 0
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS ventas (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        fecha TEXT NOT NULL,
-        cliente_id INTEGER NOT NULL,
-        total REAL NOT NULL,
-        metodo_pago TEXT,
-        cuotas INTEGER,
-        order_id TEXT
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS detalle_venta (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        venta_id INTEGER NOT NULL,
-        producto_id INTEGER NOT NULL,
-        cantidad INTEGER NOT NULL,
-        precio_unitario REAL NOT NULL
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS usuarios (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL
-    )''')
-
-    # Migraciones seguras: agregar columnas nuevas si no existen
-    columnas_productos = [r[1] for r in c.execute("PRAGMA table_info(productos)").fetchall()]
-    for col, definition in [
-        ("promotional_price", "REAL"),
-        ("barcode", "TEXT"),
-        ("imagen_url", "TEXT"),
-        ("costo", "REAL"),
-    ]:
-        if col not in columnas_productos:
-            c.execute(f"ALTER TABLE productos ADD COLUMN {col} {definition}")
-
-    columnas_ventas = [r[1] for r in c.execute("PRAGMA table_info(ventas)").fetchall()]
-    if "order_id" not in columnas_ventas:
-        c.execute("ALTER TABLE ventas ADD COLUMN order_id TEXT")
-        c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_ventas_order_id ON ventas(order_id)")
-    if "estado" not in columnas_ventas:
-        c.execute("ALTER TABLE ventas ADD COLUMN estado TEXT NOT NULL DEFAULT 'activa'")
-    if "motivo_cancelacion" not in columnas_ventas:
-        c.execute("ALTER TABLE ventas ADD COLUMN motivo_cancelacion TEXT")
-    if "monto_recibido" not in columnas_ventas:
-        c.execute("ALTER TABLE ventas ADD COLUMN monto_recibido REAL")
-    if "vuelto" not in columnas_ventas:
-        c.execute("ALTER TABLE ventas ADD COLUMN vuelto REAL")
-    for col, defn in [
-        ("factura_emitida",       "INTEGER NOT NULL DEFAULT 0"),
-        ("factura_tipo",          "TEXT"),
-        ("factura_numero",        "INTEGER"),
-        ("factura_cae",           "TEXT"),
-        ("factura_cae_vto",       "TEXT"),
-        ("factura_pdf_path",      "TEXT"),
-        ("factura_fecha",         "TEXT"),
-        ("nota_credito_emitida",  "INTEGER NOT NULL DEFAULT 0"),
-        ("nota_credito_tipo",     "TEXT"),
-        ("nota_credito_numero",   "INTEGER"),
-        ("nota_credito_cae",      "TEXT"),
-        ("nota_credito_cae_vto",  "TEXT"),
-        ("nota_credito_pdf_path", "TEXT"),
-        ("nota_credito_fecha",    "TEXT"),
-        ("nota_credito_motivo",   "TEXT"),
-        # Descuentos
-        ("subtotal",              "REAL"),
-        ("descuento_tipo",        "TEXT NOT NULL DEFAULT 'ninguno'"),
-        ("descuento_valor",       "REAL NOT NULL DEFAULT 0"),
-        # Pagos parciales / señas
-        ("estado_pago",           "TEXT NOT NULL DEFAULT 'pagado_completo'"),
-        ("monto_pagado",          "REAL NOT NULL DEFAULT 0"),
-        ("saldo_pendiente",       "REAL NOT NULL DEFAULT 0"),
-    ]:
-        if col not in columnas_ventas:
-            c.execute(f"ALTER TABLE ventas ADD COLUMN {col} {defn}")
-    # Retrocompatibilidad: llenar subtotal en ventas anteriores que no lo tienen
-    c.execute("UPDATE ventas SET subtotal = total WHERE subtotal IS NULL")
-    c.execute("UPDATE ventas SET monto_pagado = total WHERE monto_pagado = 0 AND estado != 'cancelada'")
-
-    c.execute('''CREATE TABLE IF NOT EXISTS venta_pagos (
-        id             INTEGER PRIMARY KEY AUTOINCREMENT,
-        venta_id       INTEGER NOT NULL,
-        monto          REAL    NOT NULL,
-        metodo_pago    TEXT,
-        fecha_pago     TEXT    NOT NULL,
-        tipo           TEXT    NOT NULL DEFAULT 'saldo_final',
-        registrado_por INTEGER,
-        observaciones  TEXT,
-        FOREIGN KEY (venta_id) REFERENCES ventas(id)
-    )''')
-    c.execute("CREATE INDEX IF NOT EXISTS idx_venta_pagos_venta ON venta_pagos(venta_id)")
-    columnas_clientes = [r[1] for r in c.execute("PRAGMA table_info(clientes)").fetchall()]
-    for col, definition in [
-        ("dni",                  "TEXT"),
-        ("email",                "TEXT"),
-        ("tipo",                 "INTEGER DEFAULT 0"),
-        ("razon_social",         "TEXT"),
-        ("condicion_iva",        "TEXT NOT NULL DEFAULT 'consumidor_final'"),
-        ("domicilio_fiscal",     "TEXT"),
-        ("localidad",            "TEXT"),
-        ("provincia",            "TEXT"),
-        ("codigo_postal",        "TEXT"),
-        ("actividad_principal",  "TEXT"),
-        ("estado_afip",          "TEXT"),
-    ]:
-        if col not in columnas_clientes:
-            c.execute(f"ALTER TABLE clientes ADD COLUMN {col} {definition}")
-    # Cliente por defecto
-    c.execute("SELECT COUNT(*) FROM clientes")
-    if c.fetchone()[0] == 0:
-        c.execute("INSERT INTO clientes (nombre, telefono, cuit) VALUES ('Consumidor Final', '', '')")
-
-    # ── Presupuestos ────────────────────────────────────────────────────────
-    c.execute('''CREATE TABLE IF NOT EXISTS presupuestos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        numero TEXT UNIQUE NOT NULL,
-        cliente_id INTEGER NOT NULL,
-        fecha TEXT NOT NULL,
-        fecha_validez TEXT NOT NULL,
-        estado TEXT NOT NULL DEFAULT 'borrador',
-        total REAL NOT NULL DEFAULT 0,
-        observaciones TEXT,
-        creado_por INTEGER,
-        FOREIGN KEY (cliente_id) REFERENCES clientes(id)
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS presupuesto_items (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        presupuesto_id INTEGER NOT NULL,
-        producto_id INTEGER,
-        descripcion TEXT NOT NULL,
-        cantidad REAL NOT NULL DEFAULT 1,
-        precio_unitario REAL NOT NULL DEFAULT 0,
-        subtotal REAL NOT NULL DEFAULT 0,
-        FOREIGN KEY (presupuesto_id) REFERENCES presupuestos(id),
-        FOREIGN KEY (producto_id) REFERENCES productos(id)
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS presupuesto_historial (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        presupuesto_id INTEGER NOT NULL,
-        estado_anterior TEXT,
-        estado_nuevo TEXT NOT NULL,
-        fecha TEXT NOT NULL,
-        usuario_id INTEGER,
-        nota TEXT,
-        FOREIGN KEY (presupuesto_id) REFERENCES presupuestos(id)
-    )''')
-
-    columnas_presupuestos = [r[1] for r in c.execute("PRAGMA table_info(presupuestos)").fetchall()]
-    if 'venta_id' not in columnas_presupuestos:
-        c.execute("ALTER TABLE presupuestos ADD COLUMN venta_id INTEGER REFERENCES ventas(id)")
-
-    # ── Remitos ──────────────────────────────────────────────────────────────
-    c.execute('''CREATE TABLE IF NOT EXISTS remitos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        numero TEXT UNIQUE NOT NULL,
-        cliente_id INTEGER,
-        presupuesto_id INTEGER,
-        venta_id INTEGER,
-        destinatario TEXT NOT NULL,
-        direccion TEXT NOT NULL,
-        bultos INTEGER DEFAULT 1,
-        peso REAL,
-        estado TEXT NOT NULL DEFAULT 'pendiente',
-        fecha TEXT NOT NULL,
-        fecha_entrega_estimada TEXT,
-        fecha_entrega_real TEXT,
-        recibido_por TEXT,
-        observaciones TEXT,
-        stock_descontado INTEGER DEFAULT 0,
-        creado_por INTEGER,
-        FOREIGN KEY (cliente_id) REFERENCES clientes(id),
-        FOREIGN KEY (presupuesto_id) REFERENCES presupuestos(id),
-        FOREIGN KEY (venta_id) REFERENCES ventas(id)
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS remito_items (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        remito_id INTEGER NOT NULL,
-        producto_id INTEGER,
-        descripcion TEXT NOT NULL,
-        cantidad REAL NOT NULL DEFAULT 1,
-        FOREIGN KEY (remito_id) REFERENCES remitos(id),
-        FOREIGN KEY (producto_id) REFERENCES productos(id)
-    )''')
-
-    # ── Caja ─────────────────────────────────────────────────────────────────
-    c.execute('''CREATE TABLE IF NOT EXISTS movimientos_caja (
-        id            INTEGER PRIMARY KEY AUTOINCREMENT,
-        tipo          TEXT NOT NULL,
-        origen        TEXT NOT NULL,
-        referencia_id INTEGER,
-        descripcion   TEXT NOT NULL,
-        monto         REAL NOT NULL,
-        metodo_pago   TEXT,
-        fecha         TEXT NOT NULL,
-        creado_por    INTEGER REFERENCES usuarios(id)
-    )''')
-    c.execute("CREATE INDEX IF NOT EXISTS idx_caja_fecha  ON movimientos_caja(fecha)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_caja_tipo   ON movimientos_caja(tipo)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_caja_origen ON movimientos_caja(origen)")
-
-    # ── Gastos ───────────────────────────────────────────────────────────────
-    c.execute('''CREATE TABLE IF NOT EXISTS categorias_gasto (
-        id          INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre      TEXT UNIQUE NOT NULL,
-        descripcion TEXT,
-        activo      INTEGER DEFAULT 1
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS gastos (
-        id                      INTEGER PRIMARY KEY AUTOINCREMENT,
-        categoria_id            INTEGER NOT NULL,
-        descripcion             TEXT NOT NULL,
-        monto                   REAL NOT NULL,
-        fecha                   TEXT NOT NULL,
-        metodo_pago             TEXT,
-        es_recurrente           INTEGER DEFAULT 0,
-        frecuencia              TEXT,
-        gasto_padre_id          INTEGER,
-        fecha_prox_recurrencia  TEXT,
-        archivo_nombre          TEXT,
-        archivo_ruta            TEXT,
-        observaciones           TEXT,
-        creado_por              INTEGER,
-        FOREIGN KEY (categoria_id)   REFERENCES categorias_gasto(id),
-        FOREIGN KEY (gasto_padre_id) REFERENCES gastos(id),
-        FOREIGN KEY (creado_por)     REFERENCES usuarios(id)
-    )''')
-
-    # ── Roles y permisos ──────────────────────────────────────────────────────
-    c.execute('''CREATE TABLE IF NOT EXISTS roles (
-        id          INTEGER PRIMARY KEY,
-        nombre      TEXT UNIQUE NOT NULL,
-        nivel       INTEGER NOT NULL,
-        descripcion TEXT
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS rol_permisos (
-        rol_id  INTEGER NOT NULL,
-        modulo  TEXT NOT NULL,
-        accion  TEXT NOT NULL,
-        PRIMARY KEY (rol_id, modulo, accion),
-        FOREIGN KEY (rol_id) REFERENCES roles(id)
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS audit_log (
-        id         INTEGER PRIMARY KEY AUTOINCREMENT,
-        usuario_id INTEGER,
-        username   TEXT,
-        accion     TEXT NOT NULL,
-        modulo     TEXT NOT NULL,
-        detalle    TEXT,
-        ip         TEXT,
-        fecha      TEXT NOT NULL,
-        FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
-    )''')
-
-    # Índices para acelerar búsquedas frecuentes
-    c.execute("CREATE INDEX IF NOT EXISTS idx_productos_sku ON productos(sku)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas(fecha)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_detalle_venta_venta_id ON detalle_venta(venta_id)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_detalle_venta_producto_id ON detalle_venta(producto_id)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_clientes_email ON clientes(email)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_clientes_dni ON clientes(dni)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_presupuestos_cliente ON presupuestos(cliente_id)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_presupuestos_estado ON presupuestos(estado)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_presupuesto_items ON presupuesto_items(presupuesto_id)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_remitos_cliente ON remitos(cliente_id)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_remitos_estado ON remitos(estado)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_remito_items ON remito_items(remito_id)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_usuario ON audit_log(usuario_id)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_fecha   ON audit_log(fecha)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_modulo  ON audit_log(modulo)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_gastos_fecha      ON gastos(fecha)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_gastos_categoria  ON gastos(categoria_id)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_gastos_recurrente ON gastos(es_recurrente)")
-
-    # ── Proveedores (del exterior) ────────────────────────────────────────────
-    c.execute('''CREATE TABLE IF NOT EXISTS proveedores (
-        id       INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre   TEXT NOT NULL,
-        pais     TEXT,
-        contacto TEXT,
-        telefono TEXT,
-        email    TEXT,
-        notas    TEXT
-    )''')
-
-    # ── Importaciones (orden de compra al exterior) ───────────────────────────
-    c.execute('''CREATE TABLE IF NOT EXISTS importaciones (
-        id              INTEGER PRIMARY KEY AUTOINCREMENT,
-        proveedor_id    INTEGER NOT NULL,
-        numero          TEXT UNIQUE NOT NULL,
-        fecha_pedido    TEXT NOT NULL,
-        fecha_pago      TEXT,
-        fecha_llegada   TEXT,
-        estado          TEXT NOT NULL DEFAULT 'pendiente_pago',
-        moneda_origen   TEXT NOT NULL DEFAULT 'USD',
-        tipo_cambio     REAL NOT NULL DEFAULT 1,
-        observaciones   TEXT,
-        FOREIGN KEY (proveedor_id) REFERENCES proveedores(id)
-    )''')
-
-    c.execute('''CREATE TABLE IF NOT EXISTS importacion_items (
-        id                   INTEGER PRIMARY KEY AUTOINCREMENT,
-        importacion_id       INTEGER NOT NULL,
-        producto_id          INTEGER,
-        descripcion          TEXT NOT NULL,
-        cantidad             REAL NOT NULL DEFAULT 1,
-        precio_unitario_fob  REAL NOT NULL DEFAULT 0,
-        costo_final_unitario REAL,
-        FOREIGN KEY (importacion_id) REFERENCES importaciones(id),
-        FOREIGN KEY (producto_id)    REFERENCES productos(id)
-    )''')
-
-    c.execute('''CREATE TABLE IF NOT EXISTS importacion_gastos (
-        id                 INTEGER PRIMARY KEY AUTOINCREMENT,
-        importacion_id     INTEGER NOT NULL,
-        tipo               TEXT NOT NULL,
-        descripcion        TEXT,
-        monto              REAL NOT NULL DEFAULT 0,
-        comprobante_nombre TEXT,
-        comprobante_ruta   TEXT,
-        FOREIGN KEY (importacion_id) REFERENCES importaciones(id)
-    )''')
-
-    c.execute("CREATE INDEX IF NOT EXISTS idx_importaciones_proveedor ON importaciones(proveedor_id)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_importaciones_estado    ON importaciones(estado)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_import_items_imp        ON importacion_items(importacion_id)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_import_gastos_imp       ON importacion_gastos(importacion_id)")
-
-    c.execute('''CREATE TABLE IF NOT EXISTS importacion_documentos (
-        id              INTEGER PRIMARY KEY AUTOINCREMENT,
-        importacion_id  INTEGER NOT NULL,
-        tipo_documento  TEXT NOT NULL,
-        nombre_archivo  TEXT NOT NULL,
-        ruta_archivo    TEXT NOT NULL,
-        descripcion     TEXT,
-        subido_por      INTEGER,
-        fecha_subida    TEXT NOT NULL,
-        FOREIGN KEY (importacion_id) REFERENCES importaciones(id),
-        FOREIGN KEY (subido_por)     REFERENCES usuarios(id)
-    )''')
-    c.execute("CREATE INDEX IF NOT EXISTS idx_import_docs_imp ON importacion_documentos(importacion_id)")
-
-    c.execute('''CREATE TABLE IF NOT EXISTS importacion_pagos (
-        id               INTEGER PRIMARY KEY AUTOINCREMENT,
-        importacion_id   INTEGER NOT NULL,
-        monto            REAL    NOT NULL DEFAULT 0,
-        tipo_cambio      REAL    NOT NULL DEFAULT 1,
-        monto_ars        REAL    NOT NULL DEFAULT 0,
-        fecha_pago       TEXT    NOT NULL,
-        metodo_pago      TEXT,
-        comprobante      TEXT,
-        registrado_por   INTEGER,
-        FOREIGN KEY (importacion_id) REFERENCES importaciones(id),
-        FOREIGN KEY (registrado_por) REFERENCES usuarios(id)
-    )''')
-    c.execute("CREATE INDEX IF NOT EXISTS idx_import_pagos_imp ON importacion_pagos(importacion_id)")
-
-    # ── Extender proveedores: tipo, cuit, condicion_iva, direccion ────────────
-    _cols_prov = [r[1] for r in c.execute("PRAGMA table_info(proveedores)").fetchall()]
-    for _col, _def in [
-        ('tipo',          "TEXT NOT NULL DEFAULT 'internacional'"),
-        ('cuit',          'TEXT'),
-        ('condicion_iva', 'TEXT'),
-        ('direccion',     'TEXT'),
-    ]:
-        if _col not in _cols_prov:
-            c.execute(f"ALTER TABLE proveedores ADD COLUMN {_col} {_def}")
-
-    # ── Compras Nacionales ────────────────────────────────────────────────────
-    c.execute('''CREATE TABLE IF NOT EXISTS compras (
-        id                       INTEGER PRIMARY KEY AUTOINCREMENT,
-        proveedor_id             INTEGER NOT NULL,
-        numero                   TEXT UNIQUE NOT NULL,
-        fecha                    TEXT NOT NULL,
-        estado                   TEXT NOT NULL DEFAULT 'pendiente_pago',
-        numero_factura_proveedor TEXT,
-        observaciones            TEXT,
-        FOREIGN KEY (proveedor_id) REFERENCES proveedores(id)
-    )''')
-
-    c.execute('''CREATE TABLE IF NOT EXISTS compra_items (
-        id               INTEGER PRIMARY KEY AUTOINCREMENT,
-        compra_id        INTEGER NOT NULL,
-        producto_id      INTEGER,
-        descripcion      TEXT NOT NULL,
-        cantidad         REAL NOT NULL DEFAULT 1,
-        costo_unitario   REAL NOT NULL DEFAULT 0,
-        cantidad_recibida REAL NOT NULL DEFAULT 0,
-        FOREIGN KEY (compra_id)   REFERENCES compras(id),
-        FOREIGN KEY (producto_id) REFERENCES productos(id)
-    )''')
-
-    c.execute('''CREATE TABLE IF NOT EXISTS compra_pagos (
-        id             INTEGER PRIMARY KEY AUTOINCREMENT,
-        compra_id      INTEGER NOT NULL,
-        monto          REAL    NOT NULL DEFAULT 0,
-        metodo_pago    TEXT,
-        fecha_pago     TEXT    NOT NULL,
-        comprobante    TEXT,
-        registrado_por INTEGER,
-        FOREIGN KEY (compra_id)      REFERENCES compras(id),
-        FOREIGN KEY (registrado_por) REFERENCES usuarios(id)
-    )''')
-
-    c.execute("CREATE INDEX IF NOT EXISTS idx_compras_proveedor ON compras(proveedor_id)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_compras_estado    ON compras(estado)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_compra_items_cmp  ON compra_items(compra_id)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_compra_pagos_cmp  ON compra_pagos(compra_id)")
-
-    _cols_imp = [r[1] for r in c.execute("PRAGMA table_info(importaciones)").fetchall()]
-    for _col, _def in [
-        ('naviera',         'TEXT'),
-        ('numero_tracking', 'TEXT'),
-        ('eta',             'TEXT'),
-        ('contenedor',      'TEXT'),
-    ]:
-        if _col not in _cols_imp:
-            c.execute(f"ALTER TABLE importaciones ADD COLUMN {_col} {_def}")
-
-    _cols_items = [r[1] for r in c.execute("PRAGMA table_info(importacion_items)").fetchall()]
-    if 'cantidad_recibida' not in _cols_items:
-        c.execute("ALTER TABLE importacion_items ADD COLUMN cantidad_recibida REAL DEFAULT 0")
-
-    # ── Migrar remitos: campos de retiro por terceros ────────────────────────
-    columnas_remitos = [r[1] for r in c.execute("PRAGMA table_info(remitos)").fetchall()]
-    for col, definition in [
-        ("retira_nombre",        "TEXT"),
-        ("retira_dni",           "TEXT"),
-        ("retiro_observaciones", "TEXT"),
-    ]:
-        if col not in columnas_remitos:
-            c.execute(f"ALTER TABLE remitos ADD COLUMN {col} {definition}")
-
-    # ── Migrar usuarios: agregar rol_id ──────────────────────────────────────
-    columnas_usuarios = [r[1] for r in c.execute("PRAGMA table_info(usuarios)").fetchall()]
-    if 'rol_id' not in columnas_usuarios:
-        c.execute("ALTER TABLE usuarios ADD COLUMN rol_id INTEGER REFERENCES roles(id)")
-
-    # ── Seed: roles ──────────────────────────────────────────────────────────
-    _ROLES = [
-        (1, 'SuperAdmin', 1, 'Acceso total al sistema'),
-        (2, 'Admin',      2, 'Gestión completa del negocio'),
-        (3, 'Supervisor', 3, 'Supervisión de operaciones'),
-        (4, 'Vendedor',   4, 'Ventas y presupuestos'),
-        (5, 'Deposito',   5, 'Inventario y logística'),
-    ]
-    for row in _ROLES:
-        c.execute("INSERT OR IGNORE INTO roles (id, nombre, nivel, descripcion) VALUES (?,?,?,?)", row)
-
-    # ── Seed: permisos por rol (SuperAdmin no necesita filas; se chequea por nivel) ──
-    _PERMISOS = [
-        # Admin (2) — todo excepto que no puede eliminar usuarios
-        (2,'inventario','ver'),   (2,'inventario','crear'), (2,'inventario','editar'),
-        (2,'inventario','eliminar'), (2,'inventario','importar'),
-        (2,'ventas','ver'),       (2,'ventas','crear'),     (2,'ventas','cancelar'),
-        (2,'clientes','ver'),     (2,'clientes','crear'),   (2,'clientes','editar'), (2,'clientes','eliminar'),
-        (2,'presupuestos','ver'), (2,'presupuestos','crear'),(2,'presupuestos','editar'),
-        (2,'presupuestos','eliminar'), (2,'presupuestos','cambiar_estado'),
-        (2,'remitos','ver'),      (2,'remitos','crear'),    (2,'remitos','editar'),
-        (2,'remitos','eliminar'), (2,'remitos','cambiar_estado'),
-        (2,'reportes','ver'),
-        (2,'tiendanube','ver'),   (2,'tiendanube','sincronizar'),
-        (2,'usuarios','ver'),     (2,'usuarios','crear'),   (2,'usuarios','editar'),
-        (2,'audit_log','ver'),
-        (2,'gastos','ver'),       (2,'gastos','crear'),     (2,'gastos','editar'), (2,'gastos','eliminar'),
-        (2,'caja','ver'),         (2,'caja','crear'),
-        (2,'resumen','ver'),
-        # Supervisor (3)
-        (3,'inventario','ver'),
-        (3,'ventas','ver'),       (3,'ventas','crear'),     (3,'ventas','cancelar'),
-        (3,'clientes','ver'),     (3,'clientes','crear'),   (3,'clientes','editar'),
-        (3,'presupuestos','ver'), (3,'presupuestos','crear'),(3,'presupuestos','editar'),
-        (3,'presupuestos','cambiar_estado'),
-        (3,'remitos','ver'),      (3,'remitos','crear'),    (3,'remitos','editar'),
-        (3,'remitos','cambiar_estado'),
-        (3,'reportes','ver'),
-        (3,'gastos','ver'),
-        (3,'caja','ver'),         (3,'caja','crear'),
-        (3,'resumen','ver'),
-        # Vendedor (4)
-        (4,'inventario','ver'),
-        (4,'ventas','ver'),       (4,'ventas','crear'),
-        (4,'clientes','ver'),     (4,'clientes','crear'),
-        (4,'presupuestos','ver'), (4,'presupuestos','crear'),(4,'presupuestos','editar'),
-        (4,'presupuestos','cambiar_estado'),
-        (4,'remitos','ver'),
-        (4,'reportes','ver'),
-        # Depósito (5)
-        (5,'inventario','ver'),   (5,'inventario','crear'), (5,'inventario','editar'),
-        (5,'inventario','importar'),
-        (5,'remitos','ver'),      (5,'remitos','editar'),   (5,'remitos','cambiar_estado'),
-        (5,'clientes','ver'),
-        (5,'reportes','ver'),
-    ]
-    for row in _PERMISOS:
-        c.execute("INSERT OR IGNORE INTO rol_permisos (rol_id, modulo, accion) VALUES (?,?,?)", row)
-
-    _PERMISOS_IMP = [
-        (2,'importaciones','ver'), (2,'importaciones','crear'), (2,'importaciones','editar'),
-        (2,'importaciones','eliminar'), (2,'importaciones','cerrar'),
-        (3,'importaciones','ver'), (3,'importaciones','crear'), (3,'importaciones','editar'),
-        (3,'importaciones','cerrar'),
-        (4,'importaciones','ver'),
-        (5,'importaciones','ver'),
-    ]
-    for row in _PERMISOS_IMP:
-        c.execute("INSERT OR IGNORE INTO rol_permisos (rol_id, modulo, accion) VALUES (?,?,?)", row)
-
-    _PERMISOS_COMP = [
-        (2,'compras','ver'), (2,'compras','crear'), (2,'compras','editar'),
-        (2,'compras','eliminar'), (2,'compras','cerrar'),
-        (3,'compras','ver'), (3,'compras','crear'), (3,'compras','editar'),
-        (3,'compras','cerrar'),
-        (4,'compras','ver'),
-        (5,'compras','ver'),
-    ]
-    for row in _PERMISOS_COMP:
-        c.execute("INSERT OR IGNORE INTO rol_permisos (rol_id, modulo, accion) VALUES (?,?,?)", row)
-
-    # Usuarios existentes sin rol → SuperAdmin
-    c.execute("UPDATE usuarios SET rol_id = 1 WHERE rol_id IS NULL")
-
-    # ── Seed: categorías de gasto ─────────────────────────────────────────────
-    _CATEGORIAS = [
-        ('Alquiler',     'Alquiler del local u oficina'),
-        ('Servicios',    'Luz, gas, agua, internet, teléfono'),
-        ('Sueldos',      'Sueldos y cargas sociales del personal'),
-        ('Materiales',   'Insumos y materiales de trabajo'),
-        ('Transporte',   'Fletes, combustible y movilidad'),
-        ('Marketing',    'Publicidad y promociones'),
-        ('Impuestos',    'Impuestos, tasas y tributos'),
-        ('Mantenimiento','Reparaciones y mantenimiento'),
-        ('Bancarios',    'Comisiones y gastos bancarios'),
-        ('Otros',        'Gastos varios no categorizados'),
-    ]
-    for nombre, desc in _CATEGORIAS:
-        c.execute("INSERT OR IGNORE INTO categorias_gasto (nombre, descripcion) VALUES (?,?)", (nombre, desc))
-
-    conn.commit()
-    conn.close()
+    """Prepara la base y aplica solo las migraciones pendientes (ver migrations/)."""
+    from migrations import aplicar_pendientes
+    preparar_base()
+    conn = get_conn()
+    try:
+        aplicar_pendientes(conn)
+    finally:
+        conn.close()
 
 
 # === Productos ===
@@ -623,18 +60,11 @@ def update_producto(producto_id, sku, descripcion, precio, stock, costo=None):
         "UPDATE productos SET sku = ?, descripcion = ?, precio = ?, stock = ?, costo = ? WHERE id = ?",
         (sku, descripcion, precio, stock, costo, producto_id)
     )
+    # Sincronizar con TiendaNube si el producto está vinculado (vía tn_outbox)
+    encolar_sync_tn_en_conn(conn, producto_id, TIPOS_SYNC)
     conn.commit()
-
-    # Sincronizar con TiendaNube si el producto está vinculado
-    row = conn.execute(
-        "SELECT variant_id, product_id FROM productos WHERE id = ?", (producto_id,)
-    ).fetchone()
     conn.close()
-
-    if row and row["variant_id"]:
-        from services.tiendanube_service import actualizar_stock_tn_service, actualizar_precio_tn_service
-        actualizar_stock_tn_service(row["variant_id"], stock)
-        actualizar_precio_tn_service(row["variant_id"], row["product_id"], precio)
+    notificar_outbox_tn()
 
 def delete_producto(producto_id):
     conn = get_conn()
@@ -706,13 +136,15 @@ def registrar_venta(cliente_id, carrito, metodo_pago, cuotas=None,
                     es_sena=False, monto_sena=None):
     conn = get_conn()
     try:
-        # Verificar stock
+        # Verificar stock (y tomar el costo vigente para el detalle)
+        costos = {}
         for item in carrito:
             row = conn.execute(
-                "SELECT stock FROM productos WHERE id = ?", (item['id'],)
+                "SELECT stock, costo FROM productos WHERE id = ?", (item['id'],)
             ).fetchone()
             if not row or (row['stock'] is not None and row['stock'] < item['cantidad']):
                 return False, f"Stock insuficiente para {item['descripcion']}"
+            costos[item['id']] = row['costo']
 
         fecha    = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         subtotal = sum(item['precio'] * item['cantidad'] for item in carrito)
@@ -754,17 +186,21 @@ def registrar_venta(cliente_id, carrito, metodo_pago, cuotas=None,
         )
         venta_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
 
-        # Detalle y stock
+        # Detalle y stock; neto = renglón con su parte del descuento
+        proporcion = total_venta / subtotal if subtotal > 0 else 1.0
         for item in carrito:
             conn.execute(
-                "INSERT INTO detalle_venta (venta_id, producto_id, cantidad, precio_unitario)"
-                " VALUES (?, ?, ?, ?)",
-                (venta_id, item['id'], item['cantidad'], item['precio'])
+                "INSERT INTO detalle_venta"
+                " (venta_id, producto_id, cantidad, precio_unitario, costo_unitario, neto)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (venta_id, item['id'], item['cantidad'], item['precio'], costos[item['id']],
+                 item['cantidad'] * item['precio'] * proporcion)
             )
             conn.execute(
                 "UPDATE productos SET stock = stock - ? WHERE id = ?",
                 (item['cantidad'], item['id'])
             )
+            encolar_sync_tn_en_conn(conn, item['id'])
 
         # Ingreso en caja por el monto efectivamente cobrado
         from services.caja_service import registrar_movimiento_en_conn
@@ -782,16 +218,11 @@ def registrar_venta(cliente_id, carrito, metodo_pago, cuotas=None,
                VALUES (?, ?, ?, ?, ?, ?)""",
             (venta_id, monto_caja, metodo_pago, fecha, tipo_pago, creado_por)
         )
+        agregados_service.refrescar_ventas_en_conn(conn, fecha)
 
         conn.commit()
-
-        # Sincronizar stock con Tiendanube
-        for item in carrito:
-            variant_row = conn.execute(
-                "SELECT variant_id, stock FROM productos WHERE id = ?", (item['id'],)
-            ).fetchone()
-            if variant_row and variant_row['variant_id']:
-                actualizar_stock_tn_service(variant_row['variant_id'], variant_row['stock'])
+        notificar_outbox_tn()  # el stock viaja a Tiendanube en segundo plano
+        dashboard_service.venta_registrada(venta_id, fecha, total_venta, cliente_id)
 
         return True, venta_id
 
@@ -852,34 +283,14 @@ def get_detalle_venta(venta_id):
 # === Dashboard ===
 
 def get_dashboard_data():
+    """Conteos de productos y clientes más los KPIs de ventas, que salen de
+    la caché de services/dashboard_service sin leer la tabla ventas."""
     conn = get_conn()
     total_productos = conn.execute("SELECT COUNT(*) FROM productos").fetchone()[0]
     total_clientes  = conn.execute("SELECT COUNT(*) FROM clientes").fetchone()[0]
-    hoy = datetime.now().strftime('%Y-%m-%d')
-    ventas_hoy = conn.execute(
-        "SELECT COUNT(*), COALESCE(SUM(total), 0) FROM ventas"
-        " WHERE fecha LIKE ? AND (estado IS NULL OR estado != 'cancelada')", (hoy + '%',)
-    ).fetchone()
-    mes_actual = datetime.now().strftime('%Y-%m')
-    ventas_mes = conn.execute(
-        "SELECT COUNT(*), COALESCE(SUM(total), 0) FROM ventas"
-        " WHERE strftime('%Y-%m', fecha) = ? AND (estado IS NULL OR estado != 'cancelada')",
-        (mes_actual,)
-    ).fetchone()
-    ultimas_ventas = conn.execute("""
-        SELECT v.id, v.fecha, c.nombre, v.total
-        FROM ventas v
-        JOIN clientes c ON v.cliente_id = c.id
-        WHERE v.estado IS NULL OR v.estado != 'cancelada'
-        ORDER BY v.fecha DESC LIMIT 5
-    """).fetchall()
     conn.close()
     return {
-        'total_productos':     total_productos,
-        'total_clientes':      total_clientes,
-        'cantidad_ventas_hoy': ventas_hoy[0],
-        'total_ventas_hoy':    ventas_hoy[1],
-        'cantidad_ventas_mes': ventas_mes[0],
-        'total_ventas_mes':    ventas_mes[1],
-        'ultimas_ventas':      ultimas_ventas,
+        'total_productos': total_productos,
+        'total_clientes':  total_clientes,
+        **dashboard_service.kpis_ventas(),
     }
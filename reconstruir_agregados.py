@@ -0,0 +1,23 @@
+# reconstruir_agregados.py
+# Uso: python reconstruir_agregados.py [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]
+#
+# Rearma los totales diarios (agg_ventas_diarias, agg_cogs_diario,
+# agg_gastos_diarios) desde ventas y gastos. Hace falta después de cargar o
+# corregir datos por fuera del sistema; sin fechas recorre toda la historia.
+
+import argparse
+import logging
+
+from models import init_db
+from services.agregados_service import reconstruir
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rearma los totales diarios de ventas y gastos")
+    parser.add_argument('--desde', help="primer día a rearmar (AAAA-MM-DD)")
+    parser.add_argument('--hasta', help="último día a rearmar (AAAA-MM-DD)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    cuentas = reconstruir(args.desde, args.hasta)
+    print(" " + ", ".join(f"{tabla}: {n} renglones" for tabla, n in cuentas.items()))
@@ -0,0 +1,24 @@
+# refrescar_padron.py
+# Uso: python refrescar_padron.py [--todos]
+#
+# Actualiza la caché del Padrón A13 (padron_cache) para los CUIT de clientes.
+# Pensado para correr de noche desde cron; sin --todos solo consulta los vencidos.
+
+import argparse
+import logging
+
+from models import init_db
+from services.padron_service import refrescar_padron_clientes
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Actualiza la caché del Padrón A13")
+    parser.add_argument('--todos', action='store_true',
+                        help="consultar también los CUIT con datos vigentes")
+    parser.add_argument('--pausa', type=float, default=0.2,
+                        help="segundos entre consultas a AFIP")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    r = refrescar_padron_clientes(todos=args.todos, pausa_seg=args.pausa)
+    print(f" {r['actualizados']} actualizados, {r['vigentes']} vigentes, {r['errores']} con error.")
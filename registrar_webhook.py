@@ -5,16 +5,10 @@
 # Ejecutar cada vez que cambie la URL de ngrok.
 
 import sys
-import os
-import requests
-from dotenv import load_dotenv
 
-load_dotenv()
+from services import tn_client
 
-TOKEN    = os.getenv("TN_ACCESS_TOKEN")
-STORE_ID = os.getenv("TN_STORE_ID")
-
-if not TOKEN or not STORE_ID:
+if not tn_client.configurado():
     print("❌ Faltan TN_ACCESS_TOKEN o TN_STORE_ID en el .env")
     sys.exit(1)
 
@@ -25,19 +19,11 @@ if len(sys.argv) < 2:
 ngrok_url   = sys.argv[1].rstrip("/")
 webhook_url = f"{ngrok_url}/webhook/tiendanube"
 
-HEADERS = {
-    "Authentication": f"bearer {TOKEN}",
-    "User-Agent":     "Comenda App (mateopatatian@gmail.com)",
-    "Content-Type":   "application/json"
-}
-
-BASE = f"https://api.tiendanube.com/v1/{STORE_ID}/webhooks"
-
 # -------------------------------------------------------------------
 # 1. Listar webhooks existentes y eliminar los de order/paid viejos
 # -------------------------------------------------------------------
 print("🔍 Buscando webhooks existentes...")
-r = requests.get(BASE, headers=HEADERS)
+r = tn_client.get("webhooks", endpoint="webhooks")
 
 if r.status_code != 200:
     print(f"❌ Error al listar webhooks: {r.status_code} - {r.text}")
@@ -47,7 +33,7 @@ webhooks = r.json()
 for wh in webhooks:
     if wh.get("event") == "order/paid":
         wh_id = wh["id"]
-        rd = requests.delete(f"{BASE}/{wh_id}", headers=HEADERS)
+        rd = tn_client.delete(f"webhooks/{wh_id}", endpoint="webhooks")
         if rd.status_code in (200, 204):
             print(f"🗑  Webhook viejo eliminado (id={wh_id}, url={wh.get('url')})")
         else:
@@ -61,7 +47,7 @@ payload = {
     "event": "order/paid",
     "url":   webhook_url
 }
-r = requests.post(BASE, json=payload, headers=HEADERS)
+r = tn_client.post("webhooks", endpoint="webhooks", json=payload)
 
 if r.status_code in (200, 201):
     data = r.json()
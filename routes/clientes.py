@@ -41,8 +41,8 @@ def consultar_cuit():
     if len(cuit) != 11 or not cuit.isdigit():
         return jsonify({'ok': False, 'error': 'CUIT inválido (debe tener 11 dígitos)'}), 400
     try:
-        from services.afip_service import consultar_cuit_padron
-        datos = consultar_cuit_padron(cuit)
+        from services.padron_service import consultar_cuit
+        datos = consultar_cuit(cuit)
         return jsonify({'ok': True, **datos})
     except Exception as e:
         logger.warning("Error consultando CUIT %s: %s", cuit, str(e))
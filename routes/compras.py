@@ -1,4 +1,5 @@
 # routes/compras.py
+import logging
 from datetime import date
 
 from flask import (Blueprint, flash, g, redirect, render_template,
@@ -11,12 +12,14 @@ from services.compras_service import (
     actualizar_compra, actualizar_proveedor_nacional,
     agregar_item, calcular_totales, cerrar_compra,
     crear_compra, crear_proveedor_nacional,
-    eliminar_item, eliminar_proveedor_nacional,
-    generar_pdf_compra,
+    datos_pdf_compra, eliminar_item, eliminar_proveedor_nacional,
     get_compra, get_compra_items, get_compra_pagos,
     get_proveedor, listar_compras, listar_proveedores_nacionales,
-    registrar_pago, registrar_recepcion,
+    registrar_pago, registrar_recepcion, render_pdf_compra,
 )
+from services.pdf_pool import obtener_pdf
+
+logger = logging.getLogger(__name__)
 
 compras_bp = Blueprint('compras', __name__)
 
@@ -274,17 +277,19 @@ def cerrar(compra_id):
 @login_required
 @require_permiso('compras', 'ver')
 def generar_pdf_route(compra_id):
-    compra = get_compra(compra_id)
-    if not compra:
+    datos = datos_pdf_compra(compra_id)
+    if not datos:
         flash("Compra no encontrada", "error")
         return redirect(url_for('compras.lista'))
-    buf = generar_pdf_compra(compra_id)
-    if not buf:
+    try:
+        ruta = obtener_pdf('compra', render_pdf_compra, datos)
+    except Exception:
+        logger.exception("Error generando PDF de compra %s", compra_id)
         flash("Error al generar el PDF", "error")
         return redirect(url_for('compras.detalle', compra_id=compra_id))
-    return send_file(buf,
+    return send_file(ruta,
                      as_attachment=True,
-                     download_name=f"compra_{compra['numero']}.pdf",
+                     download_name=f"compra_{datos['compra']['numero']}.pdf",
                      mimetype='application/pdf')
 
 
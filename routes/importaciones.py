@@ -1,4 +1,5 @@
 # routes/importaciones.py
+import logging
 import os
 import uuid
 
@@ -13,14 +14,17 @@ from services.importaciones_service import (
     actualizar_importacion, actualizar_proveedor, actualizar_seguimiento,
     agregar_documento, agregar_gasto_importacion, agregar_item,
     calcular_costos, cambiar_estado, cerrar_importacion,
-    crear_importacion, crear_proveedor,
+    crear_importacion, crear_proveedor, datos_pdf_importacion,
     eliminar_documento, eliminar_gasto_importacion, eliminar_item, eliminar_proveedor,
-    generar_pdf_importacion, get_dashboard_data,
+    get_dashboard_data,
     get_importacion, get_importacion_documentos, get_importacion_gastos,
     get_importacion_items, get_importacion_pagos,
     get_proveedor, listar_importaciones, listar_proveedores,
-    registrar_pago_parcial, registrar_recepcion,
+    registrar_pago_parcial, registrar_recepcion, render_pdf_importacion,
 )
+from services.pdf_pool import obtener_pdf
+
+logger = logging.getLogger(__name__)
 
 importaciones_bp = Blueprint('importaciones', __name__)
 
@@ -472,17 +476,19 @@ def dashboard():
 @login_required
 @require_permiso('importaciones', 'ver')
 def generar_pdf_route(imp_id):
-    imp = get_importacion(imp_id)
-    if not imp:
+    datos = datos_pdf_importacion(imp_id)
+    if not datos:
         flash("Importación no encontrada", "error")
         return redirect(url_for('importaciones.lista'))
-    buf = generar_pdf_importacion(imp_id)
-    if not buf:
+    try:
+        ruta = obtener_pdf('importacion', render_pdf_importacion, datos)
+    except Exception:
+        logger.exception("Error generando PDF de importación %s", imp_id)
         flash("Error al generar el PDF", "error")
         return redirect(url_for('importaciones.detalle', imp_id=imp_id))
-    return send_file(buf,
+    return send_file(ruta,
                      as_attachment=True,
-                     download_name=f"importacion_{imp['numero']}.pdf",
+                     download_name=f"importacion_{datos['imp']['numero']}.pdf",
                      mimetype='application/pdf')
 
 
@@ -4,6 +4,7 @@ import pandas as pd
 from flask import Blueprint, render_template, request, redirect, url_for, flash, g
 from models import get_productos, add_producto, update_producto, delete_producto, get_producto_by_id, get_conn
 from services.tiendanube_service import importar_productos_tn
+from services.tn_outbox_service import TIPOS_SYNC, encolar_sync_tn_en_conn, notificar_outbox_tn
 from routes import login_required
 
 inventario_bp = Blueprint('inventario', __name__)
@@ -27,7 +28,7 @@ def inventario():
 @inventario_bp.route("/sync_tiendanube")
 @login_required
 def sync_tiendanube():
-    resultado = importar_productos_tn()
+    resultado = importar_productos_tn(completo=request.args.get('completo') == '1')
     if resultado["ok"]:
         flash(resultado["mensaje"], "success")
     else:
@@ -147,6 +148,7 @@ def cargar_excel():
                             "UPDATE productos SET descripcion=?, precio=?, stock=? WHERE sku=?",
                             (descripcion, precio, stock, sku)
                         )
+                        encolar_sync_tn_en_conn(conn, existente['id'], TIPOS_SYNC)
                         count_updated += 1
                     else:
                         conn.execute(
@@ -159,6 +161,7 @@ def cargar_excel():
 
             conn.commit()
             conn.close()
+            notificar_outbox_tn()  # cambios vinculados a TN salen en lotes
 
             msg = f"✅ {count_added} productos creados, {count_updated} actualizados."
             if errors:
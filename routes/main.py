@@ -9,4 +9,5 @@ main_bp = Blueprint('main', __name__)
 @login_required
 def index():
     data = get_dashboard_data()
-    return render_template('index.html', **data)
+    from services.afip_service import estado_certificado
+    return render_template('index.html', certificado_afip=estado_certificado(), **data)
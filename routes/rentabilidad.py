@@ -1,10 +1,11 @@
 # routes/rentabilidad.py
 from datetime import date
 
-from flask import Blueprint, redirect, render_template, request, send_file, url_for
+from flask import Blueprint, flash, redirect, render_template, request, send_file, url_for
 
 from routes import require_permiso
 from services import rentabilidad_service as svc
+from services.pdf_pool import obtener_pdf
 
 rentabilidad_bp = Blueprint('rentabilidad', __name__)
 
@@ -16,6 +17,16 @@ def _defaults():
     return ini, fin
 
 
+def _filtros_export():
+    """(fecha_desde, fecha_hasta, origen) del query string para las descargas.
+    ValueError si alguna fecha no es válida."""
+    ini, fin = _defaults()
+    fecha_desde = date.fromisoformat(request.args.get('fecha_desde', ini).strip()).isoformat()
+    fecha_hasta = date.fromisoformat(request.args.get('fecha_hasta', fin).strip()).isoformat()
+    origen      = request.args.get('origen', '').strip()
+    return fecha_desde, fecha_hasta, origen
+
+
 @rentabilidad_bp.route('/reportes/rentabilidad')
 @require_permiso('resumen', 'ver')
 def index():
@@ -50,10 +61,11 @@ def index():
 @rentabilidad_bp.route('/reportes/rentabilidad/excel')
 @require_permiso('resumen', 'ver')
 def excel():
-    ini, fin = _defaults()
-    fecha_desde = request.args.get('fecha_desde', ini).strip()
-    fecha_hasta = request.args.get('fecha_hasta', fin).strip()
-    origen      = request.args.get('origen', '').strip()
+    try:
+        fecha_desde, fecha_hasta, origen = _filtros_export()
+    except ValueError:
+        flash("❌ Fechas inválidas.", "error")
+        return redirect(url_for('rentabilidad.index'))
 
     buf      = svc.exportar_excel(fecha_desde, fecha_hasta, origen or None)
     filename = f"rentabilidad_{fecha_desde}_{fecha_hasta}.xlsx"
@@ -64,12 +76,14 @@ def excel():
 @rentabilidad_bp.route('/reportes/rentabilidad/pdf')
 @require_permiso('resumen', 'ver')
 def pdf():
-    ini, fin = _defaults()
-    fecha_desde = request.args.get('fecha_desde', ini).strip()
-    fecha_hasta = request.args.get('fecha_hasta', fin).strip()
-    origen      = request.args.get('origen', '').strip()
+    try:
+        fecha_desde, fecha_hasta, origen = _filtros_export()
+    except ValueError:
+        flash("❌ Fechas inválidas.", "error")
+        return redirect(url_for('rentabilidad.index'))
 
-    buf      = svc.exportar_pdf(fecha_desde, fecha_hasta, origen or None)
+    datos    = svc.datos_pdf(fecha_desde, fecha_hasta, origen or None)
+    ruta     = obtener_pdf('rentabilidad', svc.render_pdf, datos)
     filename = f"rentabilidad_{fecha_desde}_{fecha_hasta}.pdf"
-    return send_file(buf, as_attachment=True, download_name=filename,
+    return send_file(ruta, as_attachment=True, download_name=filename,
                      mimetype='application/pdf')
@@ -3,7 +3,8 @@ import io
 from flask import Blueprint, send_file
 from datetime import datetime
 from routes import login_required
-from models import get_conn
+from models import get_conn_lectura
+from services.periodos import entre, rango_clave
 import pandas as pd
 
 reportes_bp = Blueprint('reportes', __name__)
@@ -12,9 +13,9 @@ reportes_bp = Blueprint('reportes', __name__)
 @reportes_bp.route('/reporte/excel')
 @login_required
 def reporte_excel():
-    conn = get_conn()
+    conn = get_conn_lectura()
     mes_actual = datetime.now().strftime('%Y-%m')
-    df = pd.read_sql_query("""
+    df = pd.read_sql_query(f"""
         SELECT v.fecha, c.nombre AS cliente, p.descripcion AS producto,
                dv.cantidad, dv.precio_unitario,
                (dv.cantidad * dv.precio_unitario) AS subtotal
@@ -22,10 +23,10 @@ def reporte_excel():
         JOIN detalle_venta dv ON v.id = dv.venta_id
         JOIN clientes c ON v.cliente_id = c.id
         JOIN productos p ON dv.producto_id = p.id
-        WHERE strftime('%Y-%m', v.fecha) = ?
+        WHERE {entre('v.fecha')}
           AND (v.estado IS NULL OR v.estado != 'cancelada')
         ORDER BY v.fecha
-    """, conn, params=(mes_actual,))
+    """, conn, params=rango_clave(mes_actual))
     conn.close()
 
     output = io.BytesIO()
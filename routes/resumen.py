@@ -6,9 +6,10 @@ from flask import Blueprint, render_template, request, send_file
 
 from routes import login_required, require_permiso
 from services.resumen_service import (
-    MESES_ES, exportar_excel, exportar_pdf,
-    get_evolucion_12meses, get_resumen_mes,
+    MESES_ES, datos_pdf, exportar_excel,
+    get_evolucion_12meses, get_resumen_mes, render_pdf,
 )
+from services.pdf_pool import obtener_pdf
 
 resumen_bp = Blueprint('resumen', __name__)
 
@@ -77,7 +78,7 @@ def pdf():
     hoy   = date.today()
     year  = request.args.get('year',  hoy.year,  type=int)
     month = request.args.get('month', hoy.month, type=int)
-    buf   = exportar_pdf(year, month)
-    return send_file(buf, as_attachment=True,
+    ruta  = obtener_pdf('resumen', render_pdf, datos_pdf(year, month))
+    return send_file(ruta, as_attachment=True,
                      download_name=f"resumen_{year}_{month:02d}.pdf",
                      mimetype='application/pdf')
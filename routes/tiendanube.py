@@ -1,5 +1,5 @@
 # routes/tiendanube.py
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from services.tiendanube_service import importar_productos_tn, actualizar_stock_tn_service
 from routes import login_required
 
@@ -8,7 +8,7 @@ tiendanube_bp = Blueprint("tiendanube", __name__)
 @tiendanube_bp.route("/importar-productos-tiendanube")
 @login_required
 def importar_productos():
-    resultado = importar_productos_tn()
+    resultado = importar_productos_tn(completo=request.args.get('completo') == '1')
     return jsonify(resultado)
 
 @tiendanube_bp.route("/actualizar-stock-tn/<variant_id>/<int:nuevo_stock>")
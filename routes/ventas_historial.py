@@ -2,9 +2,11 @@
 import os
 import sqlite3
 import logging
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, g, send_file
+from datetime import date
+from flask import (Blueprint, Response, render_template, request, redirect, url_for, flash, session, g,
+                   send_file, jsonify, stream_with_context)
 from models import get_conn
-from routes import login_required, require_rol
+from routes import login_required, require_rol, require_permiso
 from services.usuarios_service import registrar_auditoria
 
 logger = logging.getLogger(__name__)
@@ -29,7 +31,8 @@ def ventas_historial():
             ventas = conn.execute("""
                 SELECT v.id, v.fecha, c.nombre, v.total, v.metodo_pago, v.cuotas, v.order_id,
                        v.estado, v.factura_emitida, v.nota_credito_emitida,
-                       v.estado_pago, v.saldo_pendiente
+                       v.estado_pago, v.saldo_pendiente,
+                       (SELECT fc.estado FROM facturacion_cola fc WHERE fc.venta_id = v.id) AS factura_estado
                 FROM ventas v JOIN clientes c ON v.cliente_id = c.id
                 WHERE v.id = ? ORDER BY v.fecha DESC
             """, (venta_id,)).fetchall()
@@ -56,17 +59,48 @@ def ventas_historial():
         ventas = conn.execute(f"""
             SELECT v.id, v.fecha, c.nombre, v.total, v.metodo_pago, v.cuotas, v.order_id,
                    v.estado, v.factura_emitida, v.nota_credito_emitida,
-                   v.estado_pago, v.saldo_pendiente
+                   v.estado_pago, v.saldo_pendiente,
+                   (SELECT fc.estado FROM facturacion_cola fc WHERE fc.venta_id = v.id) AS factura_estado
             FROM ventas v JOIN clientes c ON v.cliente_id = c.id
             {where_clause}
             ORDER BY v.fecha DESC LIMIT ? OFFSET ?
         """, (per_page, offset)).fetchall()
         total_pages = (total + per_page - 1) // per_page
     conn.close()
+    from services.facturacion_service import contar_sin_facturar
     return render_template('ventas_historial.html', ventas=ventas, page=page,
                            total_pages=total_pages, total=total,
                            search_id=search_id, origen=origen,
-                           saldo_pendiente=saldo_pendiente)
+                           saldo_pendiente=saldo_pendiente,
+                           sin_facturar=contar_sin_facturar(origen=origen or None))
+
+
+@ventas_historial_bp.route('/ventas_historial/facturar-pendientes', methods=['POST'])
+@require_permiso('ventas', 'crear')
+def facturar_pendientes():
+    desde  = request.form.get('desde', '').strip() or None
+    hasta  = request.form.get('hasta', '').strip() or None
+    origen = request.form.get('origen', '').strip() or None
+
+    from services.facturacion_service import encolar_pendientes
+    try:
+        encoladas = encolar_pendientes(desde, hasta, origen, g.user_id, g.username)
+    except Exception as e:
+        logger.exception("Error encolando facturación masiva")
+        flash(f"❌ Error en la facturación masiva: {e}", "error")
+        return redirect(url_for('ventas_historial.ventas_historial', origen=origen))
+
+    if encoladas:
+        registrar_auditoria(
+            g.user_id, g.username, 'facturacion_masiva', 'ventas',
+            detalle=f"{encoladas} ventas enviadas a facturar en lote.",
+            ip=request.remote_addr,
+        )
+        flash(f"✅ {encoladas} facturas en cola. Se emiten en segundo plano.", "success")
+    else:
+        flash("⚠️ No hay ventas pendientes de facturar.", "warning")
+    return redirect(url_for('ventas_historial.ventas_historial', origen=origen))
+
 
 @ventas_historial_bp.route('/venta/<int:venta_id>')
 @login_required
@@ -104,8 +138,10 @@ def detalle_venta(venta_id):
         (venta_id,),
     ).fetchall()
     conn.close()
+    from services.facturacion_service import estado_factura
     return render_template('detalle_venta.html', venta=venta, productos=productos,
-                           remito_venta=remito_venta, pagos_venta=pagos_venta)
+                           remito_venta=remito_venta, pagos_venta=pagos_venta,
+                           factura_estado=estado_factura(venta_id))
 
 
 @ventas_historial_bp.route('/venta/<int:venta_id>/pagar', methods=['POST'])
@@ -192,7 +228,7 @@ def cancelar_venta(venta_id):
     conn = get_conn()
     try:
         venta = conn.execute("""
-            SELECT id, total, estado, metodo_pago, cliente_id,
+            SELECT id, fecha, total, estado, metodo_pago, cliente_id,
                    factura_emitida, factura_tipo, factura_numero,
                    nota_credito_emitida
             FROM ventas WHERE id = ?
@@ -250,7 +286,6 @@ def cancelar_venta(venta_id):
             logger.exception("Error generando PDF de NC venta #%s", venta_id)
 
     # ── Fase 3: transacción DB ────────────────────────────────────────────────
-    cancelado_ok = False
     conn = get_conn()
     try:
         update_sql    = "estado = 'cancelada', motivo_cancelacion = ?"
@@ -272,11 +307,17 @@ def cancelar_venta(venta_id):
         update_params.append(venta_id)
         conn.execute(f"UPDATE ventas SET {update_sql} WHERE id = ?", update_params)
 
+        # Solo ventas del panel propio se sincronizan con Tiendanube: las que
+        # vienen de TN ya tienen su stock correcto allá (TN lo restaura al
+        # cancelar su propia orden).
+        from services.tn_outbox_service import encolar_sync_tn_en_conn, notificar_outbox_tn
         for item in items:
             conn.execute(
                 "UPDATE productos SET stock = stock + ? WHERE id = ?",
                 (item['cantidad'], item['producto_id']),
             )
+            if venta['metodo_pago'] != 'Tienda Nube':
+                encolar_sync_tn_en_conn(conn, item['producto_id'])
 
         from services.caja_service import registrar_movimiento_en_conn
         if pagos_venta_cancelar:
@@ -292,8 +333,12 @@ def cancelar_venta(venta_id):
                 f"Cancelación Venta #{venta_id}",
                 venta['total'], venta['metodo_pago'], g.user_id,
             )
+        from services.agregados_service import refrescar_ventas_en_conn
+        refrescar_ventas_en_conn(conn, venta['fecha'])
         conn.commit()
-        cancelado_ok = True
+        notificar_outbox_tn()
+        from services.dashboard_service import venta_cancelada
+        venta_cancelada(venta_id, venta['fecha'], venta['total'])
 
         detalle_audit = (
             f"Venta #{venta_id} cancelada. Total: ${venta['total']:.2f}."
@@ -330,43 +375,6 @@ def cancelar_venta(venta_id):
     finally:
         conn.close()
 
-    # ── Fase 4: sincronizar stock en Tiendanube ───────────────────────────────
-    # Solo ventas del panel propio: las que vienen de TN ya tienen su stock
-    # correcto allá (TN lo restaura al cancelar su propia orden).
-    if cancelado_ok and venta['metodo_pago'] != 'Tienda Nube':
-        from services.tiendanube_service import actualizar_stock_tn_service
-        _conn_tn = get_conn()
-        try:
-            for item in items:
-                row = _conn_tn.execute(
-                    "SELECT variant_id, stock FROM productos WHERE id = ?",
-                    (item['producto_id'],)
-                ).fetchone()
-                if not row or not row['variant_id']:
-                    continue
-                try:
-                    res = actualizar_stock_tn_service(row['variant_id'], row['stock'])
-                    if res.get('ok'):
-                        logger.info(
-                            "TN stock restaurado: producto_id=%s variant=%s stock=%s "
-                            "(venta #%s cancelada)",
-                            item['producto_id'], row['variant_id'], row['stock'], venta_id,
-                        )
-                    else:
-                        logger.error(
-                            "No se pudo actualizar stock en Tiendanube para producto %s "
-                            "(venta #%s cancelada). Verificar manualmente. Error: %s",
-                            item['producto_id'], venta_id, res.get('error'),
-                        )
-                except Exception as exc_tn:
-                    logger.error(
-                        "No se pudo actualizar stock en Tiendanube para producto %s "
-                        "(venta #%s cancelada). Verificar manualmente. Error: %s",
-                        item['producto_id'], venta_id, str(exc_tn),
-                    )
-        finally:
-            _conn_tn.close()
-
     return redirect(url_for('ventas_historial.detalle_venta', venta_id=venta_id))
 
 
@@ -376,90 +384,35 @@ def emitir_factura(venta_id):
     conn = get_conn()
     try:
         venta = conn.execute(
-            "SELECT * FROM ventas WHERE id = ?", (venta_id,)
-        ).fetchone()
-        if not venta:
-            flash("❌ Venta no encontrada.", "error")
-            return redirect(url_for('ventas_historial.ventas_historial'))
-        if venta['estado'] == 'cancelada':
-            flash("❌ No se puede facturar una venta cancelada.", "error")
-            return redirect(url_for('ventas_historial.detalle_venta', venta_id=venta_id))
-        if venta['factura_emitida']:
-            flash("⚠️ Esta venta ya tiene factura emitida.", "warning")
-            return redirect(url_for('ventas_historial.detalle_venta', venta_id=venta_id))
-
-        cliente = conn.execute(
-            "SELECT * FROM clientes WHERE id = ?", (venta['cliente_id'],)
+            "SELECT id, estado, factura_emitida FROM ventas WHERE id = ?", (venta_id,)
         ).fetchone()
-        productos = conn.execute("""
-            SELECT p.descripcion, dv.cantidad, dv.precio_unitario
-            FROM detalle_venta dv JOIN productos p ON dv.producto_id = p.id
-            WHERE dv.venta_id = ?
-        """, (venta_id,)).fetchall()
     finally:
         conn.close()
-
-    try:
-        from services.afip_service import emitir_factura as _emitir, generar_pdf_factura
-        factura_data = _emitir(venta, cliente, productos)
-    except (ValueError, RuntimeError) as e:
-        logger.exception("Error al emitir factura venta #%s", venta_id)
-        flash(f"❌ {e}", "error")
+    if not venta:
+        flash("❌ Venta no encontrada.", "error")
+        return redirect(url_for('ventas_historial.ventas_historial'))
+    if venta['estado'] == 'cancelada':
+        flash("❌ No se puede facturar una venta cancelada.", "error")
         return redirect(url_for('ventas_historial.detalle_venta', venta_id=venta_id))
-    except Exception as e:
-        logger.exception("Error inesperado al emitir factura venta #%s", venta_id)
-        flash(f"❌ Error al comunicarse con ARCA: {e}", "error")
+    if venta['factura_emitida']:
+        flash("⚠️ Esta venta ya tiene factura emitida.", "warning")
         return redirect(url_for('ventas_historial.detalle_venta', venta_id=venta_id))
 
-    # CAE obtenido — generar PDF (no bloquea si falla)
-    pdf_path = None
-    try:
-        pdf_path = generar_pdf_factura(venta_id, venta, cliente, productos, factura_data)
-    except Exception as e:
-        logger.exception("Error generando PDF factura venta #%s", venta_id)
+    # La emisión (WSAA, WSFE, PDF) la hace el worker de facturación
+    from services.facturacion_service import encolar_factura
+    encolar_factura(venta_id, g.user_id, g.username)
+    flash("🧾 Factura solicitada a ARCA. El estado se actualiza en esta página.", "success")
+    return redirect(url_for('ventas_historial.detalle_venta', venta_id=venta_id))
 
-    # Persistir en DB
-    conn = get_conn()
-    try:
-        conn.execute("""
-            UPDATE ventas
-            SET factura_emitida=1, factura_tipo=?, factura_numero=?,
-                factura_cae=?, factura_cae_vto=?, factura_fecha=?, factura_pdf_path=?
-            WHERE id=?
-        """, (
-            factura_data['tipo'],
-            factura_data['numero'],
-            factura_data['cae'],
-            factura_data['cae_vto'],
-            factura_data['fecha'],
-            pdf_path,
-            venta_id,
-        ))
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        logger.exception("Error guardando datos de factura venta #%s en DB", venta_id)
-        flash(
-            f"❌ CAE obtenido ({factura_data['cae']}) pero no se pudo guardar en BD: {e}",
-            "error",
-        )
-        return redirect(url_for('ventas_historial.detalle_venta', venta_id=venta_id))
-    finally:
-        conn.close()
 
-    registrar_auditoria(
-        g.user_id, g.username,
-        'emitir_factura', 'ventas',
-        detalle=(f"Factura {factura_data['tipo']} N° {factura_data['numero']:08d} "
-                 f"emitida para Venta #{venta_id}. CAE: {factura_data['cae']}"),
-        ip=request.remote_addr,
-    )
-    flash(
-        f"✅ Factura {factura_data['tipo']} N° {factura_data['numero']:08d} emitida. "
-        f"CAE: {factura_data['cae']} (vto. {factura_data['cae_vto']})",
-        "success",
-    )
-    return redirect(url_for('ventas_historial.detalle_venta', venta_id=venta_id))
+@ventas_historial_bp.route('/venta/<int:venta_id>/factura-estado')
+@login_required
+def factura_estado(venta_id):
+    from services.facturacion_service import estado_factura
+    estado = estado_factura(venta_id)
+    if estado is None:
+        return jsonify({"error": "venta no encontrada"}), 404
+    return jsonify(estado)
 
 
 @ventas_historial_bp.route('/venta/<int:venta_id>/factura-pdf')
@@ -491,6 +444,59 @@ def descargar_factura_pdf(venta_id):
     )
 
 
+def _rango_comprobantes(valores):
+    """(desde, hasta) validados del formulario de comprobantes, o None tras
+    avisar el error."""
+    hoy = date.today()
+    try:
+        desde = date.fromisoformat(valores.get('desde', '').strip() or hoy.replace(day=1).isoformat())
+        hasta = date.fromisoformat(valores.get('hasta', '').strip() or hoy.isoformat())
+    except ValueError:
+        flash("❌ Fechas inválidas.", "error")
+        return None
+    if desde > hasta:
+        flash("❌ La fecha desde es posterior a la fecha hasta.", "error")
+        return None
+    return desde.isoformat(), hasta.isoformat()
+
+
+@ventas_historial_bp.route('/ventas_historial/comprobantes.zip')
+@login_required
+def descargar_comprobantes_zip():
+    """Facturas y notas de crédito del rango en un ZIP que se arma mientras se descarga."""
+    rango = _rango_comprobantes(request.args)
+    if rango is None:
+        return redirect(url_for('ventas_historial.ventas_historial'))
+    desde, hasta = rango
+
+    from services.facturas_export_service import exportar_zip
+    return Response(
+        stream_with_context(exportar_zip(desde, hasta)),
+        mimetype='application/zip',
+        headers={'Content-Disposition':
+                 f'attachment; filename="comprobantes_{desde}_{hasta}.zip"'},
+    )
+
+
+@ventas_historial_bp.route('/ventas_historial/comprobantes/regenerar', methods=['POST'])
+@login_required
+def regenerar_comprobantes():
+    """Guarda en static/facturas/ los PDF de comprobantes del rango que faltan."""
+    rango = _rango_comprobantes(request.form)
+    if rango is None:
+        return redirect(url_for('ventas_historial.ventas_historial'))
+
+    from services.facturas_export_service import regenerar_faltantes
+    guardados, errores = regenerar_faltantes(*rango)
+    if errores:
+        flash(f"⚠️ {guardados} PDF regenerados, {len(errores)} con error: {'; '.join(errores[:3])}", "warning")
+    elif guardados:
+        flash(f"✅ {guardados} PDF regenerados.", "success")
+    else:
+        flash("⚠️ No falta ningún PDF en ese rango.", "warning")
+    return redirect(url_for('ventas_historial.ventas_historial'))
+
+
 @ventas_historial_bp.route('/venta/<int:venta_id>/emitir-nota-credito', methods=['POST'])
 @login_required
 def emitir_nota_credito(venta_id):
@@ -1,54 +1,36 @@
 # services/afip_service.py
 import base64
-import io
-import json
 import logging
 import os
+import threading
+import time
 import xml.etree.ElementTree as ET
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from db import get_conn
 
 logger = logging.getLogger(__name__)
 
-# Cache del ticket WSAA — persiste en disco para sobrevivir reinicios
-_wsaa_cache = {}  # {servicio: {'token': str, 'sign': str, 'expira': datetime}}
-_TICKET_CACHE_FILE = os.path.join(
-    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-    '.afip_ticket_cache.json',
-)
+# ── Errores ──────────────────────────────────────────────────────────────────
 
+class RechazoAFIP(RuntimeError):
+    """AFIP rechazó el comprobante por sus datos: reintentar igual no sirve."""
 
-def _load_ticket_cache():
-    try:
-        if not os.path.exists(_TICKET_CACHE_FILE):
-            return
-        with open(_TICKET_CACHE_FILE, 'r') as f:
-            data = json.load(f)
-        ahora = datetime.now(timezone.utc)
-        for servicio, entry in data.items():
-            expira = datetime.fromisoformat(entry['expira'])
-            if expira > ahora:
-                _wsaa_cache[servicio] = {
-                    'token':  entry['token'],
-                    'sign':   entry['sign'],
-                    'expira': expira,
-                }
-    except Exception:
-        pass
 
-
-def _save_ticket_cache():
-    try:
-        data = {
-            k: {'token': v['token'], 'sign': v['sign'], 'expira': v['expira'].isoformat()}
-            for k, v in _wsaa_cache.items()
-        }
-        with open(_TICKET_CACHE_FILE, 'w') as f:
-            json.dump(data, f)
-    except Exception:
-        pass
+class EmisionDudosa(RuntimeError):
+    """FECAESolicitar sin respuesta (red, timeout): AFIP pudo haber autorizado
+    los comprobantes. Antes de reintentar hay que consultarlos por número."""
 
 
-_load_ticket_cache()
+def _error_afip(prefijo, errs):
+    """Excepción para resp.Errors: los códigos >= 10000 son de validación
+    (RechazoAFIP); los demás (500, 501, 600…) son fallas del servicio."""
+    msgs = [f"[{e.Code}] {e.Msg}" for e in errs]
+    if all(int(e.Code) >= 10000 for e in errs):
+        return RechazoAFIP(prefijo + "; ".join(msgs))
+    return RuntimeError(prefijo + "; ".join(msgs))
 
 
 # ── Helpers de configuración ─────────────────────────────────────────────────
@@ -58,13 +40,141 @@ def _cfg():
     cfg = AFIP_CONFIG
     if not cfg['cuit']:
         raise RuntimeError("AFIP_CUIT no está configurado en .env")
-    if not os.path.exists(cfg['cert_path']):
-        raise RuntimeError(f"Certificado AFIP no encontrado: {cfg['cert_path']}")
-    if not os.path.exists(cfg['key_path']):
-        raise RuntimeError(f"Clave privada AFIP no encontrada: {cfg['key_path']}")
     return cfg
 
 
+# ── Credenciales (certificado y clave privada) ───────────────────────────────
+
+_credenciales_cache = None  # {'rutas', 'mtimes', 'cert', 'key', 'vence'}
+_credenciales_lock = threading.Lock()
+_aviso_vencimiento = None   # fecha del último aviso de certificado por vencer
+
+
+def _mtime(path, mensaje):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        raise RuntimeError(f"{mensaje}: {path}") from None
+
+
+def _credenciales():
+    """Certificado y clave parseados. Se releen solo si cambia el mtime de
+    alguno de los archivos (p. ej. al instalar un certificado renovado)."""
+    global _credenciales_cache
+    cfg    = _cfg()
+    rutas  = (cfg['cert_path'], cfg['key_path'])
+    mtimes = (_mtime(rutas[0], "Certificado AFIP no encontrado"),
+              _mtime(rutas[1], "Clave privada AFIP no encontrada"))
+    cred = _credenciales_cache
+    if cred is not None and cred['rutas'] == rutas and cred['mtimes'] == mtimes:
+        return cred
+
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import serialization
+
+    with _credenciales_lock:
+        cred = _credenciales_cache
+        if cred is not None and cred['rutas'] == rutas and cred['mtimes'] == mtimes:
+            return cred
+        try:
+            with open(rutas[0], 'rb') as f:
+                cert = x509.load_pem_x509_certificate(f.read(), default_backend())
+            with open(rutas[1], 'rb') as f:
+                key = serialization.load_pem_private_key(f.read(), password=None,
+                                                          backend=default_backend())
+        except ValueError as e:
+            raise RuntimeError(f"Certificado o clave AFIP inválidos: {e}") from None
+        publica = serialization.PublicFormat.SubjectPublicKeyInfo
+        if (cert.public_key().public_bytes(serialization.Encoding.DER, publica)
+                != key.public_key().public_bytes(serialization.Encoding.DER, publica)):
+            raise RuntimeError("La clave privada AFIP no corresponde al certificado.")
+        vence = getattr(cert, 'not_valid_after_utc', None) \
+            or cert.not_valid_after.replace(tzinfo=timezone.utc)
+        cred = {'rutas': rutas, 'mtimes': mtimes, 'cert': cert, 'key': key, 'vence': vence}
+        _credenciales_cache = cred
+        logger.info("Certificado AFIP cargado (vence %s)", vence.strftime('%d/%m/%Y'))
+        return cred
+
+
+def estado_certificado():
+    """{'vence', 'dias_restantes', 'por_vencer'} del certificado, o None si
+    AFIP no está configurado o las credenciales no cargan."""
+    from config.afip import AFIP_CONFIG
+    try:
+        vence = _credenciales()['vence']
+    except RuntimeError:
+        return None
+    dias = (vence - datetime.now(timezone.utc)).days
+    return {'vence': vence, 'dias_restantes': dias,
+            'por_vencer': dias <= AFIP_CONFIG['cert_aviso_dias']}
+
+
+def _avisar_vencimiento(estado):
+    global _aviso_vencimiento
+    hoy = datetime.now().date()
+    if estado and estado['por_vencer'] and _aviso_vencimiento != hoy:
+        _aviso_vencimiento = hoy
+        logger.warning("El certificado AFIP vence el %s (%d días). Renovarlo antes para no "
+                       "cortar la facturación.", estado['vence'].strftime('%d/%m/%Y'),
+                       estado['dias_restantes'])
+
+
+def verificar_credenciales():
+    """Valida CUIT, certificado y clave al arrancar. Devuelve estado_certificado()
+    o None (con el motivo en el log) si la facturación no va a funcionar."""
+    from config.afip import AFIP_CONFIG
+    if not AFIP_CONFIG['cuit']:
+        logger.info("AFIP_CUIT sin configurar: facturación electrónica deshabilitada")
+        return None
+    try:
+        _credenciales()
+    except RuntimeError as e:
+        logger.error("Credenciales AFIP: %s", e)
+        return None
+    estado = estado_certificado()
+    _avisar_vencimiento(estado)
+    return estado
+
+
+# ── Clientes SOAP ────────────────────────────────────────────────────────────
+
+_clientes = {}  # {wsdl_url: zeep.Client}
+_clientes_lock = threading.Lock()
+
+
+def _zeep_client(wsdl):
+    """Cliente zeep compartido por proceso para la URL de WSDL dada.
+
+    El WSDL se parsea una sola vez; además queda en una caché SQLite en disco,
+    así un reinicio no vuelve a descargarlo.
+    """
+    client = _clientes.get(wsdl)
+    if client is not None:
+        return client
+    from zeep import Client, Settings
+    from zeep.cache import SqliteCache
+    from zeep.transports import Transport
+    from config.afip import AFIP_CONFIG
+
+    with _clientes_lock:
+        client = _clientes.get(wsdl)
+        if client is None:
+            cache = None
+            if AFIP_CONFIG['wsdl_cache_path'] and AFIP_CONFIG['wsdl_cache_seg'] > 0:
+                cache = SqliteCache(path=AFIP_CONFIG['wsdl_cache_path'],
+                                    timeout=AFIP_CONFIG['wsdl_cache_seg'])
+            client = Client(
+                wsdl=wsdl,
+                settings=Settings(strict=False, xml_huge_tree=True),
+                transport=Transport(cache=cache, timeout=AFIP_CONFIG['timeout'],
+                                    operation_timeout=AFIP_CONFIG['timeout']),
+            )
+            _clientes[wsdl] = client
+            logger.info("Cliente SOAP creado para %s", wsdl)
+        return client
+
+
 # ── Autenticación WSAA ───────────────────────────────────────────────────────
 
 def _crear_tra(servicio='wsfe'):
@@ -89,54 +199,140 @@ def _crear_tra(servicio='wsfe'):
 
 def _firmar_tra(tra_bytes):
     """Firma el TRA con CMS (PKCS#7) y devuelve el resultado en base64."""
-    from cryptography import x509
-    from cryptography.hazmat.backends import default_backend
-    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives import hashes
     from cryptography.hazmat.primitives.serialization import Encoding
-    from cryptography.hazmat.primitives.serialization.pkcs7 import (
-        PKCS7Options, PKCS7SignatureBuilder,
-    )
-
-    cfg = _cfg()
-    with open(cfg['cert_path'], 'rb') as f:
-        cert = x509.load_pem_x509_certificate(f.read(), default_backend())
-    with open(cfg['key_path'], 'rb') as f:
-        key = serialization.load_pem_private_key(f.read(), password=None,
-                                                  backend=default_backend())
+    from cryptography.hazmat.primitives.serialization.pkcs7 import PKCS7SignatureBuilder
 
+    cred = _credenciales()
     cms = (
         PKCS7SignatureBuilder()
         .set_data(tra_bytes)
-        .add_signer(cert, key, hashes.SHA256())
+        .add_signer(cred['cert'], cred['key'], hashes.SHA256())
         .sign(Encoding.DER, [])          # contenido embebido, certificado incluido
     )
     return base64.b64encode(cms).decode('ascii')
 
 
-def _obtener_ticket(servicio='wsfe'):
-    """Devuelve (token, sign) del ticket WSAA, usando caché si está vigente."""
-    from zeep import Client, Settings
-    from config.afip import WSAA_WSDL
+# Los tickets (TA) viven en afip_tickets y los comparten todos los procesos:
+# WSAA rechaza un TA nuevo mientras el anterior siga vigente ("CEE ya posee
+# un TA valido"). Un solo hilo de un solo proceso renueva a la vez, y el
+# renovador en segundo plano lo hace antes del vencimiento, así ninguna
+# emisión paga la firma y el login a WSAA.
+
+RENOVAR_ANTES_MIN = 20       # el renovador pide el TA nuevo dentro de este margen
+MARGEN_VENCIMIENTO_SEG = 60  # un TA a menos de esto de vencer ya no se usa
+RENOVACION_SEG = 90          # un renovador caído no bloquea a los demás más que esto
+INTERVALO_RENOVADOR_SEG = 60
+
+_FMT_UTC = '%Y-%m-%d %H:%M:%S'
+
+_tickets = {}            # {(cuit, modo, servicio): {'token', 'sign', 'expira'}}
+_renovaciones = {}       # {(cuit, modo, servicio): threading.Lock}
+_tickets_lock = threading.Lock()
+
+
+class _TAYaEmitido(RuntimeError):
+    """WSAA no emite un TA nuevo porque el anterior sigue vigente."""
+
+
+def _utc(dt):
+    return dt.astimezone(timezone.utc).strftime(_FMT_UTC)
+
+
+def _clave_ticket(servicio):
+    cfg = _cfg()
+    return (cfg['cuit'], cfg['modo'], servicio)
+
+
+def _ticket_vigente(ticket, margen_seg=MARGEN_VENCIMIENTO_SEG):
+    return (ticket is not None
+            and ticket['expira'] - datetime.now(timezone.utc) > timedelta(seconds=margen_seg))
+
 
+def _leer_ticket(clave):
+    conn = get_conn()
+    try:
+        fila = conn.execute(
+            "SELECT token, sign, expira FROM afip_tickets"
+            " WHERE cuit = ? AND modo = ? AND servicio = ? AND token IS NOT NULL", clave
+        ).fetchone()
+    finally:
+        conn.close()
+    if fila is None:
+        return None
+    ticket = {
+        'token':  fila['token'],
+        'sign':   fila['sign'],
+        'expira': datetime.strptime(fila['expira'], _FMT_UTC).replace(tzinfo=timezone.utc),
+    }
+    _tickets[clave] = ticket
+    return ticket
+
+
+def _tomar_renovacion(clave):
+    """Reserva la renovación del TA entre procesos. False si otro la tiene."""
     ahora = datetime.now(timezone.utc)
-    cache = _wsaa_cache.get(servicio)
-    if cache and ahora < cache['expira']:
-        return cache['token'], cache['sign']
+    conn  = get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT OR IGNORE INTO afip_tickets (cuit, modo, servicio) VALUES (?, ?, ?)", clave
+        )
+        fila = conn.execute(
+            "SELECT renovando_hasta FROM afip_tickets WHERE cuit = ? AND modo = ? AND servicio = ?",
+            clave
+        ).fetchone()
+        if fila['renovando_hasta'] and fila['renovando_hasta'] > _utc(ahora):
+            conn.rollback()
+            return False
+        conn.execute(
+            "UPDATE afip_tickets SET renovando_hasta = ? WHERE cuit = ? AND modo = ? AND servicio = ?",
+            (_utc(ahora + timedelta(seconds=RENOVACION_SEG)), *clave)
+        )
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _soltar_renovacion(clave, ticket=None):
+    conn = get_conn()
+    try:
+        if ticket is None:
+            conn.execute(
+                "UPDATE afip_tickets SET renovando_hasta = NULL"
+                " WHERE cuit = ? AND modo = ? AND servicio = ?", clave
+            )
+        else:
+            conn.execute(
+                "UPDATE afip_tickets SET token = ?, sign = ?, expira = ?, obtenido_en = ?,"
+                " renovando_hasta = NULL WHERE cuit = ? AND modo = ? AND servicio = ?",
+                (ticket['token'], ticket['sign'], _utc(ticket['expira']),
+                 _utc(datetime.now(timezone.utc)), *clave)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _login_wsaa(servicio):
+    """Firma el TRA y pide un TA nuevo a WSAA."""
+    from config.afip import WSAA_WSDL
 
     cfg     = _cfg()
     tra     = _crear_tra(servicio)
     cms_b64 = _firmar_tra(tra)
 
-    client  = Client(
-        wsdl=WSAA_WSDL[cfg['modo']],
-        settings=Settings(strict=False, xml_huge_tree=True),
-    )
+    client  = _zeep_client(WSAA_WSDL[cfg['modo']])
     try:
         resp_xml = client.service.loginCms(in0=cms_b64)
     except Exception as e:
         msg = str(e)
         if 'CEE ya posee un TA' in msg or 'TA valido' in msg:
-            raise RuntimeError(
+            raise _TAYaEmitido(
                 "WSAA ya tiene un ticket activo para este certificado. "
                 "Esperá unos minutos y volvé a intentar, o reiniciá el servidor "
                 "luego de que el ticket expire (máx. 12 hs desde la última emisión)."
@@ -152,25 +348,122 @@ def _obtener_ticket(servicio='wsfe'):
         exp_dt  = datetime.fromisoformat(exp_str)
         expira  = exp_dt.astimezone(timezone.utc) - timedelta(minutes=5)
     except Exception:
-        expira = ahora + timedelta(hours=11, minutes=50)
+        expira = datetime.now(timezone.utc) + timedelta(hours=11, minutes=50)
 
-    _wsaa_cache[servicio] = {'token': token, 'sign': sign, 'expira': expira}
-    _save_ticket_cache()
     logger.info("Ticket WSAA obtenido para servicio '%s' (expira %s)", servicio, expira)
-    return token, sign
+    return {'token': token, 'sign': sign, 'expira': expira}
+
+
+def _renovar_ticket(clave, margen_seg=MARGEN_VENCIMIENTO_SEG):
+    """Devuelve un TA con más de `margen_seg` de vida, pidiéndolo a WSAA si hace falta.
+
+    Si otro hilo u otro proceso ya está renovando se espera su resultado;
+    mientras tanto sirve el TA actual si todavía no venció.
+    """
+    with _tickets_lock:
+        lock = _renovaciones.setdefault(clave, threading.Lock())
+    limite = time.monotonic() + RENOVACION_SEG
+    with lock:
+        while True:
+            actual = _leer_ticket(clave)
+            if _ticket_vigente(actual, margen_seg):
+                return actual
+            if _tomar_renovacion(clave):
+                nuevo = None
+                try:
+                    actual = _leer_ticket(clave)
+                    if _ticket_vigente(actual, margen_seg):
+                        return actual
+                    try:
+                        nuevo = _login_wsaa(clave[2])
+                    except _TAYaEmitido:
+                        if _ticket_vigente(actual):
+                            logger.info("WSAA todavía no renueva el TA de '%s'; se usa el vigente",
+                                        clave[2])
+                            return actual
+                        raise
+                    _tickets[clave] = nuevo
+                    return nuevo
+                finally:
+                    _soltar_renovacion(clave, nuevo)
+            if _ticket_vigente(actual):
+                return actual
+            if time.monotonic() > limite:
+                raise RuntimeError("Otro proceso está renovando el ticket de AFIP. "
+                                   "Volvé a intentar en unos segundos.")
+            time.sleep(0.5)
+
+
+def _obtener_ticket(servicio='wsfe'):
+    """Devuelve (token, sign) del ticket WSAA vigente para el servicio."""
+    clave  = _clave_ticket(servicio)
+    ticket = _tickets.get(clave)
+    if not _ticket_vigente(ticket):
+        ticket = _leer_ticket(clave)
+    if not _ticket_vigente(ticket):
+        ticket = _renovar_ticket(clave)
+    return ticket['token'], ticket['sign']
+
+
+# ── Renovación en segundo plano ──────────────────────────────────────────────
+
+_renovador = None
+_renovador_lock = threading.Lock()
+
+
+def renovar_tickets_wsaa():
+    """Renueva los TA que vencen dentro de RENOVAR_ANTES_MIN (y obtiene el de
+    wsfe si todavía no hay). Devuelve la cantidad de servicios revisados."""
+    cfg  = _cfg()
+    conn = get_conn()
+    try:
+        servicios = {'wsfe'} | {r[0] for r in conn.execute(
+            "SELECT servicio FROM afip_tickets WHERE cuit = ? AND modo = ?",
+            (cfg['cuit'], cfg['modo'])
+        ).fetchall()}
+    finally:
+        conn.close()
+    for servicio in sorted(servicios):
+        try:
+            _renovar_ticket(_clave_ticket(servicio), RENOVAR_ANTES_MIN * 60)
+        except Exception:
+            logger.warning("No se pudo renovar el ticket WSAA de '%s'", servicio, exc_info=True)
+    return len(servicios)
+
+
+def _loop_renovador():
+    while True:
+        try:
+            _avisar_vencimiento(estado_certificado())
+            renovar_tickets_wsaa()
+        except Exception:
+            logger.exception("Renovador WSAA: error")
+        time.sleep(INTERVALO_RENOVADOR_SEG)
+
+
+def iniciar_renovador_wsaa():
+    """Arranca (una vez por proceso) el hilo que mantiene vigentes los TA."""
+    global _renovador
+    with _renovador_lock:
+        if _renovador is not None and _renovador.is_alive():
+            return _renovador
+        try:
+            _credenciales()
+        except RuntimeError as e:
+            logger.info("Renovador WSAA no iniciado: %s", e)
+            return None
+        _renovador = threading.Thread(target=_loop_renovador, name='wsaa-renovador', daemon=True)
+        _renovador.start()
+        return _renovador
 
 
 # ── Cliente WSFE ─────────────────────────────────────────────────────────────
 
 def _wsfe_client():
-    from zeep import Client, Settings
     from config.afip import WSFE_WSDL
 
     cfg = _cfg()
-    return Client(
-        wsdl=WSFE_WSDL[cfg['modo']],
-        settings=Settings(strict=False, xml_huge_tree=True),
-    )
+    return _zeep_client(WSFE_WSDL[cfg['modo']])
 
 
 def _auth():
@@ -196,19 +489,236 @@ def obtener_ultimo_numero(cbte_tipo):
     return int(resp.CbteNro or 0)
 
 
-def emitir_factura(venta, cliente, productos):
+ERROR_COMPROBANTE_INEXISTENTE = 602
+
+
+def consultar_comprobante(cbte_tipo, numero, punto_venta=None):
+    """FECompConsultar: datos del comprobante autorizado (ResultGet), o None si
+    AFIP no tiene ese número."""
+    cfg    = _cfg()
+    client = _wsfe_client()
+    resp   = client.service.FECompConsultar(
+        Auth=_auth(),
+        FeCompConsReq={
+            'CbteTipo': cbte_tipo,
+            'CbteNro':  numero,
+            'PtoVta':   punto_venta or cfg['punto_venta'],
+        },
+    )
+    if resp.Errors:
+        if _codigos_error(resp) == {ERROR_COMPROBANTE_INEXISTENTE}:
+            return None
+        raise _error_afip("AFIP FECompConsultar: ", resp.Errors.Err)
+    return resp.ResultGet
+
+
+# ── Numeración local ─────────────────────────────────────────────────────────
+# El próximo número sale de afip_secuencias en lugar de preguntarle a AFIP en
+# cada emisión. Se verifica contra FECompUltimoAutorizado la primera vez que
+# el proceso usa cada secuencia y cada vez que una emisión termina en un
+# estado dudoso (error de red, rechazo 10016).
+
+ERROR_NUMERO_FUERA_DE_SECUENCIA = 10016
+# Un emisor caído no deja la secuencia tomada más que esto
+RESERVA_SEG = 120
+
+_secuencias_verificadas = set()  # {(punto_venta, cbte_tipo)} en este proceso
+
+
+class _Reserva:
+    def __init__(self, numero, cantidad=1):
+        self.numero   = numero    # primer número reservado
+        self.cantidad = cantidad
+        self.estado   = None      # 'confirmado' | 'liberado' | None (dudoso)
+        self.usados   = 0
+
+    def confirmar(self, usados=None):
+        """AFIP autorizó los primeros `usados` números: la secuencia avanza."""
+        self.estado = 'confirmado'
+        self.usados = self.cantidad if usados is None else usados
+
+    def liberar(self):
+        """AFIP rechazó los comprobantes sin consumir números."""
+        self.estado = 'liberado'
+
+
+def _tomar_secuencia(punto_venta, cbte_tipo):
+    """Bloquea la secuencia (también entre procesos) y devuelve su fila.
+
+    Las emisiones de un mismo tipo se hacen de a una: AFIP exige que cada
+    número sea exactamente el siguiente al último autorizado.
     """
-    Solicita CAE a ARCA para la venta dada.
-    Devuelve dict: {tipo, numero, cae, cae_vto, fecha, cbte_tipo, punto_venta}.
-    Lanza RuntimeError o ValueError con el mensaje de error para mostrar al usuario.
+    limite = time.monotonic() + RESERVA_SEG
+    while True:
+        ahora = datetime.now()
+        conn  = get_conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR IGNORE INTO afip_secuencias (punto_venta, cbte_tipo) VALUES (?, ?)",
+                (punto_venta, cbte_tipo)
+            )
+            fila = conn.execute(
+                "SELECT ultimo, sincronizado, bloqueado_hasta FROM afip_secuencias"
+                " WHERE punto_venta = ? AND cbte_tipo = ?", (punto_venta, cbte_tipo)
+            ).fetchone()
+            if not fila['bloqueado_hasta'] or fila['bloqueado_hasta'] < ahora.strftime('%Y-%m-%d %H:%M:%S'):
+                conn.execute(
+                    "UPDATE afip_secuencias SET bloqueado_hasta = ?"
+                    " WHERE punto_venta = ? AND cbte_tipo = ?",
+                    ((ahora + timedelta(seconds=RESERVA_SEG)).strftime('%Y-%m-%d %H:%M:%S'),
+                     punto_venta, cbte_tipo)
+                )
+                conn.commit()
+                return fila
+            conn.rollback()
+        finally:
+            conn.close()
+        if time.monotonic() > limite:
+            raise RuntimeError("Hay otra emisión en curso para este tipo de comprobante. "
+                               "Volvé a intentar en unos segundos.")
+        time.sleep(0.2)
+
+
+def _soltar_secuencia(punto_venta, cbte_tipo, ultimo=None, sincronizado=True):
+    conn = get_conn()
+    try:
+        if ultimo is None:
+            conn.execute(
+                "UPDATE afip_secuencias SET bloqueado_hasta = NULL, sincronizado = ?,"
+                " actualizado_en = ? WHERE punto_venta = ? AND cbte_tipo = ?",
+                (int(sincronizado), datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                 punto_venta, cbte_tipo)
+            )
+        else:
+            conn.execute(
+                "UPDATE afip_secuencias SET bloqueado_hasta = NULL, ultimo = ?, sincronizado = ?,"
+                " actualizado_en = ? WHERE punto_venta = ? AND cbte_tipo = ?",
+                (ultimo, int(sincronizado), datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                 punto_venta, cbte_tipo)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _numero_reservado(cbte_tipo, cantidad=1):
+    """Reserva los próximos `cantidad` números del tipo dado mientras dura el bloque.
+
+    Al salir: confirmar() avanza la secuencia, liberar() la deja como estaba;
+    sin ninguna de las dos (excepción, timeout) se marca para verificar con
+    AFIP en la próxima emisión.
+    """
+    pv    = _cfg()['punto_venta']
+    clave = (pv, cbte_tipo)
+    fila  = _tomar_secuencia(pv, cbte_tipo)
+    try:
+        ultimo = fila['ultimo']
+        if not fila['sincronizado'] or clave not in _secuencias_verificadas:
+            ultimo_afip = obtener_ultimo_numero(cbte_tipo)
+            if ultimo_afip != ultimo and fila['sincronizado']:
+                logger.warning("Secuencia AFIP %s/%s corregida: local %s, AFIP %s",
+                               pv, cbte_tipo, ultimo, ultimo_afip)
+            ultimo = ultimo_afip
+            _secuencias_verificadas.add(clave)
+        reserva = _Reserva(ultimo + 1, cantidad)
+    except BaseException:
+        _soltar_secuencia(pv, cbte_tipo, sincronizado=False)
+        raise
+
+    try:
+        yield reserva
+    finally:
+        if reserva.estado == 'confirmado':
+            _soltar_secuencia(pv, cbte_tipo, ultimo=ultimo + reserva.usados)
+        elif reserva.estado == 'liberado':
+            _soltar_secuencia(pv, cbte_tipo, ultimo=ultimo)
+        else:
+            _soltar_secuencia(pv, cbte_tipo, sincronizado=False)
+
+
+def _codigos_error(resp, det_resp=None):
+    """Códigos de error generales de la respuesta y, si se pasa, de un comprobante."""
+    codigos = set()
+    if resp.Errors:
+        codigos.update(int(e.Code) for e in resp.Errors.Err)
+    if det_resp is not None and det_resp.Observaciones and det_resp.Observaciones.Obs:
+        codigos.update(int(o.Code) for o in det_resp.Observaciones.Obs)
+    return codigos
+
+
+def _solicitar_cae(cbte_tipo, dets, al_numerar=None):
+    """FECAESolicitar de uno o más comprobantes numerados con la secuencia local.
+
+    Devuelve (primer_nro, resp); el comprobante i lleva el número primer_nro + i.
+    Si AFIP responde 10016 (número fuera de secuencia) se resincroniza con
+    FECompUltimoAutorizado y se reintenta una vez.
+
+    al_numerar(primer_nro) se llama antes de cada envío para que el llamador
+    guarde los números; si lanza, no se envía nada. Si el envío falla sin
+    respuesta se lanza EmisionDudosa.
+    """
+    cfg    = _cfg()
+    client = _wsfe_client()
+    for intento in range(2):
+        with _numero_reservado(cbte_tipo, len(dets)) as reserva:
+            primero = reserva.numero
+            if al_numerar is not None:
+                try:
+                    al_numerar(primero)
+                except Exception:
+                    reserva.liberar()
+                    raise
+            try:
+                resp = client.service.FECAESolicitar(
+                    Auth=_auth(),
+                    FeCAEReq={
+                        'FeCabReq': {
+                            'CantReg':  len(dets),
+                            'PtoVta':   cfg['punto_venta'],
+                            'CbteTipo': cbte_tipo,
+                        },
+                        'FeDetReq': {'FECAEDetRequest': [
+                            dict(det, CbteDesde=primero + i, CbteHasta=primero + i)
+                            for i, det in enumerate(dets)
+                        ]},
+                    },
+                )
+            except Exception as e:
+                # Queda sin confirmar: la próxima reserva consulta a AFIP
+                raise EmisionDudosa(
+                    f"ARCA no respondió al pedir CAE de los N° {primero}-{primero + len(dets) - 1}"
+                    f" (tipo {cbte_tipo}): {e}"
+                ) from e
+            det_resps = (resp.FeDetResp.FECAEDetResponse if resp.FeDetResp else None) or []
+            aprobados = [int(d.CbteDesde) - primero for d in det_resps if d.Resultado == 'A']
+            if aprobados and sorted(aprobados) == list(range(len(aprobados))):
+                reserva.confirmar(len(aprobados))
+            elif ERROR_NUMERO_FUERA_DE_SECUENCIA in _codigos_error(
+                    resp, det_resps[0] if det_resps else None):
+                # Queda sin confirmar: la próxima reserva consulta a AFIP
+                if intento == 0 and not aprobados:
+                    logger.warning("AFIP 10016 para N° %s (tipo %s): resincronizando",
+                                   primero, cbte_tipo)
+                    continue
+            elif not aprobados:
+                reserva.liberar()
+            # Aprobados salteados: estado dudoso, se verifica en la próxima emisión
+        return primero, resp
+
+
+def _preparar_factura(venta, cliente):
+    """Tipo de comprobante e importes de la factura de una venta.
+
+    Devuelve (cbte_tipo, det, imp_neto, imp_iva); det sin CbteDesde/CbteHasta.
+    Lanza ValueError si faltan datos del cliente.
     """
     from config.afip import (
         CBTE_TIPO_FACTURA_A, CBTE_TIPO_FACTURA_B,
         IVA_ALICUOTA_21, IVA_PCT_21,
     )
 
-    cfg = _cfg()
-
     # Determinar tipo de comprobante
     condicion = (cliente['condicion_iva'] or 'consumidor_final').lower().strip()
     cbte_tipo = (CBTE_TIPO_FACTURA_A
@@ -218,10 +728,6 @@ def emitir_factura(venta, cliente, productos):
     if cbte_tipo == CBTE_TIPO_FACTURA_A and not (cliente['cuit'] or '').strip():
         raise ValueError("Para emitir Factura A el cliente debe tener CUIT registrado.")
 
-    # Próximo número
-    ultimo    = obtener_ultimo_numero(cbte_tipo)
-    nro_cbte  = ultimo + 1
-
     # Importes
     total = round(float(venta['total']), 2)
     if cbte_tipo == CBTE_TIPO_FACTURA_A:
@@ -256,13 +762,11 @@ def emitir_factura(venta, cliente, productos):
     }
     cond_iva_id = _COND_IVA_ID.get(condicion, 5)
 
-    # Armar detalle
+    # Armar detalle (CbteDesde/CbteHasta los completa _solicitar_cae)
     det = {
         'Concepto':              1,
         'DocTipo':               doc_tipo,
         'DocNro':                doc_nro,
-        'CbteDesde':             nro_cbte,
-        'CbteHasta':             nro_cbte,
         'CbteFch':               fecha_cbte,
         'ImpTotal':              total,
         'ImpTotConc':            0.0,
@@ -277,32 +781,19 @@ def emitir_factura(venta, cliente, productos):
     det['Iva'] = {
         'AlicIva': [{'Id': IVA_ALICUOTA_21, 'BaseImp': imp_neto, 'Importe': imp_iva}]
     }
+    return cbte_tipo, det, imp_neto, imp_iva
 
-    client = _wsfe_client()
-    resp   = client.service.FECAESolicitar(
-        Auth=_auth(),
-        FeCAEReq={
-            'FeCabReq': {
-                'CantReg':  1,
-                'PtoVta':   cfg['punto_venta'],
-                'CbteTipo': cbte_tipo,
-            },
-            'FeDetReq': {'FECAEDetRequest': [det]},
-        },
-    )
 
-    if resp.Errors:
-        msgs = [f"[{e.Code}] {e.Msg}" for e in resp.Errors.Err]
-        raise RuntimeError("AFIP error: " + "; ".join(msgs))
+def _observaciones(det_resp):
+    if det_resp.Observaciones and det_resp.Observaciones.Obs:
+        return [f"[{o.Code}] {o.Msg}" for o in det_resp.Observaciones.Obs]
+    return []
 
-    det_resp = resp.FeDetResp.FECAEDetResponse[0]
 
-    if det_resp.Resultado == 'R':
-        obs = []
-        if det_resp.Observaciones and det_resp.Observaciones.Obs:
-            obs = [f"[{o.Code}] {o.Msg}" for o in det_resp.Observaciones.Obs]
-        raise RuntimeError("AFIP rechazó la solicitud: " + ("; ".join(obs) or "sin detalle"))
+def _datos_factura(cbte_tipo, nro_cbte, det_resp, imp_neto, imp_iva):
+    from config.afip import CBTE_TIPO_FACTURA_A
 
+    cfg        = _cfg()
     tipo_letra = 'A' if cbte_tipo == CBTE_TIPO_FACTURA_A else 'B'
     cae        = det_resp.CAE
     cae_vto_r  = str(det_resp.CAEFchVto or '')
@@ -329,6 +820,119 @@ def emitir_factura(venta, cliente, productos):
     }
 
 
+def emitir_factura(venta, cliente, productos):
+    """
+    Solicita CAE a ARCA para la venta dada.
+    Devuelve dict: {tipo, numero, cae, cae_vto, fecha, cbte_tipo, punto_venta}.
+    Lanza RuntimeError o ValueError con el mensaje de error para mostrar al usuario.
+    """
+    cbte_tipo, det, imp_neto, imp_iva = _preparar_factura(venta, cliente)
+
+    nro_cbte, resp = _solicitar_cae(cbte_tipo, [det])
+
+    if resp.Errors:
+        raise _error_afip("AFIP error: ", resp.Errors.Err)
+
+    det_resp = resp.FeDetResp.FECAEDetResponse[0]
+
+    if det_resp.Resultado == 'R':
+        obs = _observaciones(det_resp)
+        raise RechazoAFIP("AFIP rechazó la solicitud: " + ("; ".join(obs) or "sin detalle"))
+
+    return _datos_factura(cbte_tipo, nro_cbte, det_resp, imp_neto, imp_iva)
+
+
+def emitir_facturas_lote(ventas, al_numerar=None):
+    """Factura muchas ventas con la menor cantidad de FECAESolicitar.
+
+    ventas: lista de (venta, cliente). Se agrupan por tipo de comprobante y
+    se envían de a AFIP_CONFIG['max_registros_lote'] por llamada (CantReg),
+    en orden de fecha. Devuelve {venta_id: dict de emitir_factura | Exception};
+    las ventas de un envío sin respuesta quedan con EmisionDudosa.
+
+    al_numerar(cbte_tipo, punto_venta, [(venta_id, numero)]) se llama antes
+    de cada envío (ver _solicitar_cae).
+    """
+    cfg = _cfg()
+    resultados = {}
+    por_tipo   = {}
+    for venta, cliente in sorted(ventas, key=lambda vc: (str(vc[0]['fecha'] or ''), vc[0]['id'])):
+        try:
+            cbte_tipo, det, imp_neto, imp_iva = _preparar_factura(venta, cliente)
+        except (ValueError, TypeError) as e:
+            resultados[venta['id']] = ValueError(str(e))
+            continue
+        por_tipo.setdefault(cbte_tipo, []).append((venta['id'], det, imp_neto, imp_iva))
+
+    tamano = max(1, cfg['max_registros_lote'])
+    for cbte_tipo, pendientes in por_tipo.items():
+        reenviados = set()
+        while pendientes:
+            lote, pendientes = pendientes[:tamano], pendientes[tamano:]
+            numerar = None
+            if al_numerar is not None:
+                def numerar(primero, cbte_tipo=cbte_tipo, lote=lote):
+                    al_numerar(cbte_tipo, cfg['punto_venta'],
+                               [(venta_id, primero + j) for j, (venta_id, *_) in enumerate(lote)])
+            try:
+                primero, resp = _solicitar_cae(cbte_tipo, [det for _, det, _, _ in lote],
+                                               al_numerar=numerar)
+            except Exception as e:
+                logger.exception("Error en lote de %s comprobantes tipo %s", len(lote), cbte_tipo)
+                for venta_id, *_ in lote:
+                    resultados[venta_id] = e
+                continue
+
+            error_general = None
+            if resp.Errors:
+                error_general = _error_afip("AFIP error: ", resp.Errors.Err)
+            det_resps = {
+                int(d.CbteDesde): d
+                for d in ((resp.FeDetResp.FECAEDetResponse if resp.FeDetResp else None) or [])
+            }
+            reenviar = []
+            for j, (venta_id, det, imp_neto, imp_iva) in enumerate(lote):
+                det_resp = det_resps.get(primero + j)
+                if (det_resp is not None and det_resp.Resultado != 'A' and j > 0
+                        and venta_id not in reenviados
+                        and _codigos_error(resp, det_resp) == {ERROR_NUMERO_FUERA_DE_SECUENCIA}):
+                    # Quedó fuera de secuencia porque se rechazó uno anterior del lote
+                    reenviados.add(venta_id)
+                    reenviar.append((venta_id, det, imp_neto, imp_iva))
+                elif det_resp is not None and det_resp.Resultado == 'A':
+                    resultados[venta_id] = _datos_factura(cbte_tipo, primero + j, det_resp,
+                                                          imp_neto, imp_iva)
+                elif det_resp is not None:
+                    obs = _observaciones(det_resp)
+                    resultados[venta_id] = RechazoAFIP(
+                        "AFIP rechazó la solicitud: " + ("; ".join(obs) or "sin detalle"))
+                else:
+                    resultados[venta_id] = error_general or RuntimeError("AFIP no devolvió resultado")
+            pendientes = reenviar + pendientes
+            logger.info("Lote tipo %s: %d comprobantes enviados en un FECAESolicitar",
+                        cbte_tipo, len(lote))
+    return resultados
+
+
+def recuperar_factura(venta, cliente, cbte_tipo, numero, punto_venta=None):
+    """Factura que AFIP ya autorizó para la venta con ese número tras un envío
+    sin respuesta (EmisionDudosa). Devuelve el mismo dict que emitir_factura,
+    o None si el número no existe en AFIP o es de otro comprobante.
+    """
+    _, det, imp_neto, imp_iva = _preparar_factura(venta, cliente)
+    comp = consultar_comprobante(cbte_tipo, numero, punto_venta)
+    if comp is None or comp.Resultado != 'A':
+        return None
+    if (int(comp.DocNro or 0), round(float(comp.ImpTotal or 0), 2), str(comp.CbteFch)) != \
+            (det['DocNro'], det['ImpTotal'], det['CbteFch']):
+        # El número se reusó para otra venta después del envío dudoso
+        logger.warning("Comprobante tipo %s N° %s no corresponde a la venta #%s",
+                       cbte_tipo, numero, venta['id'])
+        return None
+    det_resp = SimpleNamespace(CAE=comp.CodAutorizacion, CAEFchVto=comp.FchVto)
+    return _datos_factura(cbte_tipo, numero, det_resp, imp_neto, imp_iva)
+
+
 # ── Nota de Crédito ───────────────────────────────────────────────────────────
 
 def emitir_nota_credito(venta, cliente):
@@ -358,9 +962,6 @@ def emitir_nota_credito(venta, cliente):
         cbte_tipo_original = CBTE_TIPO_FACTURA_B
         tipo_letra         = 'B'
 
-    ultimo   = obtener_ultimo_numero(cbte_tipo_nc)
-    nro_cbte = ultimo + 1
-
     total    = round(float(venta['total']), 2)
     imp_neto = round(total / (1 + IVA_PCT_21), 2)
     imp_iva  = round(total - imp_neto, 2)
@@ -391,8 +992,6 @@ def emitir_nota_credito(venta, cliente):
         'Concepto':               1,
         'DocTipo':                doc_tipo,
         'DocNro':                 doc_nro,
-        'CbteDesde':              nro_cbte,
-        'CbteHasta':              nro_cbte,
         'CbteFch':                fecha_cbte,
         'ImpTotal':               total,
         'ImpTotConc':             0.0,
@@ -416,29 +1015,17 @@ def emitir_nota_credito(venta, cliente):
         'AlicIva': [{'Id': IVA_ALICUOTA_21, 'BaseImp': imp_neto, 'Importe': imp_iva}]
     }
 
-    client = _wsfe_client()
-    resp   = client.service.FECAESolicitar(
-        Auth=_auth(),
-        FeCAEReq={
-            'FeCabReq': {
-                'CantReg':  1,
-                'PtoVta':   cfg['punto_venta'],
-                'CbteTipo': cbte_tipo_nc,
-            },
-            'FeDetReq': {'FECAEDetRequest': [det]},
-        },
-    )
+    nro_cbte, resp = _solicitar_cae(cbte_tipo_nc, [det])
 
     if resp.Errors:
-        msgs = [f"[{e.Code}] {e.Msg}" for e in resp.Errors.Err]
-        raise RuntimeError("AFIP error NC: " + "; ".join(msgs))
+        raise _error_afip("AFIP error NC: ", resp.Errors.Err)
 
     det_resp = resp.FeDetResp.FECAEDetResponse[0]
     if det_resp.Resultado == 'R':
         obs = []
         if det_resp.Observaciones and det_resp.Observaciones.Obs:
             obs = [f"[{o.Code}] {o.Msg}" for o in det_resp.Observaciones.Obs]
-        raise RuntimeError("AFIP rechazó la NC: " + ("; ".join(obs) or "sin detalle"))
+        raise RechazoAFIP("AFIP rechazó la NC: " + ("; ".join(obs) or "sin detalle"))
 
     cae       = det_resp.CAE
     cae_vto_r = str(det_resp.CAEFchVto or '')
@@ -470,22 +1057,13 @@ def generar_pdf_factura(venta_id, venta, cliente, productos, factura,
     Genera el PDF de la factura (o nota de crédito) y lo guarda en static/facturas/.
     Devuelve la ruta relativa al proyecto.
     """
-    from reportlab.lib import colors
-    from reportlab.lib.enums import TA_CENTER, TA_RIGHT
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-    from reportlab.lib.units import cm
-    from reportlab.platypus import (
-        HRFlowable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle,
-    )
-    from config.afip import AFIP_CONFIG
+    contenido = _render_pdf_factura(venta_id, venta, cliente, productos, factura,
+                                    es_nota_credito, cbte_asoc_str)
+    return guardar_pdf_comprobante(venta_id, contenido, es_nota_credito)
 
-    cfg       = AFIP_CONFIG
-    pv_fmt    = f"{cfg['punto_venta']:04d}"
-    nro_fmt   = f"{factura['numero']:08d}"
-    tipo      = factura['tipo']          # 'A' o 'B'
 
-    # Directorio de destino
+def guardar_pdf_comprobante(venta_id, contenido, es_nota_credito=False):
+    """Escribe el PDF en static/facturas/ y devuelve la ruta relativa al proyecto."""
     base_dir  = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     facturas_dir = os.path.join(base_dir, 'static', 'facturas')
     os.makedirs(facturas_dir, exist_ok=True)
@@ -495,59 +1073,87 @@ def generar_pdf_factura(venta_id, venta, cliente, productos, factura,
     abs_path  = os.path.join(facturas_dir, filename)
     rel_path  = f"static/facturas/{filename}"
 
-    buf = io.BytesIO()
+    with open(abs_path, 'wb') as f:
+        f.write(contenido)
+
+    logger.info("PDF %s guardado en %s", suffix, abs_path)
+    return rel_path
+
+
+def datos_pdf_comprobante(venta, cliente, productos, es_nota_credito=False):
+    """Argumentos de _render_pdf_factura rearmados desde las columnas factura_*
+    o nota_credito_* de la venta, para regenerar un PDF que falta. Solo tipos
+    simples: se mandan a otro proceso (ver render_pdf_comprobante)."""
+    from config.afip import IVA_PCT_21
+
+    pref     = 'nota_credito_' if es_nota_credito else 'factura_'
+    total    = round(float(venta['total']), 2)
+    imp_neto = round(total / (1 + IVA_PCT_21), 2)
+    return {
+        'venta_id': venta['id'],
+        'venta':    {'total': venta['total']},
+        'cliente':  {k: cliente[k] for k in ('razon_social', 'nombre', 'cuit', 'condicion_iva')},
+        'productos': [tuple(p) for p in productos],
+        'factura': {
+            'tipo':     venta[pref + 'tipo'],
+            'numero':   venta[pref + 'numero'],
+            'cae':      venta[pref + 'cae'],
+            'cae_vto':  venta[pref + 'cae_vto'],
+            'fecha':    venta[pref + 'fecha'],
+            'imp_neto': imp_neto,
+            'imp_iva':  round(total - imp_neto, 2),
+        },
+        'es_nota_credito': es_nota_credito,
+        'cbte_asoc_str': (f"Factura {venta['factura_tipo']} N° {int(venta['factura_numero']):08d}"
+                          if es_nota_credito else None),
+    }
+
+
+def render_pdf_comprobante(datos):
+    """Bytes del PDF a partir de datos_pdf_comprobante (para services/pdf_pool)."""
+    return _render_pdf_factura(**datos)
+
+
+def _render_pdf_factura(venta_id, venta, cliente, productos, factura,
+                        es_nota_credito=False, cbte_asoc_str=None):
+    """Bytes del PDF de la factura o nota de crédito."""
+    from reportlab.lib import colors
+    from reportlab.lib.units import cm
+    from reportlab.platypus import HRFlowable, Paragraph, Spacer, Table
+    from config.afip import AFIP_CONFIG
+    from services import pdf_layout as pdf
+
+    cfg       = AFIP_CONFIG
+    pv_fmt    = f"{cfg['punto_venta']:04d}"
+    nro_fmt   = f"{factura['numero']:08d}"
+    tipo      = factura['tipo']          # 'A' o 'B'
+
     titulo_doc = f"{'Nota de Crédito' if es_nota_credito else 'Factura'} {tipo} {nro_fmt} - Venta #{venta_id}"
-    doc = SimpleDocTemplate(buf, pagesize=A4,
-                            title=titulo_doc,
-                            leftMargin=2*cm, rightMargin=2*cm,
-                            topMargin=1.5*cm, bottomMargin=2*cm)
-
-    styles  = getSampleStyleSheet()
-    C_AZUL  = colors.HexColor('#4361EE')
-    C_GRIS  = colors.HexColor('#F1F3F9')
-    C_BORDE = colors.HexColor('#DEE2E6')
-    C_ROJO  = colors.HexColor('#E63946')
-
-    right_st  = ParagraphStyle('r', parent=styles['Normal'], alignment=TA_RIGHT)
-    center_st = ParagraphStyle('c', parent=styles['Normal'], alignment=TA_CENTER)
-    small_st  = ParagraphStyle('s', parent=styles['Normal'],
-                               fontSize=8, textColor=colors.HexColor('#6c757d'),
-                               alignment=TA_CENTER)
-    bold_st   = ParagraphStyle('b', parent=styles['Normal'], fontName='Helvetica-Bold')
+    buf, doc = pdf.documento(titulo_doc, margen_sup=1.5*cm)
+    st = pdf.estilos()
 
     story = []
 
     # ── Encabezado: emisor | tipo de comprobante ──────────────────────────────
     tipo_color = '#E63946' if tipo == 'A' else '#2B2D42'
     hdr = Table([[
-        Paragraph(
+        pdf.parrafo_fijo(
             f"<b><font size='16'>{cfg['razon_social']}</font></b><br/>"
             f"<font size='9'>CUIT: {cfg['cuit']} &nbsp;|&nbsp; Responsable Inscripto</font><br/>"
-            f"<font size='9'>{cfg['domicilio']}</font>",
-            styles['Normal']
-        ),
-        Paragraph(
-            f"<b><font size='22' color='{tipo_color}'>{tipo}</font></b>",
-            center_st
+            f"<font size='9'>{cfg['domicilio']}</font>"
         ),
+        pdf.parrafo_fijo(f"<b><font size='22' color='{tipo_color}'>{tipo}</font></b>", 'center'),
         Paragraph(
             f"<b><font size='11'>{'NOTA DE CRÉDITO' if es_nota_credito else 'FACTURA'}</font></b><br/>"
             f"<font size='9'>Punto de Venta: <b>{pv_fmt}</b></font><br/>"
             f"<font size='9'>Comp. N°: <b>{nro_fmt}</b></font><br/>"
             f"<font size='9'>Fecha: <b>{(factura['fecha'] or '')[:10]}</b></font>",
-            right_st
+            st['right']
         ),
     ]], colWidths=[9*cm, 1.5*cm, 6.5*cm])
-    hdr.setStyle(TableStyle([
-        ('VALIGN',       (0, 0), (-1, -1), 'MIDDLE'),
-        ('LINEAFTER',    (0, 0), (0, 0),   1, C_BORDE),
-        ('LINEBEFORE',   (2, 0), (2, 0),   1, C_BORDE),
-        ('BOTTOMPADDING',(0, 0), (-1, -1), 8),
-        ('TOPPADDING',   (0, 0), (-1, -1), 8),
-        ('BOX',          (1, 0), (1, 0),   2, colors.HexColor(tipo_color)),
-        ('ALIGN',        (1, 0), (1, 0),   'CENTER'),
-    ]))
-    story += [hdr, HRFlowable(width='100%', thickness=2, color=C_AZUL), Spacer(1, .4*cm)]
+    hdr.setStyle(pdf.estilo_tabla('factura_cabecera'))
+    hdr.setStyle([('BOX', (1, 0), (1, 0), 2, colors.HexColor(tipo_color))])
+    story += [hdr, HRFlowable(width='100%', thickness=2, color=pdf.PRIMARY), Spacer(1, .4*cm)]
 
     # ── Receptor ──────────────────────────────────────────────────────────────
     nombre_rec   = (cliente['razon_social'] or cliente['nombre'] or '—').upper()
@@ -561,22 +1167,16 @@ def generar_pdf_factura(venta_id, venta, cliente, productos, factura,
     cond_rec = cond_rec_map.get((cliente['condicion_iva'] or '').lower(), 'Consumidor Final')
 
     rec = Table([[
-        Paragraph(f"<b>Receptor</b>", bold_st),
-        Paragraph("", styles['Normal']),
+        pdf.parrafo_fijo("<b>Receptor</b>", 'bold'),
+        pdf.parrafo_fijo(""),
     ], [
-        Paragraph(f"<b>Razón social:</b> {nombre_rec}", styles['Normal']),
-        Paragraph(f"<b>CUIT / DNI:</b> {cuit_rec}", styles['Normal']),
+        Paragraph(f"<b>Razón social:</b> {nombre_rec}", st['normal']),
+        Paragraph(f"<b>CUIT / DNI:</b> {cuit_rec}", st['normal']),
     ], [
-        Paragraph(f"<b>Condición IVA:</b> {cond_rec}", styles['Normal']),
-        Paragraph("", styles['Normal']),
+        pdf.parrafo_fijo(f"<b>Condición IVA:</b> {cond_rec}"),
+        pdf.parrafo_fijo(""),
     ]], colWidths=[9*cm, 8*cm])
-    rec.setStyle(TableStyle([
-        ('BACKGROUND',    (0, 0), (-1, 0), C_GRIS),
-        ('FONTNAME',      (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        ('TOPPADDING',    (0, 0), (-1, -1), 5),
-        ('BOX',           (0, 0), (-1, -1), 0.5, C_BORDE),
-    ]))
+    rec.setStyle(pdf.estilo_tabla('factura_receptor'))
     story += [rec, Spacer(1, .4*cm)]
 
     # ── Tabla de ítems ────────────────────────────────────────────────────────
@@ -592,17 +1192,7 @@ def generar_pdf_factura(venta_id, venta, cliente, productos, factura,
         ])
 
     items_tbl = Table(tbl_data, colWidths=[0.8*cm, 9.2*cm, 1.5*cm, 2.8*cm, 2.7*cm])
-    items_tbl.setStyle(TableStyle([
-        ('BACKGROUND',    (0, 0), (-1, 0), C_AZUL),
-        ('TEXTCOLOR',     (0, 0), (-1, 0), colors.white),
-        ('FONTNAME',      (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE',      (0, 0), (-1, -1), 9),
-        ('ROWBACKGROUNDS',(0, 1), (-1, -1), [colors.white, C_GRIS]),
-        ('GRID',          (0, 0), (-1, -1), 0.5, C_BORDE),
-        ('ALIGN',         (2, 0), (-1, -1), 'RIGHT'),
-        ('TOPPADDING',    (0, 0), (-1, -1), 5),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-    ]))
+    items_tbl.setStyle(pdf.estilo_tabla('factura_items'))
     story += [items_tbl, Spacer(1, .4*cm)]
 
     # ── Totales ───────────────────────────────────────────────────────────────
@@ -618,59 +1208,38 @@ def generar_pdf_factura(venta_id, venta, cliente, productos, factura,
         ]
     tot_rows.append(['', ''])
     tot_rows.append([
-        Paragraph('<b>TOTAL:</b>', right_st),
-        Paragraph(f"<b>${total:,.2f}</b>", right_st),
+        pdf.parrafo_fijo('<b>TOTAL:</b>', 'right'),
+        Paragraph(f"<b>${total:,.2f}</b>", st['right']),
     ])
 
     tot_tbl = Table(tot_rows, colWidths=[13*cm, 4*cm])
-    tot_tbl.setStyle(TableStyle([
-        ('ALIGN',         (0, 0), (-1, -1), 'RIGHT'),
-        ('FONTSIZE',      (0, 0), (-1, -1), 9),
-        ('LINEABOVE',     (0, -1), (-1, -1), 1, C_AZUL),
-        ('TOPPADDING',    (0, 0), (-1, -1), 4),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-    ]))
+    tot_tbl.setStyle(pdf.estilo_tabla('factura_totales'))
     story += [tot_tbl, Spacer(1, .6*cm)]
 
     # ── CAE ───────────────────────────────────────────────────────────────────
-    story.append(HRFlowable(width='100%', thickness=1, color=C_BORDE))
+    story.append(pdf.linea())
     story.append(Spacer(1, .2*cm))
 
     cae_tbl = Table([[
         Paragraph(
             f"<b>CAE N°:</b> {factura['cae']}&nbsp;&nbsp;&nbsp;"
             f"<b>Fecha vto. CAE:</b> {factura['cae_vto']}",
-            styles['Normal']
+            st['normal']
         ),
-        Paragraph(
-            '<b><font color="#2ECC71">Comprobante Electrónico Autorizado</font></b>',
-            right_st
+        pdf.parrafo_fijo(
+            '<b><font color="#2ECC71">Comprobante Electrónico Autorizado</font></b>', 'right'
         ),
     ]], colWidths=[10*cm, 7*cm])
-    cae_tbl.setStyle(TableStyle([
-        ('TOPPADDING',    (0, 0), (-1, -1), 4),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-    ]))
+    cae_tbl.setStyle(pdf.estilo_tabla('factura_cae'))
     story.append(cae_tbl)
     if cbte_asoc_str:
         story.append(Spacer(1, .15*cm))
-        story.append(Paragraph(
-            f"<b>Comp. asociado:</b> {cbte_asoc_str}",
-            styles['Normal'],
-        ))
+        story.append(Paragraph(f"<b>Comp. asociado:</b> {cbte_asoc_str}", st['normal']))
     story.append(Spacer(1, .2*cm))
-    story.append(Paragraph(
-        "Documento generado por Sistema de Gestión · Comenda Deco",
-        small_st,
-    ))
+    story.append(pdf.parrafo_fijo(pdf.PIE_SISTEMA, 'small_center'))
 
     doc.build(story)
-
-    with open(abs_path, 'wb') as f:
-        f.write(buf.getvalue())
-
-    logger.info("PDF %s guardado en %s", suffix, abs_path)
-    return rel_path
+    return buf.getvalue()
 
 
 def generar_pdf_nota_credito(venta_id, venta, cliente, productos, nc):
@@ -695,17 +1264,13 @@ def consultar_cuit_padron(cuit_consultar):
                    provincia, codigo_postal, actividad, estado.
     Lanza RuntimeError si el CUIT no existe o si falla la conexión.
     """
-    from zeep import Client, Settings
     from config.afip import WS_PADRON_A13_WSDL
 
     cfg = _cfg()
     token, sign = _obtener_ticket('ws_sr_padron_a13')
     cuit_limpio = str(cuit_consultar).replace('-', '').replace(' ', '').strip()
 
-    client = Client(
-        wsdl=WS_PADRON_A13_WSDL[cfg['modo']],
-        settings=Settings(strict=False, xml_huge_tree=True),
-    )
+    client = _zeep_client(WS_PADRON_A13_WSDL[cfg['modo']])
 
     try:
         resp = client.service.getPersona(
@@ -0,0 +1,120 @@
+# services/agregados_service.py
+"""Totales diarios de ventas, costo de lo vendido y gastos.
+
+agg_ventas_diarias, agg_cogs_diario y agg_gastos_diarios guardan un renglón
+por día y método de pago (o categoría, en gastos). Los resúmenes mensuales y
+las evoluciones de 12 meses leen estas tablas (unos cientos de renglones) en
+lugar de volver a sumar ventas, detalle_venta y gastos en cada visita.
+
+Cada alta, cancelación o edición recalcula sus días con *_en_conn() dentro de
+su propia transacción, así los totales no quedan a medio actualizar, y sube
+la versión de datos con la que services/reportes_cache guarda reportes. El
+origen (Tienda Nube / negocio) sale de metodo_pago, como en el resto de los
+reportes. reconstruir() los arma de cero (reconstruir_agregados.py).
+"""
+import logging
+
+from db import get_conn
+from services.periodos import rango_dias
+from services.reportes_cache import subir_version_en_conn
+
+logger = logging.getLogger(__name__)
+
+_ACTIVA = "(v.estado IS NULL OR v.estado != 'cancelada')"
+
+
+def _rango_sql(columna, desde, hasta):
+    """(condición, parámetros) para [desde, hasta); sin extremos = todo."""
+    conds, params = [], []
+    if desde:
+        conds.append(f"{columna} >= ?")
+        params.append(desde)
+    if hasta:
+        conds.append(f"{columna} < ?")
+        params.append(hasta)
+    return " AND ".join(conds) or "1", params
+
+
+def _refrescar_ventas(conn, desde=None, hasta=None):
+    """Recalcula ventas y costo de lo vendido de los días en [desde, hasta)."""
+    dias, p_dias = _rango_sql('dia', desde, hasta)
+    fechas, p_fechas = _rango_sql('v.fecha', desde, hasta)
+    conn.execute(f"DELETE FROM agg_ventas_diarias WHERE {dias}", p_dias)
+    conn.execute(f"DELETE FROM agg_cogs_diario WHERE {dias}", p_dias)
+    conn.execute(f"""
+        INSERT INTO agg_ventas_diarias (dia, metodo_pago, cantidad, total)
+        SELECT substr(v.fecha, 1, 10), v.metodo_pago, COUNT(*), COALESCE(SUM(v.total), 0)
+        FROM ventas v
+        WHERE {fechas} AND {_ACTIVA}
+        GROUP BY substr(v.fecha, 1, 10), v.metodo_pago
+    """, p_fechas)
+    conn.execute(f"""
+        INSERT INTO agg_cogs_diario (dia, metodo_pago, unidades, cogs)
+        SELECT substr(v.fecha, 1, 10), v.metodo_pago,
+               SUM(dv.cantidad), SUM(dv.cantidad * dv.costo_unitario)
+        FROM detalle_venta dv
+        JOIN ventas v ON dv.venta_id = v.id
+        WHERE {fechas} AND {_ACTIVA}
+          AND COALESCE(dv.costo_unitario, 0) > 0
+        GROUP BY substr(v.fecha, 1, 10), v.metodo_pago
+    """, p_fechas)
+
+
+def _refrescar_gastos(conn, desde=None, hasta=None):
+    """Recalcula los gastos de los días en [desde, hasta)."""
+    dias, p_dias = _rango_sql('dia', desde, hasta)
+    fechas, p_fechas = _rango_sql('fecha', desde, hasta)
+    conn.execute(f"DELETE FROM agg_gastos_diarios WHERE {dias}", p_dias)
+    conn.execute(f"""
+        INSERT INTO agg_gastos_diarios (dia, categoria_id, cantidad, total)
+        SELECT substr(fecha, 1, 10), categoria_id, COUNT(*), COALESCE(SUM(monto), 0)
+        FROM gastos
+        WHERE {fechas}
+        GROUP BY substr(fecha, 1, 10), categoria_id
+    """, p_fechas)
+
+
+# ── Dentro de la transacción que modifica ────────────────────────────────────
+
+def refrescar_ventas_en_conn(conn, *fechas):
+    """Recalcula los días de `fechas` (fecha de cada venta creada, cancelada o
+    modificada). Va antes del commit, en la misma conexión."""
+    dias = sorted({str(f)[:10] for f in fechas if f})
+    for dia in dias:
+        _refrescar_ventas(conn, *rango_dias(dia, dia))
+    if dias:
+        subir_version_en_conn(conn, 'ventas')
+
+
+def refrescar_gastos_en_conn(conn, *fechas):
+    """Como refrescar_ventas_en_conn, para gastos. Al editar un gasto se pasan
+    la fecha anterior y la nueva."""
+    dias = sorted({str(f)[:10] for f in fechas if f})
+    for dia in dias:
+        _refrescar_gastos(conn, *rango_dias(dia, dia))
+    if dias:
+        subir_version_en_conn(conn, 'gastos')
+
+
+# ── Reconstrucción ───────────────────────────────────────────────────────────
+
+def reconstruir(desde=None, hasta=None):
+    """Rearma los totales de los días desde..hasta (inclusive; sin extremos,
+    todos) a partir de ventas y gastos. Devuelve cuántos renglones quedaron."""
+    desde = rango_dias(desde, desde)[0] if desde else None
+    hasta = rango_dias(hasta, hasta)[1] if hasta else None
+    conn = get_conn()
+    try:
+        _refrescar_ventas(conn, desde, hasta)
+        _refrescar_gastos(conn, desde, hasta)
+        subir_version_en_conn(conn, 'ventas', 'gastos')
+        conn.commit()
+        cuentas = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                   for t in ('agg_ventas_diarias', 'agg_cogs_diario', 'agg_gastos_diarios')}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    logger.info("Agregados reconstruidos: %s", cuentas)
+    return cuentas
@@ -3,7 +3,7 @@ import io
 import logging
 from datetime import datetime
 
-from models import get_conn
+from models import get_conn, get_conn_lectura
 
 logger = logging.getLogger(__name__)
 
@@ -71,7 +71,7 @@ def registrar_movimiento_manual(tipo, descripcion, monto, metodo_pago,
 
 def get_saldos(fecha_desde=None, fecha_hasta=None):
     """Devuelve saldo total y por método de pago."""
-    conn = get_conn()
+    conn = get_conn_lectura()
     conds, params = [], []
     if fecha_desde:
         conds.append("fecha >= ?");                  params.append(fecha_desde)
@@ -101,7 +101,7 @@ def get_saldos(fecha_desde=None, fecha_hasta=None):
 def listar_movimientos(tipo=None, origen=None, metodo_pago=None,
                         fecha_desde=None, fecha_hasta=None,
                         page=1, per_page=30):
-    conn = get_conn()
+    conn = get_conn_lectura()
     conds, params = [], []
     if tipo:
         conds.append("mc.tipo = ?");         params.append(tipo)
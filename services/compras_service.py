@@ -1,9 +1,9 @@
 # services/compras_service.py
-import io
 import logging
 from datetime import datetime, date
 
 from models import get_conn
+from services.tn_outbox_service import encolar_sync_tn_en_conn, notificar_outbox_tn
 from services.caja_service import registrar_movimiento_en_conn
 
 logger = logging.getLogger(__name__)
@@ -426,6 +426,7 @@ def cerrar_compra(compra_id, usuario_id=None):
                     "UPDATE productos SET costo=?, stock=stock+? WHERE id=?",
                     (costo, cant_inventario, it['producto_id'])
                 )
+                encolar_sync_tn_en_conn(conn, it['producto_id'])
             else:
                 sku = f"COMP-{compra_id}-{it['id']}"
                 existing = conn.execute(
@@ -448,9 +449,11 @@ def cerrar_compra(compra_id, usuario_id=None):
                         "UPDATE productos SET costo=?, stock=stock+? WHERE id=?",
                         (costo, cant_inventario, existing['id'])
                     )
+                    encolar_sync_tn_en_conn(conn, existing['id'])
 
         conn.execute("UPDATE compras SET estado='cerrado' WHERE id=?", (compra_id,))
         conn.commit()
+        notificar_outbox_tn()
         return True, None
     except Exception as e:
         conn.rollback()
@@ -483,136 +486,87 @@ def calcular_totales(compra_id):
 
 # ── PDF de la orden ───────────────────────────────────────────────────────────
 
-def generar_pdf_compra(compra_id):
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import cm
-    from reportlab.lib.enums import TA_RIGHT, TA_CENTER
-    from reportlab.platypus import (
-        SimpleDocTemplate, Table, TableStyle,
-        Paragraph, Spacer, HRFlowable
-    )
-
+def datos_pdf_compra(compra_id):
+    """Filas de las que sale el PDF de la compra, como dicts (se mandan a otro
+    proceso y se hashean para la caché de services/pdf_pool), o None."""
     compra = get_compra(compra_id)
     if not compra:
         return None
+    return {
+        'compra': dict(compra),
+        'items':  [dict(r) for r in get_compra_items(compra_id)],
+        'pagos':  [dict(r) for r in get_compra_pagos(compra_id)],
+    }
 
-    items = get_compra_items(compra_id)
-    pagos = get_compra_pagos(compra_id)
-
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4,
-                            title=f"Compra {compra['numero']}",
-                            rightMargin=1.8*cm, leftMargin=1.8*cm,
-                            topMargin=2*cm, bottomMargin=2*cm)
-
-    styles  = getSampleStyleSheet()
-    story   = []
 
-    PRIMARY = colors.HexColor('#4361ee')
-    LIGHT   = colors.HexColor('#f1f3f9')
-    BORDER  = colors.HexColor('#dee2e6')
-    ALT_ROW = colors.HexColor('#f8f9fa')
+def render_pdf_compra(datos):
+    """Bytes del PDF de la compra a partir de datos_pdf_compra (no toca la base)."""
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Table, Paragraph, Spacer
+    from services import pdf_layout as pdf
 
-    right_s  = ParagraphStyle('right',  parent=styles['Normal'], alignment=TA_RIGHT)
-    center_s = ParagraphStyle('center', parent=styles['Normal'], alignment=TA_CENTER)
-    small_g  = ParagraphStyle('small',  parent=styles['Normal'],
-                               fontSize=8, textColor=colors.HexColor('#6c757d'))
+    compra, items, pagos = datos['compra'], datos['items'], datos['pagos']
 
-    # ── Cabecera ──────────────────────────────────────────────────────────────
-    hdr = Table([[
-        Paragraph("<b><font size='16' color='#4361ee'>COMENDA DECO</font></b>",
-                  styles['Normal']),
-        Paragraph(
-            f"<b><font size='13'>ORDEN DE COMPRA</font></b><br/>"
-            f"<font size='11'>N° {compra['numero']}</font>",
-            right_s
-        ),
-    ]], colWidths=[10*cm, 7.4*cm])
-    hdr.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    story += [hdr, HRFlowable(width="100%", thickness=2, color=PRIMARY), Spacer(1, .3*cm)]
+    buf, doc = pdf.documento(f"Compra {compra['numero']}", margen=1.8*cm)
+    st      = pdf.estilos()
+    right_s = st['right']
+    story   = pdf.encabezado('ORDEN DE COMPRA', compra['numero'], compacto=True)
 
     # ── Fechas / Estado ───────────────────────────────────────────────────────
     estado_lbl = dict(ESTADOS_COMPRA).get(compra['estado'], compra['estado']).upper()
     fecha_row = Table([[
-        Paragraph(f"<b>Fecha:</b> {compra['fecha']}", styles['Normal']),
-        Paragraph(f"<b>Estado:</b> {estado_lbl}", styles['Normal']),
+        Paragraph(f"<b>Fecha:</b> {compra['fecha']}", st['normal']),
+        Paragraph(f"<b>Estado:</b> {estado_lbl}", st['normal']),
         Paragraph(
             f"<b>Factura proveedor:</b> {compra['numero_factura_proveedor'] or '—'}",
-            styles['Normal']
+            st['normal']
         ),
     ]], colWidths=[5*cm, 5*cm, 7.4*cm])
-    fecha_row.setStyle(TableStyle([('BOTTOMPADDING', (0, 0), (-1, -1), 6)]))
+    fecha_row.setStyle(pdf.estilo_tabla('fila_compacta'))
     story += [fecha_row, Spacer(1, .2*cm)]
 
     # ── Proveedor ─────────────────────────────────────────────────────────────
-    story.append(Paragraph(
-        "<b>PROVEEDOR</b>",
-        ParagraphStyle('hdr_sec', parent=styles['Normal'],
-                       backColor=LIGHT, leftPadding=6, fontSize=10)
-    ))
+    story.append(pdf.seccion("PROVEEDOR"))
     story.append(Spacer(1, .15*cm))
     prov_lines = [f"<b>{compra['proveedor_nombre']}</b>"]
     if compra['cuit']:
         prov_lines.append(f"CUIT: {compra['cuit']}")
     if compra['condicion_iva']:
         prov_lines.append(f"IVA: {compra['condicion_iva']}")
-    story += [Paragraph("<br/>".join(prov_lines), styles['Normal']), Spacer(1, .3*cm)]
+    story += [Paragraph("<br/>".join(prov_lines), st['normal']), Spacer(1, .3*cm)]
 
     # ── Tabla de ítems ────────────────────────────────────────────────────────
-    story.append(Paragraph(
-        "<b>PRODUCTOS DEL PEDIDO</b>",
-        ParagraphStyle('hdr_sec', parent=styles['Normal'],
-                       backColor=LIGHT, leftPadding=6, fontSize=10)
-    ))
+    story.append(pdf.seccion("PRODUCTOS DEL PEDIDO"))
     story.append(Spacer(1, .15*cm))
 
     total_compra = 0.0
     if items:
         tbl_data = [[
-            Paragraph("<b>Descripción</b>", styles['Normal']),
-            Paragraph("<b>Cant.</b>", right_s),
-            Paragraph("<b>Costo Unit. (ARS)</b>", right_s),
-            Paragraph("<b>Subtotal (ARS)</b>", right_s),
+            pdf.parrafo_fijo("<b>Descripción</b>"),
+            pdf.parrafo_fijo("<b>Cant.</b>", 'right'),
+            pdf.parrafo_fijo("<b>Costo Unit. (ARS)</b>", 'right'),
+            pdf.parrafo_fijo("<b>Subtotal (ARS)</b>", 'right'),
         ]]
         for it in items:
             subtotal = float(it['cantidad']) * float(it['costo_unitario'])
             total_compra += subtotal
             tbl_data.append([
-                Paragraph(it['descripcion'], styles['Normal']),
+                Paragraph(it['descripcion'], st['normal']),
                 Paragraph(f"{it['cantidad']:.0f}", right_s),
                 Paragraph(f"$ {float(it['costo_unitario']):,.2f}".replace(',', '.'), right_s),
                 Paragraph(f"$ {subtotal:,.2f}".replace(',', '.'), right_s),
             ])
         tbl_data.append([
-            Paragraph("<b>TOTAL</b>", right_s), '', '',
+            pdf.parrafo_fijo("<b>TOTAL</b>", 'right'), '', '',
             Paragraph(f"<b>$ {total_compra:,.2f}</b>".replace(',', '.'), right_s),
         ])
         t = Table(tbl_data, colWidths=[8*cm, 2*cm, 4*cm, 3.4*cm])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), PRIMARY),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, ALT_ROW]),
-            ('BACKGROUND', (0, -1), (-1, -1), LIGHT),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, BORDER),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('SPAN', (0, -1), (2, -1)),
-        ]))
+        t.setStyle(pdf.estilo_tabla('detalle_con_total'))
+        t.setStyle([('SPAN', (0, -1), (2, -1))])
         story += [t, Spacer(1, .4*cm)]
 
     # ── Pagos al proveedor ────────────────────────────────────────────────────
-    story.append(Paragraph(
-        "<b>PAGOS AL PROVEEDOR</b>",
-        ParagraphStyle('hdr_sec', parent=styles['Normal'],
-                       backColor=LIGHT, leftPadding=6, fontSize=10)
-    ))
+    story.append(pdf.seccion("PAGOS AL PROVEEDOR"))
     story.append(Spacer(1, .15*cm))
 
     if pagos:
@@ -620,70 +574,52 @@ def generar_pdf_compra(compra_id):
         saldo = total_compra - total_pagado
 
         p_data = [[
-            Paragraph("<b>Fecha</b>", styles['Normal']),
-            Paragraph("<b>Monto (ARS)</b>", right_s),
-            Paragraph("<b>Método</b>", styles['Normal']),
+            pdf.parrafo_fijo("<b>Fecha</b>"),
+            pdf.parrafo_fijo("<b>Monto (ARS)</b>", 'right'),
+            pdf.parrafo_fijo("<b>Método</b>"),
         ]]
         for pg in pagos:
             p_data.append([
-                Paragraph(pg['fecha_pago'], styles['Normal']),
+                Paragraph(pg['fecha_pago'], st['normal']),
                 Paragraph(f"$ {float(pg['monto']):,.2f}".replace(',', '.'), right_s),
-                Paragraph(pg['metodo_pago'] or '—', styles['Normal']),
+                Paragraph(pg['metodo_pago'] or '—', st['normal']),
             ])
         p_data.append([
-            Paragraph("<b>TOTAL PAGADO</b>", right_s),
+            pdf.parrafo_fijo("<b>TOTAL PAGADO</b>", 'right'),
             Paragraph(f"<b>$ {total_pagado:,.2f}</b>".replace(',', '.'), right_s),
             '',
         ])
         pt = Table(p_data, colWidths=[5*cm, 5*cm, 7.4*cm])
-        pt.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), PRIMARY),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, ALT_ROW]),
-            ('BACKGROUND', (0, -1), (-1, -1), LIGHT),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, BORDER),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('SPAN', (0, -1), (0, -1)),
-        ]))
+        pt.setStyle(pdf.estilo_tabla('detalle_con_total'))
+        pt.setStyle([('SPAN', (0, -1), (0, -1))])
         story += [pt, Spacer(1, .2*cm)]
 
         if saldo > 0.01:
             story.append(Paragraph(
                 f"<font color='#dc2626'><b>Saldo pendiente: $ {saldo:,.2f}</b></font>",
-                styles['Normal']
+                st['normal']
             ))
         else:
-            story.append(Paragraph(
-                "<font color='#16a34a'><b>Pagado en su totalidad</b></font>",
-                styles['Normal']
-            ))
+            story.append(pdf.parrafo_fijo("<font color='#16a34a'><b>Pagado en su totalidad</b></font>"))
         story.append(Spacer(1, .4*cm))
     else:
-        story += [Paragraph("Sin pagos registrados.", small_g), Spacer(1, .4*cm)]
+        story += [pdf.parrafo_fijo("Sin pagos registrados.", 'small'), Spacer(1, .4*cm)]
 
     # ── Observaciones ─────────────────────────────────────────────────────────
     if compra['observaciones']:
-        story.append(Paragraph(
-            "<b>OBSERVACIONES</b>",
-            ParagraphStyle('hdr_sec', parent=styles['Normal'],
-                           backColor=LIGHT, leftPadding=6, fontSize=10)
-        ))
+        story.append(pdf.seccion("OBSERVACIONES"))
         story.append(Spacer(1, .15*cm))
-        story.append(Paragraph(compra['observaciones'], styles['Normal']))
+        story.append(Paragraph(compra['observaciones'], st['normal']))
         story.append(Spacer(1, .3*cm))
 
     # ── Pie ───────────────────────────────────────────────────────────────────
-    story.append(HRFlowable(width="100%", thickness=1, color=BORDER))
+    story.append(pdf.linea())
     story.append(Spacer(1, .15*cm))
     from datetime import datetime as _dt
     story.append(Paragraph(
         f"<font size='8' color='#6c757d'>Generado el {_dt.now().strftime('%d/%m/%Y %H:%M')}</font>",
-        center_s
+        st['center']
     ))
 
     doc.build(story)
-    buf.seek(0)
-    return buf
+    return buf.getvalue()
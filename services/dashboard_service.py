@@ -0,0 +1,144 @@
+# services/dashboard_service.py
+"""KPIs de ventas del panel de inicio, en memoria del proceso.
+
+Cantidad y total del día y del mes (de agg_ventas_diarias) y las últimas
+ventas se calculan una vez y después se mantienen con los eventos de venta: venta_registrada()
+(mostrador y Tienda Nube) y venta_cancelada(). Así el inicio no consulta la
+tabla ventas en cada visita. TTL_SEG acota lo que puede quedar desfasado por
+escrituras que no pasan por estos eventos (otro proceso, cambios a mano).
+"""
+import threading
+import time
+from datetime import datetime
+
+from db import get_conn_lectura
+from services.periodos import entre, rango_clave
+
+CACHE_ACTIVO = True
+TTL_SEG = 300
+ULTIMAS = 5
+
+_lock = threading.Lock()
+_periodos = {}          # {'YYYY-MM-DD' | 'YYYY-MM': (cantidad, total, calculado_en)}
+_ultimas = None         # [(id, fecha, cliente_id, total)], más nuevas primero; None = recalcular
+_ultimas_en = 0.0
+_generacion = 0         # cambia con cada evento: descarta cálculos que se cruzaron con uno
+
+
+def _calcular_periodo(clave):
+    conn = get_conn_lectura()
+    try:
+        fila = conn.execute(
+            "SELECT COALESCE(SUM(cantidad), 0), COALESCE(SUM(total), 0) FROM agg_ventas_diarias"
+            f" WHERE {entre('dia')}",
+            rango_clave(clave)
+        ).fetchone()
+    finally:
+        conn.close()
+    return fila[0], fila[1]
+
+
+def _calcular_ultimas():
+    conn = get_conn_lectura()
+    try:
+        return [tuple(r) for r in conn.execute("""
+            SELECT id, fecha, cliente_id, total FROM ventas
+            WHERE estado IS NULL OR estado != 'cancelada'
+            ORDER BY fecha DESC, id DESC LIMIT ?
+        """, (ULTIMAS,)).fetchall()]
+    finally:
+        conn.close()
+
+
+def _periodo(clave, vigentes):
+    with _lock:
+        valor = _periodos.get(clave)
+        generacion = _generacion
+    if CACHE_ACTIVO and valor and time.monotonic() - valor[2] < TTL_SEG:
+        return valor[0], valor[1]
+    cantidad, total = _calcular_periodo(clave)
+    with _lock:
+        if CACHE_ACTIVO and generacion == _generacion:
+            for vieja in [k for k in _periodos if k not in vigentes]:
+                del _periodos[vieja]
+            _periodos[clave] = (cantidad, total, time.monotonic())
+    return cantidad, total
+
+
+def _ultimas_ventas():
+    global _ultimas, _ultimas_en
+    with _lock:
+        ultimas, en, generacion = _ultimas, _ultimas_en, _generacion
+    if not (CACHE_ACTIVO and ultimas is not None and time.monotonic() - en < TTL_SEG):
+        ultimas = _calcular_ultimas()
+        with _lock:
+            if CACHE_ACTIVO and generacion == _generacion:
+                _ultimas, _ultimas_en = ultimas, time.monotonic()
+    if not ultimas:
+        return []
+
+    # Nombres al momento de mostrar (clientes, no ventas): refleja renombres
+    ids = sorted({u[2] for u in ultimas})
+    conn = get_conn_lectura()
+    try:
+        nombres = dict(conn.execute(
+            f"SELECT id, nombre FROM clientes WHERE id IN ({','.join('?' * len(ids))})", ids
+        ).fetchall())
+    finally:
+        conn.close()
+    # Mismo criterio que el JOIN original: sin cliente no se lista
+    return [(vid, fecha, nombres[cid], total)
+            for vid, fecha, cid, total in ultimas if cid in nombres]
+
+
+def kpis_ventas():
+    """{'cantidad_ventas_hoy', 'total_ventas_hoy', 'cantidad_ventas_mes',
+    'total_ventas_mes', 'ultimas_ventas'} para el panel de inicio."""
+    ahora = datetime.now()
+    dia, mes = ahora.strftime('%Y-%m-%d'), ahora.strftime('%Y-%m')
+    cantidad_hoy, total_hoy = _periodo(dia, (dia, mes))
+    cantidad_mes, total_mes = _periodo(mes, (dia, mes))
+    return {
+        'cantidad_ventas_hoy': cantidad_hoy,
+        'total_ventas_hoy':    total_hoy,
+        'cantidad_ventas_mes': cantidad_mes,
+        'total_ventas_mes':    total_mes,
+        'ultimas_ventas':      _ultimas_ventas(),
+    }
+
+
+# ── Eventos (llamar después del commit) ──────────────────────────────────────
+
+def _sumar(fecha, cantidad, total):
+    for clave in (fecha[:10], fecha[:7]):
+        valor = _periodos.get(clave)
+        if valor:
+            _periodos[clave] = (valor[0] + cantidad, valor[1] + total, valor[2])
+
+
+def venta_registrada(venta_id, fecha, total, cliente_id):
+    global _generacion, _ultimas
+    with _lock:
+        _generacion += 1
+        _sumar(fecha, 1, total)
+        if _ultimas is not None:
+            _ultimas = sorted(_ultimas + [(venta_id, fecha, cliente_id, total)],
+                              key=lambda u: (u[1], u[0]), reverse=True)[:ULTIMAS]
+
+
+def venta_cancelada(venta_id, fecha, total):
+    global _generacion, _ultimas
+    with _lock:
+        _generacion += 1
+        _sumar(fecha, -1, -total)
+        if _ultimas is not None and any(u[0] == venta_id for u in _ultimas):
+            _ultimas = None  # entra la sexta: se vuelve a leer
+
+
+def limpiar():
+    """Descarta todo lo calculado (la próxima visita recalcula)."""
+    global _generacion, _ultimas
+    with _lock:
+        _generacion += 1
+        _periodos.clear()
+        _ultimas = None
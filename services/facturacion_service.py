@@ -0,0 +1,452 @@
+# services/facturacion_service.py
+"""Facturación electrónica en segundo plano.
+
+Las solicitudes de factura se guardan en facturacion_cola y un worker las
+emite en lote (emitir_facturas_lote). Si AFIP falla la fila queda
+pendiente con backoff exponencial; los rechazos por datos quedan 'rechazada'
+con el mensaje de AFIP. La ficha de la venta consulta estado_factura().
+
+Antes de cada envío los números reservados se guardan en la fila. Si el
+envío queda sin respuesta (o el worker se cae) la fila pasa a 'dudosa' y,
+antes de volver a emitir, se consulta a AFIP por ese número: si ya estaba
+autorizado se adopta ese CAE en lugar de pedir otro.
+"""
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from functools import partial
+
+from db import get_conn
+from services.periodos import condiciones
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 12
+BACKOFF_BASE_SEG = 30
+BACKOFF_MAX_SEG = 1800
+INTERVALO_SEG = float(os.getenv('FACTURACION_INTERVALO', '5') or '5')
+LOTE = 250
+# Filas 'procesando' más viejas que esto se consideran de un worker caído
+PROCESANDO_VENCIDO_MIN = 15
+
+
+def _ahora():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _backoff(intentos):
+    return min(BACKOFF_BASE_SEG * 2 ** max(intentos - 1, 0), BACKOFF_MAX_SEG)
+
+
+def _filtro_pendientes(desde, hasta, origen):
+    """(condición SQL, parámetros) de las ventas activas sin factura del filtro.
+    Solo se agregan los extremos de fecha que vienen, así usa el índice de fecha."""
+    fechas, params = condiciones('v.fecha', desde, hasta)
+    conds = ["v.factura_emitida = 0", "v.estado != 'cancelada'", *fechas]
+    if origen:
+        conds.append("(? = 'tiendanube') = (v.metodo_pago = 'Tienda Nube')")
+        params.append(origen)
+    return " AND ".join(conds), params
+
+
+def contar_sin_facturar(desde=None, hasta=None, origen=None):
+    """Cantidad de ventas activas sin factura ni solicitud en curso."""
+    filtro, params = _filtro_pendientes(desde, hasta, origen)
+    conn = get_conn()
+    try:
+        return conn.execute(f"""
+            SELECT COUNT(*) FROM ventas v
+            WHERE {filtro}
+              AND NOT EXISTS (SELECT 1 FROM facturacion_cola f
+                              WHERE f.venta_id = v.id
+                                AND f.estado IN ('pendiente', 'procesando', 'dudosa'))
+        """, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+# ── Encolar ──────────────────────────────────────────────────────────────────
+
+_SQL_ENCOLAR = """
+    INSERT INTO facturacion_cola (venta_id, proximo_intento, usuario_id, username, creado_en)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(venta_id) DO UPDATE SET
+        estado = 'pendiente', intentos = 0, ultimo_error = NULL,
+        proximo_intento = excluded.proximo_intento,
+        usuario_id = excluded.usuario_id, username = excluded.username,
+        creado_en  = excluded.creado_en, procesado_en = NULL
+    WHERE facturacion_cola.estado = 'rechazada'
+"""
+
+
+def encolar_factura(venta_id, usuario_id=None, username=None):
+    """Solicita la factura de una venta. Una venta tiene a lo sumo una solicitud
+    viva; si la anterior fue rechazada se vuelve a intentar."""
+    ahora = _ahora()
+    conn = get_conn()
+    try:
+        conn.execute(_SQL_ENCOLAR, (venta_id, ahora, usuario_id, username, ahora))
+        conn.commit()
+    finally:
+        conn.close()
+    notificar_facturacion()
+
+
+def encolar_pendientes(desde=None, hasta=None, origen=None, usuario_id=None, username=None):
+    """Encola todas las ventas activas sin facturar del filtro. Devuelve cuántas."""
+    ahora = _ahora()
+    filtro, params = _filtro_pendientes(desde, hasta, origen)
+    conn = get_conn()
+    try:
+        ids = [r[0] for r in conn.execute(
+            f"SELECT v.id FROM ventas v WHERE {filtro} ORDER BY v.fecha, v.id", params
+        ).fetchall()]
+        antes = conn.total_changes
+        conn.executemany(_SQL_ENCOLAR, [(vid, ahora, usuario_id, username, ahora) for vid in ids])
+        encoladas = conn.total_changes - antes
+        conn.commit()
+    finally:
+        conn.close()
+    notificar_facturacion()
+    return encoladas
+
+
+def estado_factura(venta_id):
+    """Estado de la factura de la venta para la UI.
+
+    {'estado': 'sin_solicitar'|'pendiente'|'procesando'|'dudosa'|'autorizada'
+               |'rechazada'|'huerfana',
+     'error', 'intentos', 'proximo_intento', 'factura'}
+
+    'huerfana': la venta se canceló mientras se emitía y AFIP igual autorizó
+    la factura; el CAE queda en el error para anularlo con nota de crédito.
+    """
+    conn = get_conn()
+    try:
+        venta = conn.execute("""
+            SELECT factura_emitida, factura_tipo, factura_numero, factura_cae, factura_cae_vto
+            FROM ventas WHERE id = ?
+        """, (venta_id,)).fetchone()
+        cola = conn.execute(
+            "SELECT estado, ultimo_error, intentos, proximo_intento FROM facturacion_cola WHERE venta_id = ?",
+            (venta_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if venta is None:
+        return None
+    if venta['factura_emitida']:
+        return {
+            'estado': 'autorizada', 'error': None,
+            'intentos': cola['intentos'] if cola else 0, 'proximo_intento': None,
+            'factura': {k: venta[f'factura_{k}'] for k in ('tipo', 'numero', 'cae', 'cae_vto')},
+        }
+    if cola is None:
+        return {'estado': 'sin_solicitar', 'error': None, 'intentos': 0,
+                'proximo_intento': None, 'factura': None}
+    return {'estado': cola['estado'], 'error': cola['ultimo_error'], 'intentos': cola['intentos'],
+            'proximo_intento': cola['proximo_intento'], 'factura': None}
+
+
+# ── Procesar ─────────────────────────────────────────────────────────────────
+
+def _tomar_lote(limite):
+    """Marca como 'procesando' hasta `limite` solicitudes listas.
+
+    Devuelve (lote, filas); `lote` identifica a este worker en las filas
+    tomadas. Las vencidas con número guardado pasan a 'dudosa': puede que
+    AFIP las haya autorizado.
+    """
+    conn = get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        ahora = _ahora()
+        lote  = uuid.uuid4().hex
+        vencido = (datetime.now() - timedelta(minutes=PROCESANDO_VENCIDO_MIN)).strftime('%Y-%m-%d %H:%M:%S')
+        conn.execute("""
+            UPDATE facturacion_cola
+            SET estado = CASE WHEN cbte_numero IS NULL THEN 'pendiente' ELSE 'dudosa' END,
+                lote = NULL
+            WHERE estado = 'procesando' AND procesado_en < ?
+        """, (vencido,))
+        filas = conn.execute("""
+            SELECT id, venta_id, intentos, usuario_id, username,
+                   cbte_tipo, punto_venta, cbte_numero
+            FROM facturacion_cola
+            WHERE estado IN ('pendiente', 'dudosa') AND proximo_intento <= ?
+            ORDER BY id LIMIT ?
+        """, (ahora, limite)).fetchall()
+        conn.executemany(
+            "UPDATE facturacion_cola SET estado = 'procesando', lote = ?, procesado_en = ? WHERE id = ?",
+            [(lote, ahora, f['id']) for f in filas]
+        )
+        conn.commit()
+        return lote, filas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _cargar_ventas(ids):
+    """(ventas, clientes por id, productos por venta_id) de las ventas dadas."""
+    conn = get_conn()
+    try:
+        marcas = ','.join('?' * len(ids))
+        ventas = conn.execute(
+            f"SELECT * FROM ventas WHERE id IN ({marcas}) ORDER BY fecha, id", ids
+        ).fetchall()
+        clientes = {c['id']: c for c in conn.execute(
+            f"SELECT * FROM clientes WHERE id IN (SELECT cliente_id FROM ventas WHERE id IN ({marcas}))",
+            ids
+        ).fetchall()}
+        productos = {}
+        for p in conn.execute(f"""
+            SELECT dv.venta_id, p.descripcion, dv.cantidad, dv.precio_unitario
+            FROM detalle_venta dv JOIN productos p ON dv.producto_id = p.id
+            WHERE dv.venta_id IN ({marcas})
+        """, ids).fetchall():
+            # (descripcion, cantidad, precio_unitario): el PDF lee por posición
+            productos.setdefault(p['venta_id'], []).append(
+                (p['descripcion'], p['cantidad'], p['precio_unitario'])
+            )
+        return ventas, clientes, productos
+    finally:
+        conn.close()
+
+
+def _registrar_numeros(lote, cbte_tipo, punto_venta, numeros):
+    """Guarda en las filas del lote los números con que se va a pedir el CAE
+    y renueva procesado_en de todo el lote (no se da por vencido mientras
+    sigue enviando). Lanza RuntimeError si alguna fila ya no es de este lote:
+    en ese caso no se envía.
+    """
+    conn = get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.executemany("""
+            UPDATE facturacion_cola SET cbte_tipo = ?, punto_venta = ?, cbte_numero = ?
+            WHERE venta_id = ? AND lote = ? AND estado = 'procesando'
+        """, [(cbte_tipo, punto_venta, numero, venta_id, lote) for venta_id, numero in numeros])
+        if cur.rowcount != len(numeros):
+            raise RuntimeError("Solicitudes de facturación tomadas por otro worker")
+        conn.execute(
+            "UPDATE facturacion_cola SET procesado_en = ? WHERE lote = ? AND estado = 'procesando'",
+            (_ahora(), lote)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _conciliar_dudosas(filas, ventas, clientes):
+    """Consulta a AFIP los números de las filas dudosas.
+
+    Devuelve {venta_id: dict de la factura ya autorizada | EmisionDudosa};
+    las que AFIP no tiene no aparecen y se emiten de nuevo.
+    """
+    from services.afip_service import EmisionDudosa, recuperar_factura
+
+    por_id = {v['id']: v for v in ventas}
+    resultados = {}
+    for f in filas:
+        venta = por_id.get(f['venta_id'])
+        if f['cbte_numero'] is None or venta is None:
+            continue
+        try:
+            factura = recuperar_factura(venta, clientes[venta['cliente_id']],
+                                        f['cbte_tipo'], f['cbte_numero'], f['punto_venta'])
+        except Exception as e:
+            logger.warning("No se pudo verificar el N° %s (tipo %s) de la venta #%s: %s",
+                           f['cbte_numero'], f['cbte_tipo'], f['venta_id'], e)
+            resultados[f['venta_id']] = EmisionDudosa(
+                f"No se pudo verificar en ARCA el N° {f['cbte_numero']}: {e}")
+            continue
+        if factura is not None:
+            logger.info("Venta #%s: se adopta el CAE %s ya autorizado para el N° %s",
+                        f['venta_id'], factura['cae'], f['cbte_numero'])
+            resultados[f['venta_id']] = factura
+    return resultados
+
+
+def _guardar_factura(conn, f, res, pdf, lote, ahora):
+    """Registra en la venta la factura autorizada. Si la venta se canceló (o se
+    facturó por otro camino) mientras se emitía, la fila queda 'huerfana' con
+    el CAE para anularlo con nota de crédito."""
+    cur = conn.execute("""
+        UPDATE ventas
+        SET factura_emitida=1, factura_tipo=?, factura_numero=?,
+            factura_cae=?, factura_cae_vto=?, factura_fecha=?, factura_pdf_path=?
+        WHERE id=? AND factura_emitida = 0 AND (estado IS NULL OR estado != 'cancelada')
+    """, (res['tipo'], res['numero'], res['cae'], res['cae_vto'], res['fecha'],
+          pdf, f['venta_id']))
+    estado, error = 'autorizada', None
+    if cur.rowcount == 0:
+        venta = conn.execute("SELECT factura_cae FROM ventas WHERE id = ?",
+                             (f['venta_id'],)).fetchone()
+        if venta is None or venta['factura_cae'] != res['cae']:
+            error = (f"Factura {res['tipo']} N° {res['punto_venta']:05d}-{res['numero']:08d} "
+                     f"CAE {res['cae']} autorizada en ARCA para una venta cancelada o ya "
+                     f"facturada: corresponde nota de crédito.")
+            logger.error("Venta #%s: %s", f['venta_id'], error)
+            estado = 'huerfana'
+    conn.execute("""
+        UPDATE facturacion_cola
+        SET estado = ?, ultimo_error = ?, procesado_en = ?, lote = NULL,
+            cbte_tipo = ?, punto_venta = ?, cbte_numero = ?, cae = ?
+        WHERE id = ? AND lote = ?
+    """, (estado, error, ahora, res['cbte_tipo'], res['punto_venta'], res['numero'], res['cae'],
+          f['id'], lote))
+
+
+def _guardar_resultados(lote, filas, resultados, pdfs):
+    """Persiste facturas y estados de la cola en una sola transacción.
+
+    Solo se tocan las filas que siguen siendo de este lote; los CAE obtenidos
+    se registran en la venta igual.
+    """
+    from services.afip_service import RechazoAFIP
+
+    ahora = _ahora()
+    conn = get_conn()
+    try:
+        for f in filas:
+            res = resultados.get(f['venta_id'])
+            if isinstance(res, dict):
+                _guardar_factura(conn, f, res, pdfs.get(f['venta_id']), lote, ahora)
+                continue
+
+            intentos = f['intentos'] + 1
+            error    = str(res or 'Sin resultado de AFIP')[:500]
+            if isinstance(res, (ValueError, RechazoAFIP)) or res is None:
+                # Respuesta definitiva: los números reservados no se usaron
+                conn.execute("""
+                    UPDATE facturacion_cola SET cbte_tipo = NULL, punto_venta = NULL, cbte_numero = NULL
+                    WHERE id = ? AND lote = ?
+                """, (f['id'], lote))
+                estado, proximo = 'rechazada', ahora
+            elif intentos >= MAX_INTENTOS:
+                logger.error("Facturación venta #%s abandonada tras %s intentos: %s",
+                             f['venta_id'], intentos, error)
+                estado, proximo = 'rechazada', ahora
+            else:
+                # Con números guardados AFIP pudo haberla autorizado: 'dudosa'
+                estado  = None
+                proximo = (datetime.now() + timedelta(seconds=_backoff(intentos))).strftime('%Y-%m-%d %H:%M:%S')
+            conn.execute("""
+                UPDATE facturacion_cola
+                SET estado = COALESCE(?, CASE WHEN cbte_numero IS NULL THEN 'pendiente' ELSE 'dudosa' END),
+                    intentos = ?, ultimo_error = ?, proximo_intento = ?,
+                    procesado_en = ?, lote = NULL
+                WHERE id = ? AND lote = ?
+            """, (estado, intentos, error, proximo, ahora, f['id'], lote))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        # Los CAE ya existen en AFIP: dejarlos en el log para cargarlos a mano
+        logger.error("CAE obtenidos sin guardar: %s", [
+            (vid, r['tipo'], r['numero'], r['cae'])
+            for vid, r in resultados.items() if isinstance(r, dict)
+        ])
+        raise
+    finally:
+        conn.close()
+
+
+def _auditar(filas, resultados):
+    from services.usuarios_service import registrar_auditoria
+    for f in filas:
+        res = resultados.get(f['venta_id'])
+        if isinstance(res, dict):
+            registrar_auditoria(
+                f['usuario_id'], f['username'] or 'sistema',
+                'emitir_factura', 'ventas',
+                detalle=(f"Factura {res['tipo']} N° {res['numero']:08d} "
+                         f"emitida para Venta #{f['venta_id']}. CAE: {res['cae']}"),
+            )
+
+
+def procesar_cola_facturacion(limite=LOTE):
+    """Emite un lote de solicitudes pendientes. Devuelve cuántas se tomaron."""
+    from services.afip_service import emitir_facturas_lote, generar_pdf_factura
+
+    lote, filas = _tomar_lote(limite)
+    if not filas:
+        return 0
+
+    ventas, clientes, productos = _cargar_ventas([f['venta_id'] for f in filas])
+    # Las dudosas primero: si AFIP ya las autorizó no se piden de nuevo
+    resultados = _conciliar_dudosas(filas, ventas, clientes)
+    # Canceladas o facturadas por otro camino mientras esperaban: no se emiten
+    a_emitir = [v for v in ventas if v['id'] not in resultados
+                and not v['factura_emitida'] and v['estado'] != 'cancelada']
+    ids_a_emitir = {v['id'] for v in a_emitir}
+    resultados.update({
+        v['id']: ValueError("La venta fue cancelada o ya tiene factura.")
+        for v in ventas if v['id'] not in ids_a_emitir and v['id'] not in resultados
+    })
+    if a_emitir:
+        try:
+            resultados.update(emitir_facturas_lote(
+                [(v, clientes[v['cliente_id']]) for v in a_emitir],
+                al_numerar=partial(_registrar_numeros, lote),
+            ))
+        except Exception as e:
+            logger.exception("Error emitiendo lote de %d facturas", len(a_emitir))
+            resultados.update({v['id']: e for v in a_emitir})
+
+    pdfs = {}
+    for v in ventas:
+        res = resultados.get(v['id'])
+        if not isinstance(res, dict) or v['estado'] == 'cancelada':
+            continue
+        try:
+            pdfs[v['id']] = generar_pdf_factura(v['id'], v, clientes[v['cliente_id']],
+                                                productos.get(v['id'], []), res)
+        except Exception:
+            logger.exception("Error generando PDF factura venta #%s", v['id'])
+
+    _guardar_resultados(lote, filas, resultados, pdfs)
+    _auditar(filas, resultados)
+    logger.info("Cola de facturación: %d solicitudes procesadas", len(filas))
+    return len(filas)
+
+
+# ── Worker en segundo plano ──────────────────────────────────────────────────
+
+_despertar = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def notificar_facturacion():
+    """Despierta al worker (llamar después de encolar)."""
+    _despertar.set()
+
+
+def _loop_worker():
+    while True:
+        _despertar.wait(INTERVALO_SEG)
+        _despertar.clear()
+        try:
+            while procesar_cola_facturacion() == LOTE:
+                pass
+        except Exception:
+            logger.exception("Cola de facturación: error en el worker")
+
+
+def iniciar_worker_facturacion():
+    """Arranca (una vez por proceso) el hilo que emite las facturas encoladas."""
+    global _worker
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive():
+            return _worker
+        _worker = threading.Thread(target=_loop_worker, name='facturacion', daemon=True)
+        _worker.start()
+        return _worker
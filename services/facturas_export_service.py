@@ -0,0 +1,213 @@
+# services/facturas_export_service.py
+"""ZIP con los PDF de facturas y notas de crédito de un rango de fechas.
+
+El archivo se arma mientras se descarga: cada PDF se copia al ZIP en bloques
+y el ZIP se entrega a medida que crece, así la memoria no depende del tamaño
+del archivo. Los PDF que faltan en static/facturas/ se regeneran desde los
+datos guardados de la venta en el pool de procesos (services/pdf_pool), en
+paralelo con la copia de los que ya existen.
+
+La descarga no escribe nada: para dejar guardados los PDF que faltan está
+regenerar_faltantes(), que se llama desde un POST.
+"""
+import collections
+import io
+import logging
+import os
+import zipfile
+
+from db import get_conn
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BLOQUE = 64 * 1024
+
+
+class _Salida(io.RawIOBase):
+    """Destino del ZIP: junta lo escrito hasta que el generador lo entrega.
+    No es seekable, así zipfile escribe cada entrada de corrido."""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._partes.append(bytes(b))
+        return len(b)
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def comprobantes_en_rango(desde, hasta):
+    """Facturas y notas de crédito emitidas entre desde y hasta (YYYY-MM-DD,
+    inclusive), cada una por su propia fecha de emisión. Lista de dicts
+    {venta_id, nota_credito, tipo, numero, pdf_path}."""
+    conn = get_conn()
+    try:
+        filas = conn.execute("""
+            SELECT id, factura_tipo, factura_numero, factura_pdf_path,
+                   factura_fecha >= :desde AND factura_fecha < date(:hasta, '+1 day') AS con_factura,
+                   nota_credito_tipo, nota_credito_numero, nota_credito_pdf_path,
+                   nota_credito_emitida = 1
+                   AND nota_credito_fecha >= :desde
+                   AND nota_credito_fecha < date(:hasta, '+1 day') AS con_nota_credito
+            FROM ventas
+            WHERE (factura_emitida = 1
+                   AND factura_fecha >= :desde AND factura_fecha < date(:hasta, '+1 day'))
+               OR (nota_credito_emitida = 1
+                   AND nota_credito_fecha >= :desde AND nota_credito_fecha < date(:hasta, '+1 day'))
+            ORDER BY id
+        """, {'desde': desde, 'hasta': hasta}).fetchall()
+    finally:
+        conn.close()
+
+    comprobantes = []
+    for f in filas:
+        if f['con_factura'] and f['factura_numero']:
+            comprobantes.append({'venta_id': f['id'], 'nota_credito': False,
+                                 'tipo': f['factura_tipo'], 'numero': f['factura_numero'],
+                                 'pdf_path': f['factura_pdf_path']})
+        if f['con_nota_credito'] and f['nota_credito_numero']:
+            comprobantes.append({'venta_id': f['id'], 'nota_credito': True,
+                                 'tipo': f['nota_credito_tipo'], 'numero': f['nota_credito_numero'],
+                                 'pdf_path': f['nota_credito_pdf_path']})
+    return comprobantes
+
+
+def nombre_archivo(comp):
+    """Mismo nombre que usan las descargas individuales."""
+    prefijo = 'nota_credito' if comp['nota_credito'] else 'factura'
+    return f"{prefijo}_{comp['tipo'] or 'X'}_{comp['numero']:08d}_venta{comp['venta_id']}.pdf"
+
+
+def _ruta_absoluta(comp):
+    return os.path.join(BASE_DIR, comp['pdf_path']) if comp['pdf_path'] else None
+
+
+def _datos_regenerar(comp):
+    from services.afip_service import datos_pdf_comprobante
+
+    conn = get_conn()
+    try:
+        venta = conn.execute("SELECT * FROM ventas WHERE id = ?", (comp['venta_id'],)).fetchone()
+        cliente = venta and conn.execute(
+            "SELECT * FROM clientes WHERE id = ?", (venta['cliente_id'],)
+        ).fetchone()
+        if not cliente:
+            raise ValueError("venta o cliente inexistente")
+        productos = conn.execute("""
+            SELECT p.descripcion, dv.cantidad, dv.precio_unitario
+            FROM detalle_venta dv JOIN productos p ON dv.producto_id = p.id
+            WHERE dv.venta_id = ?
+        """, (comp['venta_id'],)).fetchall()
+    finally:
+        conn.close()
+    return datos_pdf_comprobante(venta, cliente, productos, comp['nota_credito'])
+
+
+def _guardar_regenerado(comp, contenido):
+    """Deja el PDF regenerado en static/facturas/ para las próximas descargas."""
+    from services.afip_service import guardar_pdf_comprobante
+
+    rel_path = guardar_pdf_comprobante(comp['venta_id'], contenido, comp['nota_credito'])
+    columna = 'nota_credito_pdf_path' if comp['nota_credito'] else 'factura_pdf_path'
+    conn = get_conn()
+    try:
+        conn.execute(f"UPDATE ventas SET {columna} = ? WHERE id = ?", (rel_path, comp['venta_id']))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _separar(comprobantes):
+    """(presentes, faltantes) según el PDF esté o no en static/facturas/."""
+    presentes, faltantes = [], []
+    for comp in comprobantes:
+        ruta = _ruta_absoluta(comp)
+        (presentes if ruta and os.path.isfile(ruta) else faltantes).append(comp)
+    return presentes, faltantes
+
+
+def _regenerar(faltantes, errores):
+    """Arranca a regenerar los faltantes en el pool y devuelve un iterador de
+    (comprobante, bytes) en orden. Los que fallan se anotan en `errores`."""
+    from services.afip_service import render_pdf_comprobante
+    from services.pdf_pool import renderizar_en_orden
+
+    en_orden = collections.deque()  # comprobantes enviados a regenerar, en orden
+
+    def _a_regenerar():
+        for comp in faltantes:
+            try:
+                datos = _datos_regenerar(comp)
+            except Exception as e:
+                errores.append(f"{nombre_archivo(comp)}: {e}")
+                continue
+            en_orden.append(comp)
+            yield datos
+
+    regenerados = renderizar_en_orden(render_pdf_comprobante, _a_regenerar())
+
+    def _resultados():
+        for contenido in regenerados:
+            comp = en_orden.popleft()
+            if isinstance(contenido, Exception):
+                logger.error("No se pudo regenerar %s: %s", nombre_archivo(comp), contenido)
+                errores.append(f"{nombre_archivo(comp)}: {contenido}")
+                continue
+            yield comp, contenido
+
+    return _resultados()
+
+
+def regenerar_faltantes(desde, hasta):
+    """Regenera y guarda los PDF que faltan en static/facturas/ de los
+    comprobantes entre desde y hasta. Devuelve (guardados, errores)."""
+    _, faltantes = _separar(comprobantes_en_rango(desde, hasta))
+    errores = []
+    guardados = 0
+    for comp, contenido in _regenerar(faltantes, errores):
+        try:
+            _guardar_regenerado(comp, contenido)
+        except Exception as e:
+            logger.exception("No se pudo guardar %s", nombre_archivo(comp))
+            errores.append(f"{nombre_archivo(comp)}: {e}")
+            continue
+        guardados += 1
+    return guardados, errores
+
+
+def exportar_zip(desde, hasta):
+    """Generador con los bytes del ZIP de comprobantes entre desde y hasta.
+    Si algún PDF no se pudo regenerar, el ZIP incluye ERRORES.txt."""
+    presentes, faltantes = _separar(comprobantes_en_rango(desde, hasta))
+    if faltantes:
+        logger.info("ZIP de comprobantes: %d PDF a regenerar", len(faltantes))
+
+    salida = _Salida()
+    errores = []
+
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as zf:
+        # Arranca a regenerar antes de copiar los que ya están
+        regenerados = _regenerar(faltantes, errores)
+
+        for comp in presentes:
+            with open(_ruta_absoluta(comp), 'rb') as origen, \
+                    zf.open(nombre_archivo(comp), 'w') as destino:
+                while bloque := origen.read(BLOQUE):
+                    destino.write(bloque)
+                    yield salida.vaciar()
+
+        for comp, contenido in regenerados:
+            zf.writestr(nombre_archivo(comp), contenido)
+            yield salida.vaciar()
+
+        if errores:
+            zf.writestr('ERRORES.txt', "PDF que no se pudieron regenerar:\n" + "\n".join(errores) + "\n")
+    yield salida.vaciar()
@@ -5,6 +5,8 @@ import os
 from datetime import date, datetime, timedelta
 
 from models import get_conn
+from services.agregados_service import refrescar_gastos_en_conn
+from services.periodos import entre, rango_dias, rango_mes
 
 logger = logging.getLogger(__name__)
 
@@ -193,6 +195,7 @@ def crear_gasto(categoria_id, descripcion, monto, fecha, metodo_pago=None,
             f"Gasto: {descripcion.strip()}",
             monto, metodo_pago, usuario_id, fecha
         )
+        refrescar_gastos_en_conn(conn, fecha)
         conn.commit()
         return True, new_id
     except Exception as e:
@@ -241,6 +244,7 @@ def actualizar_gasto(gasto_id, categoria_id, descripcion, monto, fecha,
               arch_nombre, arch_ruta,
               observaciones.strip() if observaciones else None,
               gasto_id))
+        refrescar_gastos_en_conn(conn, actual['fecha'], fecha)
         conn.commit()
         return True, None
     except Exception as e:
@@ -254,10 +258,11 @@ def actualizar_gasto(gasto_id, categoria_id, descripcion, monto, fecha,
 def eliminar_gasto(gasto_id):
     conn = get_conn()
     try:
-        g = conn.execute("SELECT archivo_ruta FROM gastos WHERE id=?", (gasto_id,)).fetchone()
+        g = conn.execute("SELECT fecha, archivo_ruta FROM gastos WHERE id=?", (gasto_id,)).fetchone()
         if not g:
             return False, "Gasto no encontrado"
         conn.execute("DELETE FROM gastos WHERE id=?", (gasto_id,))
+        refrescar_gastos_en_conn(conn, g['fecha'])
         conn.commit()
         # Eliminar archivo físico si existe
         if g['archivo_ruta'] and os.path.isfile(g['archivo_ruta']):
@@ -288,7 +293,7 @@ def generar_recurrentes():
               AND fecha_prox_recurrencia <= ?
         """, (hoy,)).fetchall()
 
-        generados = 0
+        generados = []
         for g in pendientes:
             # Generar todas las instancias atrasadas (por si pasaron varios períodos)
             prox = g['fecha_prox_recurrencia']
@@ -301,8 +306,8 @@ def generar_recurrentes():
                 """, (g['categoria_id'], g['descripcion'], g['monto'],
                       prox, g['metodo_pago'], g['id'],
                       g['observaciones'], None))
+                generados.append(prox)
                 prox = _siguiente_fecha(prox, g['frecuencia'])
-                generados += 1
 
             # Actualizar fecha próxima en el template
             conn.execute(
@@ -310,8 +315,9 @@ def generar_recurrentes():
                 (prox, g['id'])
             )
         if generados:
+            refrescar_gastos_en_conn(conn, *generados)
             conn.commit()
-        return generados
+        return len(generados)
     except Exception as e:
         conn.rollback()
         logger.error("generar_recurrentes error: %s", e)
@@ -324,26 +330,23 @@ def generar_recurrentes():
 
 def get_totales_por_categoria(fecha_desde, fecha_hasta):
     conn = get_conn()
-    filas = conn.execute("""
+    filas = conn.execute(f"""
         SELECT cg.nombre AS categoria, SUM(g.monto) AS total
         FROM gastos g
         JOIN categorias_gasto cg ON g.categoria_id = cg.id
-        WHERE g.fecha BETWEEN ? AND ?
+        WHERE {entre('g.fecha')}
         GROUP BY cg.nombre
         ORDER BY total DESC
-    """, (fecha_desde, fecha_hasta)).fetchall()
+    """, rango_dias(fecha_desde, fecha_hasta)).fetchall()
     conn.close()
     return filas
 
 
 def get_total_mes(year, month):
-    fecha_desde = f"{year}-{month:02d}-01"
-    last_day    = calendar.monthrange(year, month)[1]
-    fecha_hasta = f"{year}-{month:02d}-{last_day}"
     conn = get_conn()
     total = conn.execute(
-        "SELECT COALESCE(SUM(monto), 0) FROM gastos WHERE fecha BETWEEN ? AND ?",
-        (fecha_desde, fecha_hasta)
+        f"SELECT COALESCE(SUM(monto), 0) FROM gastos WHERE {entre('fecha')}",
+        rango_mes(year, month)
     ).fetchone()[0]
     conn.close()
     return total
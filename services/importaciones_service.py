@@ -1,10 +1,11 @@
 # services/importaciones_service.py
-import io
 import logging
 from datetime import datetime, date
 
 from models import get_conn
+from services.tn_outbox_service import encolar_sync_tn_en_conn, notificar_outbox_tn
 from services.caja_service import registrar_movimiento_en_conn
+from services.periodos import entre, rango_clave
 
 logger = logging.getLogger(__name__)
 
@@ -626,6 +627,7 @@ def cerrar_importacion(imp_id, usuario_id=None):
                     "UPDATE productos SET costo=?, stock=stock+? WHERE id=?",
                     (costo_unitario, cant_inventario, it['producto_id'])
                 )
+                encolar_sync_tn_en_conn(conn, it['producto_id'])
             else:
                 sku = f"IMP-{imp_id}-{it['id']}"
                 existing = conn.execute(
@@ -651,6 +653,7 @@ def cerrar_importacion(imp_id, usuario_id=None):
             (datetime.now().strftime('%Y-%m-%d'), imp_id)
         )
         conn.commit()
+        notificar_outbox_tn()
         return True, None
     except Exception as e:
         conn.rollback()
@@ -775,8 +778,8 @@ def get_dashboard_data():
     conn = get_conn()
 
     total_mes = conn.execute(
-        "SELECT COALESCE(SUM(monto_ars), 0) FROM importacion_pagos WHERE fecha_pago LIKE ?",
-        (f"{mes_actual}%",)
+        f"SELECT COALESCE(SUM(monto_ars), 0) FROM importacion_pagos WHERE {entre('fecha_pago')}",
+        rango_clave(mes_actual)
     ).fetchone()[0]
 
     total_historico = conn.execute(
@@ -832,107 +835,66 @@ def get_dashboard_data():
 
 # ── PDF de la orden ───────────────────────────────────────────────────────────
 
-def generar_pdf_importacion(imp_id):
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import cm
-    from reportlab.lib.enums import TA_RIGHT, TA_CENTER, TA_LEFT
-    from reportlab.platypus import (
-        SimpleDocTemplate, Table, TableStyle,
-        Paragraph, Spacer, HRFlowable
-    )
-
+def datos_pdf_importacion(imp_id):
+    """Filas de las que sale el PDF de la importación, como dicts (ver
+    datos_pdf_compra), o None."""
     imp = get_importacion(imp_id)
     if not imp:
         return None
+    return {
+        'imp':    dict(imp),
+        'items':  [dict(r) for r in get_importacion_items(imp_id)],
+        'gastos': [dict(r) for r in get_importacion_gastos(imp_id)],
+        'pagos':  [dict(r) for r in get_importacion_pagos(imp_id)],
+    }
 
-    items    = get_importacion_items(imp_id)
-    gastos   = get_importacion_gastos(imp_id)
-    pagos    = get_importacion_pagos(imp_id)
-    costos   = calcular_costos(imp_id)
-
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4,
-                            title=f"Importación {imp['numero']}",
-                            rightMargin=1.8*cm, leftMargin=1.8*cm,
-                            topMargin=2*cm, bottomMargin=2*cm)
-
-    styles   = getSampleStyleSheet()
-    story    = []
-
-    PRIMARY  = colors.HexColor('#4361ee')
-    LIGHT    = colors.HexColor('#f1f3f9')
-    BORDER   = colors.HexColor('#dee2e6')
-    ALT_ROW  = colors.HexColor('#f8f9fa')
-    RED      = colors.HexColor('#dc2626')
-    GREEN    = colors.HexColor('#16a34a')
-
-    right_s  = ParagraphStyle('right',  parent=styles['Normal'], alignment=TA_RIGHT)
-    center_s = ParagraphStyle('center', parent=styles['Normal'], alignment=TA_CENTER)
-    small_g  = ParagraphStyle('small',  parent=styles['Normal'],
-                               fontSize=8, textColor=colors.HexColor('#6c757d'))
-
-    # ── Cabecera ──────────────────────────────────────────────────────────────
-    hdr = Table([[
-        Paragraph("<b><font size='16' color='#4361ee'>COMENDA DECO</font></b>",
-                  styles['Normal']),
-        Paragraph(
-            f"<b><font size='13'>ORDEN DE IMPORTACIÓN</font></b><br/>"
-            f"<font size='11'>N° {imp['numero']}</font>",
-            right_s
-        ),
-    ]], colWidths=[10*cm, 7.4*cm])
-    hdr.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    story += [hdr, HRFlowable(width="100%", thickness=2, color=PRIMARY), Spacer(1, .3*cm)]
+
+def render_pdf_importacion(datos):
+    """Bytes del PDF de la importación a partir de datos_pdf_importacion."""
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Table, Paragraph, Spacer
+    from services import pdf_layout as pdf
+
+    imp, items = datos['imp'], datos['items']
+    gastos, pagos = datos['gastos'], datos['pagos']
+
+    buf, doc = pdf.documento(f"Importación {imp['numero']}", margen=1.8*cm)
+    st       = pdf.estilos()
+    right_s  = st['right']
+    story    = pdf.encabezado('ORDEN DE IMPORTACIÓN', imp['numero'], compacto=True)
 
     # ── Fechas / Estado ───────────────────────────────────────────────────────
     estado_lbl = dict(ESTADOS_IMPORTACION).get(imp['estado'], imp['estado']).upper()
     tipos_gasto_map = dict(TIPOS_GASTO_IMP)
 
     fecha_row = Table([[
-        Paragraph(f"<b>Fecha pedido:</b> {imp['fecha_pedido']}", styles['Normal']),
-        Paragraph(f"<b>Estado:</b> {estado_lbl}", styles['Normal']),
-        Paragraph(f"<b>Moneda:</b> {imp['moneda_origen']} × {imp['tipo_cambio']:.2f}", styles['Normal']),
+        Paragraph(f"<b>Fecha pedido:</b> {imp['fecha_pedido']}", st['normal']),
+        Paragraph(f"<b>Estado:</b> {estado_lbl}", st['normal']),
+        Paragraph(f"<b>Moneda:</b> {imp['moneda_origen']} × {imp['tipo_cambio']:.2f}", st['normal']),
     ]], colWidths=[6*cm, 5*cm, 6.4*cm])
-    fecha_row.setStyle(TableStyle([('BOTTOMPADDING', (0, 0), (-1, -1), 6)]))
+    fecha_row.setStyle(pdf.estilo_tabla('fila_compacta'))
     story += [fecha_row, Spacer(1, .2*cm)]
 
     # ── Proveedor ─────────────────────────────────────────────────────────────
-    story.append(Paragraph(
-        "<b>PROVEEDOR</b>",
-        ParagraphStyle('hdr_sec', parent=styles['Normal'],
-                       backColor=LIGHT, leftPadding=6, fontSize=10)
-    ))
+    story.append(pdf.seccion("PROVEEDOR"))
     story.append(Spacer(1, .15*cm))
     prov_txt = f"<b>{imp['proveedor_nombre']}</b>"
-    story += [Paragraph(prov_txt, styles['Normal']), Spacer(1, .3*cm)]
+    story += [Paragraph(prov_txt, st['normal']), Spacer(1, .3*cm)]
 
     # ── Seguimiento ───────────────────────────────────────────────────────────
     has_tracking = any([imp['naviera'], imp['numero_tracking'], imp['eta'], imp['contenedor']])
     if has_tracking:
-        story.append(Paragraph(
-            "<b>SEGUIMIENTO DE ENVÍO</b>",
-            ParagraphStyle('hdr_sec', parent=styles['Normal'],
-                           backColor=LIGHT, leftPadding=6, fontSize=10)
-        ))
+        story.append(pdf.seccion("SEGUIMIENTO DE ENVÍO"))
         story.append(Spacer(1, .15*cm))
         seg_data = []
         if imp['naviera']:        seg_data.append(f"Naviera: {imp['naviera']}")
         if imp['numero_tracking']: seg_data.append(f"Tracking: {imp['numero_tracking']}")
         if imp['contenedor']:     seg_data.append(f"Contenedor: {imp['contenedor']}")
         if imp['eta']:            seg_data.append(f"ETA: {imp['eta']}")
-        story += [Paragraph("  |  ".join(seg_data), styles['Normal']), Spacer(1, .3*cm)]
+        story += [Paragraph("  |  ".join(seg_data), st['normal']), Spacer(1, .3*cm)]
 
     # ── Tabla de ítems ────────────────────────────────────────────────────────
-    story.append(Paragraph(
-        "<b>PRODUCTOS DEL PEDIDO</b>",
-        ParagraphStyle('hdr_sec', parent=styles['Normal'],
-                       backColor=LIGHT, leftPadding=6, fontSize=10)
-    ))
+    story.append(pdf.seccion("PRODUCTOS DEL PEDIDO"))
     story.append(Spacer(1, .15*cm))
 
     moneda = imp['moneda_origen']
@@ -941,92 +903,64 @@ def generar_pdf_importacion(imp_id):
 
     if items:
         tbl_data = [[
-            Paragraph("<b>Descripción</b>", styles['Normal']),
-            Paragraph("<b>Cant.</b>", right_s),
+            pdf.parrafo_fijo("<b>Descripción</b>"),
+            pdf.parrafo_fijo("<b>Cant.</b>", 'right'),
             Paragraph(f"<b>P.Unit FOB ({moneda})</b>", right_s),
-            Paragraph(f"<b>Subtotal FOB</b>", right_s),
-            Paragraph("<b>Subtotal ARS</b>", right_s),
+            pdf.parrafo_fijo("<b>Subtotal FOB</b>", 'right'),
+            pdf.parrafo_fijo("<b>Subtotal ARS</b>", 'right'),
         ]]
         for it in items:
             sub_fob = float(it['cantidad']) * float(it['precio_unitario_fob'])
             sub_ars = sub_fob * tc
             total_fob += sub_fob
             tbl_data.append([
-                Paragraph(it['descripcion'], styles['Normal']),
+                Paragraph(it['descripcion'], st['normal']),
                 Paragraph(f"{it['cantidad']:.0f}", right_s),
                 Paragraph(f"{moneda} {it['precio_unitario_fob']:.2f}", right_s),
                 Paragraph(f"{moneda} {sub_fob:,.2f}", right_s),
                 Paragraph(f"$ {sub_ars:,.0f}".replace(',', '.'), right_s),
             ])
         tbl_data.append([
-            Paragraph("<b>TOTAL FOB</b>", right_s),
+            pdf.parrafo_fijo("<b>TOTAL FOB</b>", 'right'),
             '', '', '',
             Paragraph(f"<b>$ {total_fob * tc:,.0f}</b>".replace(',', '.'), right_s),
         ])
         t = Table(tbl_data, colWidths=[6.5*cm, 1.5*cm, 3*cm, 3*cm, 3.4*cm])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), PRIMARY),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, ALT_ROW]),
-            ('BACKGROUND', (0, -1), (-1, -1), LIGHT),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, BORDER),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('SPAN', (0, -1), (3, -1)),
-        ]))
+        t.setStyle(pdf.estilo_tabla('detalle_con_total'))
+        t.setStyle([('SPAN', (0, -1), (3, -1))])
         story += [t, Spacer(1, .4*cm)]
 
     # ── Gastos adicionales ────────────────────────────────────────────────────
     if gastos:
-        story.append(Paragraph(
-            "<b>GASTOS ADICIONALES</b>",
-            ParagraphStyle('hdr_sec', parent=styles['Normal'],
-                           backColor=LIGHT, leftPadding=6, fontSize=10)
-        ))
+        story.append(pdf.seccion("GASTOS ADICIONALES"))
         story.append(Spacer(1, .15*cm))
         total_gastos = 0.0
         g_data = [[
-            Paragraph("<b>Tipo</b>", styles['Normal']),
-            Paragraph("<b>Descripción</b>", styles['Normal']),
-            Paragraph("<b>Monto (ARS)</b>", right_s),
+            pdf.parrafo_fijo("<b>Tipo</b>"),
+            pdf.parrafo_fijo("<b>Descripción</b>"),
+            pdf.parrafo_fijo("<b>Monto (ARS)</b>", 'right'),
         ]]
         for g in gastos:
             total_gastos += float(g['monto'])
             g_data.append([
-                Paragraph(tipos_gasto_map.get(g['tipo'], g['tipo']), styles['Normal']),
-                Paragraph(g['descripcion'] or '—', styles['Normal']),
+                Paragraph(tipos_gasto_map.get(g['tipo'], g['tipo']), st['normal']),
+                Paragraph(g['descripcion'] or '—', st['normal']),
                 Paragraph(f"$ {float(g['monto']):,.0f}".replace(',', '.'), right_s),
             ])
         g_data.append([
-            Paragraph("<b>TOTAL GASTOS</b>", right_s),
+            pdf.parrafo_fijo("<b>TOTAL GASTOS</b>", 'right'),
             '',
             Paragraph(f"<b>$ {total_gastos:,.0f}</b>".replace(',', '.'), right_s),
         ])
         gt = Table(g_data, colWidths=[4*cm, 9*cm, 4.4*cm])
-        gt.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), PRIMARY),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, ALT_ROW]),
-            ('BACKGROUND', (0, -1), (-1, -1), LIGHT),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, BORDER),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('SPAN', (0, -1), (1, -1)),
-        ]))
+        gt.setStyle(pdf.estilo_tabla('detalle_con_total'))
+        gt.setStyle([('SPAN', (0, -1), (1, -1))])
         story += [gt, Spacer(1, .4*cm)]
     else:
         total_gastos = 0.0
 
     # ── Pagos al proveedor ────────────────────────────────────────────────────
-    story.append(Paragraph(
-        "<b>PAGOS AL PROVEEDOR</b>",
-        ParagraphStyle('hdr_sec', parent=styles['Normal'],
-                       backColor=LIGHT, leftPadding=6, fontSize=10)
-    ))
+    story.append(pdf.seccion("PAGOS AL PROVEEDOR"))
     story.append(Spacer(1, .15*cm))
 
     if pagos:
@@ -1034,61 +968,44 @@ def generar_pdf_importacion(imp_id):
         saldo = float(total_fob) - total_pagado
 
         p_data = [[
-            Paragraph("<b>Fecha</b>", styles['Normal']),
+            pdf.parrafo_fijo("<b>Fecha</b>"),
             Paragraph(f"<b>Monto ({moneda})</b>", right_s),
-            Paragraph("<b>TC</b>", right_s),
-            Paragraph("<b>Monto ARS</b>", right_s),
-            Paragraph("<b>Método</b>", styles['Normal']),
+            pdf.parrafo_fijo("<b>TC</b>", 'right'),
+            pdf.parrafo_fijo("<b>Monto ARS</b>", 'right'),
+            pdf.parrafo_fijo("<b>Método</b>"),
         ]]
         for pg in pagos:
             p_data.append([
-                Paragraph(pg['fecha_pago'], styles['Normal']),
+                Paragraph(pg['fecha_pago'], st['normal']),
                 Paragraph(f"{float(pg['monto']):,.2f}", right_s),
                 Paragraph(f"{float(pg['tipo_cambio']):,.2f}", right_s),
                 Paragraph(f"$ {float(pg['monto_ars']):,.0f}".replace(',', '.'), right_s),
-                Paragraph(pg['metodo_pago'] or '—', styles['Normal']),
+                Paragraph(pg['metodo_pago'] or '—', st['normal']),
             ])
         p_data.append([
-            Paragraph("<b>PAGADO</b>", right_s), '',
+            pdf.parrafo_fijo("<b>PAGADO</b>", 'right'), '',
             '',
             Paragraph(f"<b>$ {sum(float(pg['monto_ars']) for pg in pagos):,.0f}</b>".replace(',', '.'), right_s),
             '',
         ])
         pt = Table(p_data, colWidths=[3*cm, 3*cm, 2.5*cm, 4*cm, 4.9*cm])
-        pt.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), PRIMARY),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, ALT_ROW]),
-            ('BACKGROUND', (0, -1), (-1, -1), LIGHT),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, BORDER),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('SPAN', (0, -1), (2, -1)),
-        ]))
+        pt.setStyle(pdf.estilo_tabla('detalle_con_total'))
+        pt.setStyle([('SPAN', (0, -1), (2, -1))])
         story += [pt, Spacer(1, .2*cm)]
 
         if saldo > 0.01:
             story.append(Paragraph(
                 f"<font color='#dc2626'><b>Saldo pendiente: {moneda} {saldo:,.2f}</b></font>",
-                styles['Normal']
+                st['normal']
             ))
         else:
-            story.append(Paragraph(
-                "<font color='#16a34a'><b>Pagado en su totalidad</b></font>",
-                styles['Normal']
-            ))
+            story.append(pdf.parrafo_fijo("<font color='#16a34a'><b>Pagado en su totalidad</b></font>"))
         story.append(Spacer(1, .4*cm))
     else:
-        story += [Paragraph("Sin pagos registrados.", small_g), Spacer(1, .4*cm)]
+        story += [pdf.parrafo_fijo("Sin pagos registrados.", 'small'), Spacer(1, .4*cm)]
 
     # ── Resumen de costos ─────────────────────────────────────────────────────
-    story.append(Paragraph(
-        "<b>RESUMEN DE COSTOS</b>",
-        ParagraphStyle('hdr_sec', parent=styles['Normal'],
-                       backColor=LIGHT, leftPadding=6, fontSize=10)
-    ))
+    story.append(pdf.seccion("RESUMEN DE COSTOS"))
     story.append(Spacer(1, .15*cm))
 
     total_final = total_fob * tc + total_gastos
@@ -1096,49 +1013,36 @@ def generar_pdf_importacion(imp_id):
     costo_prom  = total_final / total_unids if total_unids > 0 else 0
 
     res_data = [
-        [Paragraph(f"Total FOB ({moneda})", styles['Normal']),
+        [Paragraph(f"Total FOB ({moneda})", st['normal']),
          Paragraph(f"{moneda} {total_fob:,.2f}", right_s)],
-        [Paragraph("Total FOB (ARS)", styles['Normal']),
+        [pdf.parrafo_fijo("Total FOB (ARS)"),
          Paragraph(f"$ {total_fob * tc:,.0f}".replace(',', '.'), right_s)],
-        [Paragraph("Gastos adicionales", styles['Normal']),
+        [pdf.parrafo_fijo("Gastos adicionales"),
          Paragraph(f"$ {total_gastos:,.0f}".replace(',', '.'), right_s)],
-        [Paragraph("<b>TOTAL FINAL (ARS)</b>", styles['Normal']),
+        [pdf.parrafo_fijo("<b>TOTAL FINAL (ARS)</b>"),
          Paragraph(f"<b>$ {total_final:,.0f}</b>".replace(',', '.'), right_s)],
-        [Paragraph("Costo promedio/unidad", styles['Normal']),
+        [pdf.parrafo_fijo("Costo promedio/unidad"),
          Paragraph(f"$ {costo_prom:,.0f}".replace(',', '.'), right_s)],
     ]
     rt = Table(res_data, colWidths=[10*cm, 7.4*cm])
-    rt.setStyle(TableStyle([
-        ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, ALT_ROW]),
-        ('BACKGROUND', (0, 3), (-1, 3), LIGHT),
-        ('FONTNAME', (0, 3), (-1, 3), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 0.5, BORDER),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-    ]))
+    rt.setStyle(pdf.estilo_tabla('importacion_resumen'))
     story += [rt, Spacer(1, .4*cm)]
 
     # ── Observaciones ─────────────────────────────────────────────────────────
     if imp['observaciones']:
-        story.append(Paragraph(
-            "<b>OBSERVACIONES</b>",
-            ParagraphStyle('hdr_sec', parent=styles['Normal'],
-                           backColor=LIGHT, leftPadding=6, fontSize=10)
-        ))
+        story.append(pdf.seccion("OBSERVACIONES"))
         story.append(Spacer(1, .15*cm))
-        story.append(Paragraph(imp['observaciones'], styles['Normal']))
+        story.append(Paragraph(imp['observaciones'], st['normal']))
         story.append(Spacer(1, .3*cm))
 
     # ── Pie ───────────────────────────────────────────────────────────────────
-    story.append(HRFlowable(width="100%", thickness=1, color=BORDER))
+    story.append(pdf.linea())
     story.append(Spacer(1, .15*cm))
     from datetime import datetime as _dt
     story.append(Paragraph(
         f"<font size='8' color='#6c757d'>Generado el {_dt.now().strftime('%d/%m/%Y %H:%M')}</font>",
-        center_s
+        st['center']
     ))
 
     doc.build(story)
-    buf.seek(0)
-    return buf
+    return buf.getvalue()
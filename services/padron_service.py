@@ -0,0 +1,175 @@
+# services/padron_service.py
+"""Consultas al Padrón A13 con caché local (padron_cache).
+
+Una consulta vigente se responde desde la base sin tocar AFIP. Vencido el
+TTL se devuelve igual el dato guardado y se actualiza en segundo plano, así
+una caída de AFIP no corta el alta de clientes que ya consultamos alguna vez.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from db import get_conn
+
+logger = logging.getLogger(__name__)
+
+# Tras un error de AFIP, un dato vencido no se vuelve a pedir antes de esto
+REINTENTO_MIN = 5
+
+_refrescando = set()        # CUITs con actualización en segundo plano en curso
+_locks_cuit = {}            # {cuit: threading.Lock} de las primeras consultas en curso
+_lock = threading.Lock()
+
+
+def _ahora():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _ttl():
+    from config.afip import AFIP_CONFIG
+    return timedelta(hours=AFIP_CONFIG['padron_ttl_horas'])
+
+
+def normalizar_cuit(cuit):
+    return str(cuit or '').replace('-', '').replace(' ', '').strip()
+
+
+def _leer(cuit):
+    conn = get_conn()
+    try:
+        return conn.execute(
+            "SELECT datos, actualizado_en, ultimo_error, ultimo_intento"
+            " FROM padron_cache WHERE cuit = ?", (cuit,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def _vigente(fila):
+    actualizado = datetime.strptime(fila['actualizado_en'], '%Y-%m-%d %H:%M:%S')
+    return datetime.now() - actualizado < _ttl()
+
+
+def _respuesta(fila, desactualizado=False):
+    return {**json.loads(fila['datos']), 'consultado_en': fila['actualizado_en'],
+            'desactualizado': desactualizado}
+
+
+def _actualizar(cuit):
+    """Consulta AFIP y guarda el resultado. Si falla registra el error
+    (conservando el último dato bueno) y relanza."""
+    from services.afip_service import consultar_cuit_padron
+
+    ahora = _ahora()
+    try:
+        datos = consultar_cuit_padron(cuit)
+    except Exception as e:
+        conn = get_conn()
+        try:
+            conn.execute(
+                "UPDATE padron_cache SET ultimo_error = ?, ultimo_intento = ? WHERE cuit = ?",
+                (str(e)[:500], ahora, cuit)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        raise
+    conn = get_conn()
+    try:
+        conn.execute("""
+            INSERT INTO padron_cache (cuit, datos, actualizado_en, ultimo_intento)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(cuit) DO UPDATE SET
+                datos = excluded.datos, actualizado_en = excluded.actualizado_en,
+                ultimo_error = NULL, ultimo_intento = excluded.ultimo_intento
+        """, (cuit, json.dumps(datos, ensure_ascii=False), ahora, ahora))
+        conn.commit()
+    finally:
+        conn.close()
+    return datos
+
+
+def _actualizar_en_segundo_plano(cuit):
+    with _lock:
+        if cuit in _refrescando:
+            return
+        _refrescando.add(cuit)
+
+    def _tarea():
+        try:
+            _actualizar(cuit)
+        except Exception as e:
+            logger.warning("Padrón: no se pudo actualizar CUIT %s: %s", cuit, e)
+        finally:
+            with _lock:
+                _refrescando.discard(cuit)
+
+    threading.Thread(target=_tarea, name=f'padron-{cuit}', daemon=True).start()
+
+
+def consultar_cuit(cuit):
+    """Datos del Padrón A13 para el CUIT (ver consultar_cuit_padron), más
+    'consultado_en' y 'desactualizado'. Lanza RuntimeError si no hay dato
+    guardado y AFIP no responde."""
+    cuit = normalizar_cuit(cuit)
+    fila = _leer(cuit)
+    if fila is not None:
+        if _vigente(fila):
+            return _respuesta(fila)
+        reintento = (datetime.now() - timedelta(minutes=REINTENTO_MIN)).strftime('%Y-%m-%d %H:%M:%S')
+        if not fila['ultimo_error'] or fila['ultimo_intento'] < reintento:
+            _actualizar_en_segundo_plano(cuit)
+        return _respuesta(fila, desactualizado=True)
+
+    # Primera consulta: una sola llamada a AFIP aunque lleguen varias juntas
+    with _lock:
+        lock = _locks_cuit.setdefault(cuit, threading.Lock())
+    try:
+        with lock:
+            fila = _leer(cuit)
+            if fila is None:
+                _actualizar(cuit)
+                fila = _leer(cuit)
+    finally:
+        # Ya guardada la fila, las siguientes consultas no llegan hasta acá;
+        # las que esperan este lock la leen al entrar
+        with _lock:
+            if _locks_cuit.get(cuit) is lock:
+                del _locks_cuit[cuit]
+    return _respuesta(fila)
+
+
+def refrescar_padron_clientes(todos=False, pausa_seg=0.2):
+    """Actualiza la caché para todos los CUIT de clientes (solo los vencidos o
+    nunca consultados, salvo `todos`). Devuelve {'actualizados', 'vigentes', 'errores'}."""
+    conn = get_conn()
+    try:
+        cuits = sorted({
+            c for c in (normalizar_cuit(r[0]) for r in conn.execute(
+                "SELECT cuit FROM clientes WHERE cuit IS NOT NULL AND cuit != ''"
+            ).fetchall())
+            if len(c) == 11 and c.isdigit()
+        })
+        limite = (datetime.now() - _ttl()).strftime('%Y-%m-%d %H:%M:%S')
+        vigentes = {r[0] for r in conn.execute(
+            "SELECT cuit FROM padron_cache WHERE actualizado_en >= ?", (limite,)
+        ).fetchall()}
+    finally:
+        conn.close()
+
+    resumen = {'actualizados': 0, 'vigentes': 0, 'errores': 0}
+    for cuit in cuits:
+        if not todos and cuit in vigentes:
+            resumen['vigentes'] += 1
+            continue
+        try:
+            _actualizar(cuit)
+            resumen['actualizados'] += 1
+        except Exception as e:
+            resumen['errores'] += 1
+            logger.warning("Padrón: CUIT %s sin actualizar: %s", cuit, e)
+        time.sleep(pausa_seg)  # no saturar el servicio de AFIP
+    logger.info("Padrón: %s", resumen)
+    return resumen
@@ -0,0 +1,234 @@
+# services/pdf_layout.py
+"""Piezas comunes de los PDF: facturas, presupuestos, remitos, compras e importaciones.
+
+Los estilos de párrafo y de tabla y los textos fijos (marca, títulos de
+sección, pie) se arman una vez por proceso y se reutilizan; cada PDF solo
+arma su contenido. Con CACHE_ACTIVO = False se reconstruyen en cada llamada
+(lo usa benchmark.py para comparar).
+"""
+import copy
+import functools
+import io
+import threading
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import HRFlowable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+CACHE_ACTIVO = True
+
+PRIMARY = colors.HexColor('#4361ee')
+LIGHT   = colors.HexColor('#f1f3f9')
+BORDER  = colors.HexColor('#dee2e6')
+ALT_ROW = colors.HexColor('#f8f9fa')
+GRAY    = colors.HexColor('#6c757d')
+
+PIE_SISTEMA = "Documento generado por Sistema de Gestión · Comenda Deco"
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _cacheado(fn):
+    """Memoriza fn(*args) en el proceso mientras CACHE_ACTIVO."""
+    @functools.wraps(fn)
+    def envoltura(*args):
+        if not CACHE_ACTIVO:
+            return fn(*args)
+        clave = (fn.__name__, args)
+        valor = _cache.get(clave)
+        if valor is None:
+            valor = fn(*args)
+            with _cache_lock:
+                valor = _cache.setdefault(clave, valor)
+        return valor
+    return envoltura
+
+
+def limpiar_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+# ── Estilos ──────────────────────────────────────────────────────────────────
+
+@_cacheado
+def estilos():
+    """ParagraphStyles compartidos. No modificarlos: se reutilizan entre PDFs."""
+    normal = getSampleStyleSheet()['Normal']
+    return {
+        'normal':       normal,
+        'right':        ParagraphStyle('right', parent=normal, alignment=TA_RIGHT),
+        'center':       ParagraphStyle('center', parent=normal, alignment=TA_CENTER),
+        'bold':         ParagraphStyle('bold', parent=normal, fontName='Helvetica-Bold'),
+        'small':        ParagraphStyle('small', parent=normal, fontSize=8, textColor=GRAY),
+        'small_center': ParagraphStyle('small_center', parent=normal, fontSize=8,
+                                       textColor=GRAY, alignment=TA_CENTER),
+        'nota':         ParagraphStyle('nota', parent=normal, fontSize=9, textColor=GRAY),
+        'seccion':      ParagraphStyle('seccion', parent=normal, backColor=LIGHT,
+                                       leftPadding=6, fontSize=10),
+    }
+
+
+_DETALLE_CON_TOTAL = [
+    ('BACKGROUND', (0, 0), (-1, 0), PRIMARY),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, ALT_ROW]),
+    ('BACKGROUND', (0, -1), (-1, -1), LIGHT),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 0.5, BORDER),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+]
+
+_TABLAS = {
+    'cabecera': [
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ],
+    'cabecera_compacta': [
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ],
+    'fila':          [('BOTTOMPADDING', (0, 0), (-1, -1), 8)],
+    'fila_compacta': [('BOTTOMPADDING', (0, 0), (-1, -1), 6)],
+    # Tabla con encabezado azul y fila de total (compras, importaciones);
+    # el SPAN de la fila de total se agrega por tabla
+    'detalle_con_total': _DETALLE_CON_TOTAL,
+    'presupuesto_items': [
+        ('BACKGROUND',    (0, 0), (-1, 0),  PRIMARY),
+        ('TEXTCOLOR',     (0, 0), (-1, 0),  colors.white),
+        ('FONTNAME',      (0, 0), (-1, 0),  'Helvetica-Bold'),
+        ('FONTSIZE',      (0, 0), (-1, -1), 9),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, ALT_ROW]),
+        ('GRID',          (0, 0), (-1, -2), 0.5, BORDER),
+        ('ALIGN',         (2, 0), (-1, -1), 'RIGHT'),
+        ('LINEABOVE',     (0, -1), (-1, -1), 1, PRIMARY),
+        ('TOPPADDING',    (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ],
+    'remito_items': [
+        ('BACKGROUND',    (0, 0), (-1, 0),  PRIMARY),
+        ('TEXTCOLOR',     (0, 0), (-1, 0),  colors.white),
+        ('FONTNAME',      (0, 0), (-1, 0),  'Helvetica-Bold'),
+        ('FONTSIZE',      (0, 0), (-1, -1), 9),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, ALT_ROW]),
+        ('GRID',          (0, 0), (-1, -1), 0.5, BORDER),
+        ('ALIGN',         (2, 0), (-1, -1), 'CENTER'),
+        ('TOPPADDING',    (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ],
+    'remito_firma': [('TOPPADDING', (0, 0), (-1, -1), 20)],
+    'importacion_resumen': [
+        ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, ALT_ROW]),
+        ('BACKGROUND', (0, 3), (-1, 3), LIGHT),
+        ('FONTNAME', (0, 3), (-1, 3), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 0.5, BORDER),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 5),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+    ],
+    # El recuadro de la letra (A/B) va aparte: su color depende del comprobante
+    'factura_cabecera': [
+        ('VALIGN',       (0, 0), (-1, -1), 'MIDDLE'),
+        ('LINEAFTER',    (0, 0), (0, 0),   1, BORDER),
+        ('LINEBEFORE',   (2, 0), (2, 0),   1, BORDER),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING',   (0, 0), (-1, -1), 8),
+        ('ALIGN',        (1, 0), (1, 0),   'CENTER'),
+    ],
+    'factura_receptor': [
+        ('BACKGROUND',    (0, 0), (-1, 0), LIGHT),
+        ('FONTNAME',      (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ('TOPPADDING',    (0, 0), (-1, -1), 5),
+        ('BOX',           (0, 0), (-1, -1), 0.5, BORDER),
+    ],
+    'factura_items': [
+        ('BACKGROUND',    (0, 0), (-1, 0), PRIMARY),
+        ('TEXTCOLOR',     (0, 0), (-1, 0), colors.white),
+        ('FONTNAME',      (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE',      (0, 0), (-1, -1), 9),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, LIGHT]),
+        ('GRID',          (0, 0), (-1, -1), 0.5, BORDER),
+        ('ALIGN',         (2, 0), (-1, -1), 'RIGHT'),
+        ('TOPPADDING',    (0, 0), (-1, -1), 5),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+    ],
+    'factura_totales': [
+        ('ALIGN',         (0, 0), (-1, -1), 'RIGHT'),
+        ('FONTSIZE',      (0, 0), (-1, -1), 9),
+        ('LINEABOVE',     (0, -1), (-1, -1), 1, PRIMARY),
+        ('TOPPADDING',    (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ],
+    'factura_cae': [
+        ('TOPPADDING',    (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ],
+}
+
+
+@_cacheado
+def estilo_tabla(nombre):
+    """TableStyle compartido por nombre (ver _TABLAS)."""
+    return TableStyle(_TABLAS[nombre])
+
+
+# ── Bloques ──────────────────────────────────────────────────────────────────
+
+@_cacheado
+def _parrafo_fijo(texto, estilo):
+    return Paragraph(texto, estilos()[estilo])
+
+
+def parrafo_fijo(texto, estilo='normal'):
+    """Paragraph de texto constante: el markup se parsea una sola vez y cada
+    PDF recibe una copia (el layout guarda estado en la instancia)."""
+    return copy.copy(_parrafo_fijo(texto, estilo))
+
+
+def documento(titulo, margen=2*cm, margen_sup=2*cm, margen_inf=2*cm):
+    """(buffer, SimpleDocTemplate A4) listos para doc.build(story)."""
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4, title=titulo,
+                            rightMargin=margen, leftMargin=margen,
+                            topMargin=margen_sup, bottomMargin=margen_inf)
+    return buf, doc
+
+
+def encabezado(titulo, numero, compacto=False):
+    """Marca a la izquierda, tipo y número de documento a la derecha, y la
+    línea azul. `compacto` es la variante de compras e importaciones."""
+    if compacto:
+        marca, tam_titulo, ancho_der, tabla, espacio = 16, 13, 7.4*cm, 'cabecera_compacta', .3*cm
+    else:
+        marca, tam_titulo, ancho_der, tabla, espacio = 18, 14, 7*cm, 'cabecera', .4*cm
+    hdr = Table([[
+        parrafo_fijo(f"<b><font size='{marca}' color='#4361ee'>COMENDA DECO</font></b>"),
+        Paragraph(
+            f"<b><font size='{tam_titulo}'>{titulo}</font></b><br/>"
+            f"<font size='11'>N° {numero}</font>",
+            estilos()['right']
+        ),
+    ]], colWidths=[10*cm, ancho_der])
+    hdr.setStyle(estilo_tabla(tabla))
+    return [hdr, HRFlowable(width="100%", thickness=2, color=PRIMARY), Spacer(1, espacio)]
+
+
+def seccion(texto):
+    """Título de sección con fondo gris claro."""
+    return parrafo_fijo(f"<b>{texto}</b>", 'seccion')
+
+
+def linea():
+    return HRFlowable(width="100%", thickness=1, color=BORDER)
+
+
+def pie():
+    """Línea y leyenda del sistema al final del documento."""
+    return [linea(), Spacer(1, .2*cm), parrafo_fijo(PIE_SISTEMA, 'small_center')]
@@ -0,0 +1,198 @@
+# services/pdf_pool.py
+"""Render de PDF en procesos aparte, con caché en disco por contenido.
+
+reportlab es CPU puro: en el hilo del request retiene el GIL y frena al resto
+de los usuarios. Acá el render va a un ProcessPoolExecutor y el resultado
+queda en PDF_CONFIG['cache_dir'] con el hash de los datos de los que sale (y
+del código que lo dibuja) como nombre: mientras las filas no cambien, la
+próxima descarga es el mismo archivo, sin volver a renderizar.
+"""
+import collections
+import hashlib
+import importlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config.pdf import PDF_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+_en_curso = {}              # {ruta: Future} para no renderizar dos veces el mismo PDF
+_en_curso_lock = threading.Lock()
+_versiones = {}             # {módulo: hash de su código fuente}
+
+
+def _pool_pdf():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: los hijos no heredan hilos ni conexiones abiertas del proceso web
+            _pool = ProcessPoolExecutor(max_workers=PDF_CONFIG['workers'],
+                                        mp_context=multiprocessing.get_context('spawn'))
+            threading.Thread(target=limpiar_cache, name='pdf-limpieza', daemon=True).start()
+        return _pool
+
+
+def _descartar_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _version(render):
+    """Hash del módulo que dibuja y de pdf_layout: un cambio en el diseño
+    invalida los PDF guardados sin tener que borrar la caché a mano."""
+    modulo = render.__module__
+    version = _versiones.get(modulo)
+    if version is None:
+        h = hashlib.sha256()
+        for nombre in (modulo, 'services.pdf_layout'):
+            with open(importlib.import_module(nombre).__file__, 'rb') as f:
+                h.update(f.read())
+        version = _versiones[modulo] = h.hexdigest()[:16]
+    return version
+
+
+def _ruta(tipo, render, datos):
+    contenido = json.dumps([_version(render), render.__name__, datos],
+                           sort_keys=True, default=str, ensure_ascii=False)
+    clave = hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+    return os.path.join(PDF_CONFIG['cache_dir'], f"{tipo}_{clave}.pdf")
+
+
+def _enviar(render, datos):
+    """(pool, Future) con el render en curso. Sin pool (workers = 0) o con el
+    pool roto se resuelve acá mismo."""
+    if PDF_CONFIG['workers'] > 0:
+        pool = _pool_pdf()
+        try:
+            return pool, pool.submit(render, datos)
+        except BrokenProcessPool:
+            logger.exception("Pool de PDF caído, se recrea")
+            _descartar_pool(pool)
+    futuro = Future()
+    try:
+        futuro.set_result(render(datos))
+    except Exception as e:
+        futuro.set_exception(e)
+    return None, futuro
+
+
+def _esperar(pool, futuro, render, datos):
+    try:
+        return futuro.result(timeout=PDF_CONFIG['timeout_seg'])
+    except BrokenProcessPool:
+        # Murió un proceso hijo (OOM, kill): se arma otro pool para los
+        # próximos y este PDF sale en el hilo actual
+        logger.exception("Pool de PDF caído, se recrea")
+        _descartar_pool(pool)
+        return render(datos)
+
+
+def _renderizar(render, datos):
+    return _esperar(*_enviar(render, datos), render, datos)
+
+
+def renderizar_en_orden(render, lista_datos, en_vuelo=None):
+    """Itera render(datos) para cada elemento de lista_datos, en el mismo
+    orden, con hasta `en_vuelo` renders a la vez en el pool. Entrega los bytes
+    o la excepción de ese render (un PDF fallido no corta los demás).
+
+    Los primeros renders arrancan al llamar, antes de iterar; a lo sumo
+    `en_vuelo` PDFs quedan en memoria.
+    """
+    en_vuelo = en_vuelo or max(PDF_CONFIG['workers'], 1) * 2
+    pendientes = iter(lista_datos)
+    cola = collections.deque()
+
+    def _llenar():
+        for datos in itertools.islice(pendientes, en_vuelo - len(cola)):
+            cola.append((datos, *_enviar(render, datos)))
+
+    def _resultados():
+        while cola:
+            datos, pool, futuro = cola.popleft()
+            _llenar()
+            try:
+                resultado = _esperar(pool, futuro, render, datos)
+            except Exception as e:
+                resultado = e
+            yield resultado
+
+    _llenar()
+    return _resultados()
+
+
+def _guardar(ruta, contenido):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(contenido)
+    os.replace(tmp, ruta)  # atómico: nadie lee un PDF a medio escribir
+
+
+def obtener_pdf(tipo, render, datos):
+    """Ruta del PDF que genera render(datos) -> bytes.
+
+    `render` tiene que ser una función de módulo (se manda por nombre al
+    proceso hijo) y `datos` algo serializable, sin filas sqlite3.Row. Si el
+    PDF ya está en disco se devuelve sin renderizar.
+    """
+    ruta = _ruta(tipo, render, datos)
+    if os.path.exists(ruta):
+        try:
+            os.utime(ruta)  # la limpieza borra por antigüedad del último uso
+        except OSError:
+            pass
+        return ruta
+
+    with _en_curso_lock:
+        futuro = _en_curso.get(ruta)
+        propio = futuro is None
+        if propio:
+            futuro = _en_curso[ruta] = Future()
+    if not propio:
+        return futuro.result(timeout=PDF_CONFIG['timeout_seg'])
+
+    try:
+        _guardar(ruta, _renderizar(render, datos))
+        futuro.set_result(ruta)
+    except BaseException as e:
+        futuro.set_exception(e)
+        raise
+    finally:
+        with _en_curso_lock:
+            _en_curso.pop(ruta, None)
+    return ruta
+
+
+def limpiar_cache(dias=None):
+    """Borra los PDF no usados en los últimos `dias` (PDF_CONFIG['cache_dias']).
+    Devuelve cuántos archivos se borraron."""
+    limite = time.time() - (dias if dias is not None else PDF_CONFIG['cache_dias']) * 86400
+    borrados = 0
+    try:
+        entradas = list(os.scandir(PDF_CONFIG['cache_dir']))
+    except FileNotFoundError:
+        return 0
+    for entrada in entradas:
+        try:
+            if entrada.is_file() and entrada.stat().st_mtime < limite:
+                os.remove(entrada.path)
+                borrados += 1
+        except OSError:
+            pass
+    if borrados:
+        logger.info("Caché de PDF: %d archivos viejos borrados", borrados)
+    return borrados
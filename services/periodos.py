@@ -0,0 +1,69 @@
+# services/periodos.py
+"""Rangos de fechas para filtrar reportes por período.
+
+Todo filtro por día, mes o rango se arma como intervalo semiabierto
+`columna >= desde AND columna < hasta`: SQLite lo resuelve recorriendo el
+índice de la columna, cosa que no puede hacer con strftime(columna) = ? o
+columna LIKE 'YYYY-MM%'. Sirve igual para columnas 'YYYY-MM-DD' y
+'YYYY-MM-DD HH:MM:SS' (un BETWEEN hasta el último día deja afuera lo que se
+registró ese día después de las 00:00:00).
+"""
+from datetime import date, timedelta
+
+
+def _dia(valor):
+    """date a partir de una fecha o de un texto que empieza con 'YYYY-MM-DD'."""
+    return date.fromisoformat(str(valor)[:10])
+
+
+def _mes_siguiente(anio, mes):
+    return anio + mes // 12, mes % 12 + 1
+
+
+def rango_dias(desde, hasta):
+    """Días desde..hasta inclusive -> ('YYYY-MM-DD', día siguiente a hasta).
+    ValueError si alguna fecha no es válida."""
+    return _dia(desde).isoformat(), (_dia(hasta) + timedelta(days=1)).isoformat()
+
+
+def rango_mes(anio, mes):
+    """('YYYY-MM-01', primer día del mes siguiente)."""
+    sig_anio, sig_mes = _mes_siguiente(anio, mes)
+    return f"{anio}-{mes:02d}-01", f"{sig_anio}-{sig_mes:02d}-01"
+
+
+def rango_clave(clave):
+    """Rango de un día 'YYYY-MM-DD' o de un mes 'YYYY-MM'."""
+    if len(clave) == 10:
+        return rango_dias(clave, clave)
+    return rango_mes(int(clave[:4]), int(clave[5:7]))
+
+
+def meses_hasta(anio, mes, cantidad=12):
+    """Los `cantidad` meses que terminan en anio/mes, del más viejo al más
+    nuevo: ([(anio, mes), ...], desde, hasta) con el rango que los cubre."""
+    meses = []
+    for i in range(cantidad - 1, -1, -1):
+        a, m = divmod(anio * 12 + mes - 1 - i, 12)
+        meses.append((a, m + 1))
+    desde = rango_mes(*meses[0])[0]
+    hasta = rango_mes(*meses[-1])[1]
+    return meses, desde, hasta
+
+
+def entre(columna):
+    """Condición SQL del rango; los parámetros son (desde, hasta) de rango_*()."""
+    return f"{columna} >= ? AND {columna} < ?"
+
+
+def condiciones(columna, desde=None, hasta=None):
+    """Filtro con extremos opcionales (días inclusive, como llegan de un
+    formulario): (lista de condiciones SQL, lista de parámetros)."""
+    conds, params = [], []
+    if desde:
+        conds.append(f"{columna} >= ?")
+        params.append(_dia(desde).isoformat())
+    if hasta:
+        conds.append(f"{columna} < ?")
+        params.append(rango_dias(hasta, hasta)[1])
+    return conds, params
@@ -1,5 +1,4 @@
 # services/presupuesto_service.py
-import io
 import logging
 from datetime import datetime, date
 
@@ -360,54 +359,17 @@ def marcar_vencidos():
 # ── Generación de PDF ────────────────────────────────────────────────────────
 
 def generar_pdf(presupuesto_id):
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib.units import cm
-    from reportlab.lib.enums import TA_RIGHT, TA_CENTER
-    from reportlab.platypus import (
-        SimpleDocTemplate, Table, TableStyle,
-        Paragraph, Spacer, HRFlowable
-    )
+    from reportlab.platypus import Table, Paragraph, Spacer
+    from services import pdf_layout as pdf
 
     p, items, _ = get_presupuesto(presupuesto_id)
     if not p:
         return None
 
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4,
-                            title=f"Presupuesto {p['numero']}",
-                            rightMargin=2*cm, leftMargin=2*cm,
-                            topMargin=2*cm, bottomMargin=2*cm)
-    styles = getSampleStyleSheet()
-    story  = []
-
-    PRIMARY = colors.HexColor('#4361ee')
-    LIGHT   = colors.HexColor('#f1f3f9')
-    BORDER  = colors.HexColor('#dee2e6')
-    ALT_ROW = colors.HexColor('#f8f9fa')
-
-    right_style  = ParagraphStyle('right',  parent=styles['Normal'], alignment=TA_RIGHT)
-    center_style = ParagraphStyle('center', parent=styles['Normal'], alignment=TA_CENTER)
-    small_gray   = ParagraphStyle('small',  parent=styles['Normal'],
-                                  fontSize=8, textColor=colors.HexColor('#6c757d'),
-                                  alignment=TA_CENTER)
-
-    # ── Cabecera ──────────────────────────────────────────────────────────
-    hdr = Table([[
-        Paragraph("<b><font size='18' color='#4361ee'>COMENDA DECO</font></b>",
-                  styles['Normal']),
-        Paragraph(
-            f"<b><font size='14'>PRESUPUESTO</font></b><br/>"
-            f"<font size='11'>N° {p['numero']}</font>",
-            right_style
-        )
-    ]], colWidths=[10*cm, 7*cm])
-    hdr.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    story += [hdr, HRFlowable(width="100%", thickness=2, color=PRIMARY), Spacer(1, .4*cm)]
+    buf, doc = pdf.documento(f"Presupuesto {p['numero']}")
+    st    = pdf.estilos()
+    story = pdf.encabezado('PRESUPUESTO', p['numero'])
 
     # ── Fechas / Estado ───────────────────────────────────────────────────
     fecha_str   = (p['fecha'] or '')[:10]
@@ -415,32 +377,24 @@ def generar_pdf(presupuesto_id):
     estado_lbl  = p['estado'].upper()
 
     fechas = Table([[
-        Paragraph(f"<b>Fecha:</b> {fecha_str}", styles['Normal']),
-        Paragraph(f"<b>Válido hasta:</b> {validez_str}", styles['Normal']),
-        Paragraph(f"<b>Estado:</b> {estado_lbl}", styles['Normal']),
+        Paragraph(f"<b>Fecha:</b> {fecha_str}", st['normal']),
+        Paragraph(f"<b>Válido hasta:</b> {validez_str}", st['normal']),
+        Paragraph(f"<b>Estado:</b> {estado_lbl}", st['normal']),
     ]], colWidths=[6*cm, 6*cm, 5*cm])
-    fechas.setStyle(TableStyle([('BOTTOMPADDING', (0, 0), (-1, -1), 8)]))
+    fechas.setStyle(pdf.estilo_tabla('fila'))
     story += [fechas, Spacer(1, .3*cm)]
 
     # ── Cliente ───────────────────────────────────────────────────────────
-    story.append(Paragraph(
-        "<b>CLIENTE</b>",
-        ParagraphStyle('hdr', parent=styles['Normal'],
-                       backColor=LIGHT, leftPadding=6, fontSize=10)
-    ))
+    story.append(pdf.seccion("CLIENTE"))
     story.append(Spacer(1, .2*cm))
     cli_txt = f"<b>{p['cliente_nombre']}</b>"
     if p['cuit']:    cli_txt += f"&nbsp;&nbsp;CUIT: {p['cuit']}"
     if p['telefono']:cli_txt += f"&nbsp;&nbsp;Tel: {p['telefono']}"
     if p['email']:   cli_txt += f"&nbsp;&nbsp;Email: {p['email']}"
-    story += [Paragraph(cli_txt, styles['Normal']), Spacer(1, .5*cm)]
+    story += [Paragraph(cli_txt, st['normal']), Spacer(1, .5*cm)]
 
     # ── Tabla de ítems ────────────────────────────────────────────────────
-    story.append(Paragraph(
-        "<b>DETALLE</b>",
-        ParagraphStyle('hdr', parent=styles['Normal'],
-                       backColor=LIGHT, leftPadding=6, fontSize=10)
-    ))
+    story.append(pdf.seccion("DETALLE"))
     story.append(Spacer(1, .2*cm))
 
     tbl_data = [['#', 'Descripción', 'Cantidad', 'Precio unit.', 'Subtotal']]
@@ -454,45 +408,23 @@ def generar_pdf(presupuesto_id):
         ])
     tbl_data.append([
         '', '', '',
-        Paragraph('<b>TOTAL</b>', right_style),
-        Paragraph(f"<b>${float(p['total']):,.2f}</b>", right_style),
+        pdf.parrafo_fijo('<b>TOTAL</b>', 'right'),
+        Paragraph(f"<b>${float(p['total']):,.2f}</b>", st['right']),
     ])
 
     tbl = Table(tbl_data, colWidths=[1*cm, 8*cm, 2.5*cm, 3*cm, 2.5*cm])
-    tbl.setStyle(TableStyle([
-        ('BACKGROUND',    (0, 0), (-1, 0),  PRIMARY),
-        ('TEXTCOLOR',     (0, 0), (-1, 0),  colors.white),
-        ('FONTNAME',      (0, 0), (-1, 0),  'Helvetica-Bold'),
-        ('FONTSIZE',      (0, 0), (-1, -1), 9),
-        ('ROWBACKGROUNDS',(0, 1), (-1, -2), [colors.white, ALT_ROW]),
-        ('GRID',          (0, 0), (-1, -2), 0.5, BORDER),
-        ('ALIGN',         (2, 0), (-1, -1), 'RIGHT'),
-        ('LINEABOVE',     (0, -1),(-1, -1), 1, PRIMARY),
-        ('TOPPADDING',    (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
+    tbl.setStyle(pdf.estilo_tabla('presupuesto_items'))
     story += [tbl, Spacer(1, .5*cm)]
 
     # ── Observaciones ─────────────────────────────────────────────────────
     if p['observaciones']:
-        story.append(Paragraph(
-            "<b>OBSERVACIONES</b>",
-            ParagraphStyle('hdr', parent=styles['Normal'],
-                           backColor=LIGHT, leftPadding=6, fontSize=10)
-        ))
+        story.append(pdf.seccion("OBSERVACIONES"))
         story += [Spacer(1, .2*cm),
-                  Paragraph(p['observaciones'], styles['Normal']),
+                  Paragraph(p['observaciones'], st['normal']),
                   Spacer(1, .5*cm)]
 
     # ── Pie ───────────────────────────────────────────────────────────────
-    story += [
-        HRFlowable(width="100%", thickness=1, color=BORDER),
-        Spacer(1, .2*cm),
-        Paragraph(
-            "Documento generado por Sistema de Gestión · Comenda Deco",
-            small_gray
-        ),
-    ]
+    story += pdf.pie()
 
     doc.build(story)
     buf.seek(0)
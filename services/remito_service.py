@@ -1,10 +1,9 @@
 # services/remito_service.py
-import io
 import logging
 from datetime import datetime
 
 from models import get_conn
-from services.tiendanube_service import actualizar_stock_tn_service
+from services.tn_outbox_service import encolar_sync_tn_en_conn, notificar_outbox_tn
 
 logger = logging.getLogger(__name__)
 
@@ -299,23 +298,14 @@ def cambiar_estado(remito_id, nuevo_estado, recibido_por=None):
                     "UPDATE productos SET stock = MAX(0, stock - ?) WHERE id = ?",
                     (int(item['cantidad']), item['producto_id'])
                 )
-                # Obtener nuevo stock y variant_id para sincronizar con TN
-                prod = conn.execute(
-                    "SELECT stock, variant_id FROM productos WHERE id = ?",
-                    (item['producto_id'],)
-                ).fetchone()
-                if prod and prod['variant_id']:
-                    try:
-                        actualizar_stock_tn_service(prod['variant_id'], prod['stock'])
-                    except Exception:
-                        logger.warning("No se pudo sincronizar stock TN para producto %s",
-                                       item['producto_id'])
+                encolar_sync_tn_en_conn(conn, item['producto_id'])
 
             conn.execute(
                 "UPDATE remitos SET stock_descontado = 1 WHERE id = ?", (remito_id,)
             )
 
         conn.commit()
+        notificar_outbox_tn()
         logger.info("Remito %s: %s -> %s", remito_id, estado_actual, nuevo_estado)
         return True, nuevo_estado
 
@@ -355,54 +345,18 @@ def eliminar_remito(remito_id):
 # ── Generación de PDF ────────────────────────────────────────────────────────
 
 def generar_pdf(remito_id):
-    from reportlab.lib.pagesizes import A4
     from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib.units import cm
-    from reportlab.lib.enums import TA_RIGHT, TA_CENTER
-    from reportlab.platypus import (
-        SimpleDocTemplate, Table, TableStyle,
-        Paragraph, Spacer, HRFlowable
-    )
+    from reportlab.platypus import Table, Paragraph, Spacer, HRFlowable
+    from services import pdf_layout as pdf
 
     r, items = get_remito(remito_id)
     if not r:
         return None
 
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4,
-                            title=f"Remito {r['numero']}",
-                            rightMargin=2*cm, leftMargin=2*cm,
-                            topMargin=2*cm, bottomMargin=2*cm)
-    styles  = getSampleStyleSheet()
-    story   = []
-
-    PRIMARY = colors.HexColor('#4361ee')
-    LIGHT   = colors.HexColor('#f1f3f9')
-    BORDER  = colors.HexColor('#dee2e6')
-    ALT_ROW = colors.HexColor('#f8f9fa')
-
-    right_style  = ParagraphStyle('right',  parent=styles['Normal'], alignment=TA_RIGHT)
-    center_style = ParagraphStyle('center', parent=styles['Normal'], alignment=TA_CENTER)
-    small_gray   = ParagraphStyle('small',  parent=styles['Normal'],
-                                  fontSize=8, textColor=colors.HexColor('#6c757d'),
-                                  alignment=TA_CENTER)
-
-    # ── Cabecera ──────────────────────────────────────────────────────────
-    hdr = Table([[
-        Paragraph("<b><font size='18' color='#4361ee'>COMENDA DECO</font></b>",
-                  styles['Normal']),
-        Paragraph(
-            f"<b><font size='14'>REMITO</font></b><br/>"
-            f"<font size='11'>N° {r['numero']}</font>",
-            right_style
-        )
-    ]], colWidths=[10*cm, 7*cm])
-    hdr.setStyle(TableStyle([
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 8),
-    ]))
-    story += [hdr, HRFlowable(width="100%", thickness=2, color=PRIMARY), Spacer(1, .4*cm)]
+    buf, doc = pdf.documento(f"Remito {r['numero']}")
+    st    = pdf.estilos()
+    story = pdf.encabezado('REMITO', r['numero'])
 
     # ── Info general ──────────────────────────────────────────────────────
     fecha_str    = (r['fecha'] or '')[:10]
@@ -410,11 +364,11 @@ def generar_pdf(remito_id):
     estado_label = r['estado'].upper().replace('_', ' ')
 
     info = Table([[
-        Paragraph(f"<b>Fecha:</b> {fecha_str}", styles['Normal']),
-        Paragraph(f"<b>Entrega estimada:</b> {est_str}", styles['Normal']),
-        Paragraph(f"<b>Estado:</b> {estado_label}", styles['Normal']),
+        Paragraph(f"<b>Fecha:</b> {fecha_str}", st['normal']),
+        Paragraph(f"<b>Entrega estimada:</b> {est_str}", st['normal']),
+        Paragraph(f"<b>Estado:</b> {estado_label}", st['normal']),
     ]], colWidths=[6*cm, 6*cm, 5*cm])
-    info.setStyle(TableStyle([('BOTTOMPADDING', (0,0), (-1,-1), 8)]))
+    info.setStyle(pdf.estilo_tabla('fila'))
     story += [info, Spacer(1, .3*cm)]
 
     # ── Origen ────────────────────────────────────────────────────────────
@@ -424,37 +378,30 @@ def generar_pdf(remito_id):
             origen.append(f"Presupuesto: {r['presupuesto_numero']}")
         if r['venta_numero']:
             origen.append(f"Venta: #{r['venta_numero']}")
-        story.append(Paragraph(" · ".join(origen),
-                                ParagraphStyle('orig', parent=styles['Normal'],
-                                               textColor=colors.HexColor('#6c757d'),
-                                               fontSize=9)))
+        story.append(Paragraph(" · ".join(origen), st['nota']))
         story.append(Spacer(1, .2*cm))
 
     # ── Destinatario ──────────────────────────────────────────────────────
-    story.append(Paragraph("<b>DESTINATARIO</b>",
-                           ParagraphStyle('hdr', parent=styles['Normal'],
-                                          backColor=LIGHT, leftPadding=6, fontSize=10)))
+    story.append(pdf.seccion("DESTINATARIO"))
     story.append(Spacer(1, .2*cm))
 
     dest_txt = f"<b>{r['destinatario']}</b>"
     if r['cliente_nombre'] and r['cliente_nombre'] != r['destinatario']:
         dest_txt += f" ({r['cliente_nombre']})"
-    story.append(Paragraph(dest_txt, styles['Normal']))
-    story.append(Paragraph(f"<b>Dirección:</b> {r['direccion']}", styles['Normal']))
+    story.append(Paragraph(dest_txt, st['normal']))
+    story.append(Paragraph(f"<b>Dirección:</b> {r['direccion']}", st['normal']))
     story.append(Spacer(1, .4*cm))
 
     # ── Logística ─────────────────────────────────────────────────────────
     log_data = [[
-        Paragraph(f"<b>Bultos:</b> {r['bultos'] or 1}", styles['Normal']),
-        Paragraph(f"<b>Peso:</b> {r['peso'] if r['peso'] else '—'} kg", styles['Normal']),
+        Paragraph(f"<b>Bultos:</b> {r['bultos'] or 1}", st['normal']),
+        Paragraph(f"<b>Peso:</b> {r['peso'] if r['peso'] else '—'} kg", st['normal']),
     ]]
     log_tbl = Table(log_data, colWidths=[8.5*cm, 8.5*cm])
     story += [log_tbl, Spacer(1, .4*cm)]
 
     # ── Ítems ────────────────────────────────────────────────────────────
-    story.append(Paragraph("<b>ARTÍCULOS A ENTREGAR</b>",
-                           ParagraphStyle('hdr', parent=styles['Normal'],
-                                          backColor=LIGHT, leftPadding=6, fontSize=10)))
+    story.append(pdf.seccion("ARTÍCULOS A ENTREGAR"))
     story.append(Spacer(1, .2*cm))
 
     tbl_data = [['#', 'Descripción', 'Cantidad']]
@@ -462,44 +409,32 @@ def generar_pdf(remito_id):
         tbl_data.append([str(i), it['descripcion'], f"{float(it['cantidad']):.0f}"])
 
     tbl = Table(tbl_data, colWidths=[1*cm, 14*cm, 2*cm])
-    tbl.setStyle(TableStyle([
-        ('BACKGROUND',    (0,0), (-1,0),  PRIMARY),
-        ('TEXTCOLOR',     (0,0), (-1,0),  colors.white),
-        ('FONTNAME',      (0,0), (-1,0),  'Helvetica-Bold'),
-        ('FONTSIZE',      (0,0), (-1,-1), 9),
-        ('ROWBACKGROUNDS',(0,1), (-1,-1), [colors.white, ALT_ROW]),
-        ('GRID',          (0,0), (-1,-1), 0.5, BORDER),
-        ('ALIGN',         (2,0), (-1,-1), 'CENTER'),
-        ('TOPPADDING',    (0,0), (-1,-1), 6),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 6),
-    ]))
+    tbl.setStyle(pdf.estilo_tabla('remito_items'))
     story += [tbl, Spacer(1, .4*cm)]
 
     # ── Observaciones ─────────────────────────────────────────────────────
     if r['observaciones']:
-        story.append(Paragraph("<b>OBSERVACIONES</b>",
-                               ParagraphStyle('hdr', parent=styles['Normal'],
-                                              backColor=LIGHT, leftPadding=6, fontSize=10)))
+        story.append(pdf.seccion("OBSERVACIONES"))
         story += [Spacer(1, .2*cm),
-                  Paragraph(r['observaciones'], styles['Normal']),
+                  Paragraph(r['observaciones'], st['normal']),
                   Spacer(1, .4*cm)]
 
     # ── Área de firma ─────────────────────────────────────────────────────
     story.append(Spacer(1, 1*cm))
-    story.append(HRFlowable(width="100%", thickness=1, color=BORDER))
+    story.append(pdf.linea())
     story.append(Spacer(1, .3*cm))
 
     if r['recibido_por']:
         firma_txt = f"<b>Recibido por:</b> {r['recibido_por']}"
         if r['fecha_entrega_real']:
             firma_txt += f"&nbsp;&nbsp;&nbsp;<b>Fecha:</b> {r['fecha_entrega_real'][:10]}"
-        story.append(Paragraph(firma_txt, styles['Normal']))
+        story.append(Paragraph(firma_txt, st['normal']))
     else:
         firma = Table([[
-            Paragraph("Firma y aclaración del receptor:", styles['Normal']),
-            Paragraph("Fecha de recepción:", styles['Normal']),
+            pdf.parrafo_fijo("Firma y aclaración del receptor:"),
+            pdf.parrafo_fijo("Fecha de recepción:"),
         ]], colWidths=[10*cm, 7*cm])
-        firma.setStyle(TableStyle([('TOPPADDING', (0,0), (-1,-1), 20)]))
+        firma.setStyle(pdf.estilo_tabla('remito_firma'))
         story += [firma, Spacer(1, 1.5*cm)]
         lineas = Table([[
             HRFlowable(width=9*cm, thickness=1, color=colors.black),
@@ -507,12 +442,7 @@ def generar_pdf(remito_id):
         ]], colWidths=[10*cm, 7*cm])
         story.append(lineas)
 
-    story += [
-        Spacer(1, .4*cm),
-        HRFlowable(width="100%", thickness=1, color=BORDER),
-        Spacer(1, .2*cm),
-        Paragraph("Documento generado por Sistema de Gestión · Comenda Deco", small_gray),
-    ]
+    story += [Spacer(1, .4*cm)] + pdf.pie()
 
     doc.build(story)
     buf.seek(0)
@@ -1,10 +1,14 @@
 # services/rentabilidad_service.py
-import calendar
 import logging
-from datetime import date, datetime
+from datetime import date
 from io import BytesIO
 
-from models import get_conn
+import numpy as np
+import pandas as pd
+
+from models import get_conn_lectura
+from services.periodos import entre, meses_hasta, rango_dias
+from services.reportes_cache import actualizado_en, memo
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +27,11 @@ def _fmt(v):
         return str(v)
 
 
+def _fecha_hora(texto):
+    """'YYYY-MM-DD HH:MM:SS' -> 'dd/mm/yyyy HH:MM'."""
+    return f"{texto[8:10]}/{texto[5:7]}/{texto[:4]} {texto[11:16]}"
+
+
 def _origen_cond(origen):
     if origen == 'tiendanube':
         return "AND v.metodo_pago = 'Tienda Nube'"
@@ -32,88 +41,138 @@ def _origen_cond(origen):
 
 
 # ── Cálculo principal ─────────────────────────────────────────────────────────
+#
+# Dos lecturas por período, cada una a un DataFrame, y el resto son
+# operaciones por columna (pandas / NumPy), sin recorrer productos en Python:
+#   - renglones vendidos sumados por producto (neto con el descuento
+#     prorrateado y costo del momento de la venta, ver m0014);
+#   - totales diarios por método de pago (agregados_service), de donde salen
+#     el facturado del período y los márgenes por origen y por mes.
+# El resultado es lo que usan la pantalla, el Excel y el PDF, y queda guardado
+# (services/reportes_cache) hasta que cambian las ventas.
+
+def _por_producto(conn, rango, oc):
+    return pd.read_sql_query(f"""
+        SELECT d.*, p.descripcion, p.sku
+        FROM (
+            SELECT dv.producto_id                                    AS id,
+                   SUM(dv.cantidad)                                  AS unidades,
+                   COALESCE(SUM(dv.neto), 0)                         AS ingresos,
+                   SUM(dv.cantidad * COALESCE(dv.costo_unitario, 0)) AS cogs,
+                   AVG(dv.precio_unitario)                           AS precio_promedio
+            FROM detalle_venta dv
+            WHERE dv.venta_id IN (
+                SELECT v.id FROM ventas v
+                WHERE {entre('v.fecha')}
+                  AND (v.estado IS NULL OR v.estado != 'cancelada')
+                  {oc}
+            )
+            GROUP BY dv.producto_id
+        ) d
+        JOIN productos p ON d.id = p.id
+        ORDER BY d.id
+    """, conn, params=rango, index_col='id')
+
+
+def _por_dia(conn, rango, oc):
+    return pd.read_sql_query(f"""
+        SELECT v.dia, v.metodo_pago, v.cantidad, v.total AS facturado,
+               COALESCE(c.cogs, 0) AS cogs
+        FROM agg_ventas_diarias v
+        LEFT JOIN agg_cogs_diario c
+               ON c.dia = v.dia AND c.metodo_pago IS v.metodo_pago
+        WHERE {entre('v.dia')}
+          {oc}
+    """, conn, params=rango)
+
+
+def _pct(parte, base):
+    """parte / base en %, con un decimal; 0 donde base no es positiva."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(base > 0, np.round(parte / base * 100, 1), 0.0)
+
+
+def _registros(columnas, orden=slice(None)):
+    """Lista de dicts (tipos de Python) para las plantillas, el Excel y el PDF,
+    con las filas en `orden`. Columna a columna con tolist(), que es mucho más
+    rápido que DataFrame.to_dict('records')."""
+    valores = [np.asarray(v)[orden].tolist() for v in columnas.values()]
+    return [dict(zip(columnas, fila)) for fila in zip(*valores)]
 
+
+def _margenes_por(dias, clave):
+    g = dias.groupby(clave, sort=True)[['cantidad', 'facturado', 'cogs']].sum()
+    facturado = g['facturado'].to_numpy(float)
+    cogs      = g['cogs'].to_numpy(float)
+    ganancia  = facturado - cogs
+    return _registros({
+        clave:        g.index.to_numpy(),
+        'cantidad':   g['cantidad'].to_numpy(int),
+        'facturado':  np.round(facturado, 2),
+        'cogs':       np.round(cogs, 2),
+        'ganancia':   np.round(ganancia, 2),
+        'margen_pct': _pct(ganancia, facturado),
+    })
+
+
+@memo('ventas')
 def get_rentabilidad(fecha_desde, fecha_hasta, origen=None):
     oc = _origen_cond(origen)
-    conn = get_conn()
+    rango = rango_dias(fecha_desde, fecha_hasta)
+    conn = get_conn_lectura()
+    try:
+        prods = _por_producto(conn, rango, oc)
+        dias  = _por_dia(conn, rango, oc)
+    finally:
+        conn.close()
 
     # Total facturado (ventas.total ya incluye descuento)
-    row = conn.execute(f"""
-        SELECT COALESCE(SUM(v.total), 0) AS facturado,
-               COUNT(*) AS num_ventas
-        FROM ventas v
-        WHERE v.fecha BETWEEN ? AND ?
-          AND (v.estado IS NULL OR v.estado != 'cancelada')
-          {oc}
-    """, (fecha_desde, fecha_hasta)).fetchone()
-    facturado  = float(row['facturado'])
-    num_ventas = int(row['num_ventas'])
-
-    # Rentabilidad por producto — aplica descuento proporcional de la venta
-    # CASE distribuye el descuento de la venta al item según su proporción
-    prods = conn.execute(f"""
-        SELECT
-            p.id,
-            p.descripcion,
-            p.sku,
-            COALESCE(p.costo, 0)  AS costo,
-            SUM(dv.cantidad)       AS unidades_vendidas,
-            SUM(dv.cantidad * dv.precio_unitario *
-                CASE WHEN COALESCE(v.subtotal, 0) > 0
-                     THEN CAST(v.total AS REAL) / v.subtotal
-                     ELSE 1.0 END
-            )                      AS ingresos_producto,
-            AVG(dv.precio_unitario) AS precio_promedio
-        FROM detalle_venta dv
-        JOIN productos p ON dv.producto_id = p.id
-        JOIN ventas v    ON dv.venta_id    = v.id
-        WHERE v.fecha BETWEEN ? AND ?
-          AND (v.estado IS NULL OR v.estado != 'cancelada')
-          {oc}
-        GROUP BY p.id, p.descripcion, p.sku, p.costo
-    """, (fecha_desde, fecha_hasta)).fetchall()
-    conn.close()
+    facturado  = float(dias['facturado'].sum())
+    num_ventas = int(dias['cantidad'].sum())
+
+    # Por producto
+    unidades = prods['unidades'].to_numpy(float)
+    ingresos = prods['ingresos'].to_numpy(float)
+    cogs     = prods['cogs'].to_numpy(float)
+    precio   = prods['precio_promedio'].fillna(0).to_numpy(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Costo promedio de las unidades vendidas (puede variar entre ventas)
+        costo = np.where(unidades != 0, cogs / unidades, 0.0)
+    ganancia    = ingresos - cogs
+    margen_unit = precio - costo
+
+    columnas = {
+        'id':              prods.index.to_numpy(),
+        'descripcion':     prods['descripcion'].to_numpy(),
+        'sku':             prods['sku'].fillna('').to_numpy(),
+        'costo':           np.round(costo, 2),
+        'unidades':        unidades.astype(int),
+        'precio_promedio': np.round(precio, 2),
+        'margen_unitario': np.round(margen_unit, 2),
+        'margen_unit_pct': _pct(margen_unit, precio),
+        'ingresos':        np.round(ingresos, 2),
+        'cogs':            np.round(cogs, 2),
+        'ganancia':        np.round(ganancia, 2),
+        'margen_pct':      _pct(ganancia, ingresos),
+    }
+    tiene_costo = columnas['costo'] > 0
+    con = np.flatnonzero(tiene_costo)
+    sin = np.flatnonzero(~tiene_costo)
+    con_costo = _registros(columnas, con[np.argsort(-columnas['ganancia'][con], kind='stable')])
+    sin_costo = _registros(columnas, sin[np.argsort(-columnas['ingresos'][sin], kind='stable')])
 
-    con_costo = []
-    sin_costo = []
-
-    for r in prods:
-        costo      = float(r['costo'] or 0)
-        unidades   = float(r['unidades_vendidas'] or 0)
-        ingresos   = float(r['ingresos_producto'] or 0)
-        precio_avg = float(r['precio_promedio'] or 0)
-
-        cogs     = costo * unidades
-        ganancia = ingresos - cogs
-        margen_pct  = round(ganancia / ingresos * 100, 1) if ingresos > 0 else 0
-        margen_unit = precio_avg - costo
-
-        item = {
-            'id':              r['id'],
-            'descripcion':     r['descripcion'],
-            'sku':             r['sku'] or '',
-            'costo':           costo,
-            'unidades':        int(unidades),
-            'precio_promedio': round(precio_avg, 2),
-            'margen_unitario': round(margen_unit, 2),
-            'margen_unit_pct': round(margen_unit / precio_avg * 100, 1) if precio_avg > 0 else 0,
-            'ingresos':        round(ingresos, 2),
-            'cogs':            round(cogs, 2),
-            'ganancia':        round(ganancia, 2),
-            'margen_pct':      margen_pct,
-        }
-        if costo > 0:
-            con_costo.append(item)
-        else:
-            sin_costo.append(item)
-
-    con_costo.sort(key=lambda x: x['ganancia'], reverse=True)
-    sin_costo.sort(key=lambda x: x['ingresos'], reverse=True)
-
-    total_cogs     = sum(p['cogs']    for p in con_costo)
+    total_cogs     = float(columnas['cogs'][tiene_costo].sum())
     total_ganancia = facturado - total_cogs
     margen_bruto   = round(total_ganancia / facturado * 100, 1) if facturado > 0 else 0
 
+    # Por origen y por mes
+    dias['origen'] = np.where(dias['metodo_pago'] == 'Tienda Nube', 'Tienda Nube', 'Negocio')
+    dias['mes']    = dias['dia'].str[:7]
+    por_origen = _margenes_por(dias, 'origen')
+    por_mes    = _margenes_por(dias, 'mes')
+    for m in por_mes:
+        m['label'] = f"{MESES_ES[int(m['mes'][5:7]) - 1][:3]} {m['mes'][2:4]}"
+
     return {
         'fecha_desde':     fecha_desde,
         'fecha_hasta':     fecha_hasta,
@@ -125,49 +184,35 @@ def get_rentabilidad(fecha_desde, fecha_hasta, origen=None):
         'productos':       con_costo,
         'sin_costo':       sin_costo,
         'top5':            con_costo[:5],
+        'por_origen':      por_origen,
+        'por_mes':         por_mes,
     }
 
 
 # ── Evolución margen 12 meses ─────────────────────────────────────────────────
 
+@memo('ventas')
 def get_evolucion_margen_12meses(year, month, origen=None):
     oc = _origen_cond(origen)
 
-    months = []
-    for i in range(11, -1, -1):
-        m = month - i
-        y = year
-        while m <= 0:
-            m += 12
-            y -= 1
-        months.append((y, m))
-
-    ini_y, ini_m = months[0]
-    fin_y, fin_m = months[-1]
-    fecha_ini    = f"{ini_y}-{ini_m:02d}-01"
-    last_day     = calendar.monthrange(fin_y, fin_m)[1]
-    fecha_fin    = f"{fin_y}-{fin_m:02d}-{last_day}"
-
-    conn = get_conn()
+    months, fecha_ini, fecha_fin = meses_hasta(year, month)
+
+    conn = get_conn_lectura()
+    # Desde los agregados diarios (services/agregados_service.py)
     ventas_rows = conn.execute(f"""
-        SELECT strftime('%Y-%m', fecha) AS mes,
-               COALESCE(SUM(total), 0)  AS facturado
-        FROM ventas
-        WHERE fecha BETWEEN ? AND ?
-          AND (estado IS NULL OR estado != 'cancelada')
+        SELECT substr(v.dia, 1, 7)         AS mes,
+               COALESCE(SUM(v.total), 0)  AS facturado
+        FROM agg_ventas_diarias v
+        WHERE {entre('v.dia')}
           {oc}
         GROUP BY mes
     """, (fecha_ini, fecha_fin)).fetchall()
 
     cogs_rows = conn.execute(f"""
-        SELECT strftime('%Y-%m', v.fecha)       AS mes,
-               SUM(dv.cantidad * COALESCE(p.costo, 0)) AS cogs
-        FROM detalle_venta dv
-        JOIN ventas v    ON dv.venta_id    = v.id
-        JOIN productos p ON dv.producto_id = p.id
-        WHERE v.fecha BETWEEN ? AND ?
-          AND (v.estado IS NULL OR v.estado != 'cancelada')
-          AND COALESCE(p.costo, 0) > 0
+        SELECT substr(v.dia, 1, 7)         AS mes,
+               SUM(v.cogs)                AS cogs
+        FROM agg_cogs_diario v
+        WHERE {entre('v.dia')}
           {oc}
         GROUP BY mes
     """, (fecha_ini, fecha_fin)).fetchall()
@@ -196,11 +241,14 @@ def get_evolucion_margen_12meses(year, month, origen=None):
 
 # ── Exportar Excel ────────────────────────────────────────────────────────────
 
-def exportar_excel(fecha_desde, fecha_hasta, origen=None):
+def exportar_excel(fecha_desde, fecha_hasta, origen=None, data=None):
+    """Libro de rentabilidad. `data` es el resultado de get_rentabilidad si ya
+    se calculó; si no, se calcula acá."""
     import openpyxl
     from openpyxl.styles import Alignment, Font, PatternFill
 
-    data = get_rentabilidad(fecha_desde, fecha_hasta, origen)
+    if data is None:
+        data = get_rentabilidad(fecha_desde, fecha_hasta, origen)
     evol = get_evolucion_margen_12meses(
         int(fecha_hasta[:4]), int(fecha_hasta[5:7]), origen
     )
@@ -289,7 +337,27 @@ def exportar_excel(fecha_desde, fecha_hasta, origen=None):
         for col, w in zip('ABCD', [40, 14, 10, 24]):
             ws3.column_dimensions[col].width = w
 
-    # ── Hoja 4: Evolución margen ─────────────────────────────────────────────
+    # ── Hojas 4 y 5: Por origen y por mes ─────────────────────────────────────
+    for titulo, encabezado, clave, filas in [
+        ('Por Origen', 'Origen', 'origen', data['por_origen']),
+        ('Por Mes',    'Mes',    'label',  data['por_mes']),
+    ]:
+        ws = wb.create_sheet(titulo)
+        _hrow(ws, [encabezado, 'Ventas', 'Facturado', 'COGS', 'Ganancia', 'Margen %'])
+        for f in filas:
+            ws.append([f[clave], f['cantidad'], f['facturado'], f['cogs'],
+                       f['ganancia'], f['margen_pct'] / 100])
+        _alt(ws, 2)
+        for row in ws.iter_rows(min_row=2, min_col=3, max_col=5):
+            for cell in row:
+                cell.number_format = money_fmt
+        for row in ws.iter_rows(min_row=2, min_col=6, max_col=6):
+            for cell in row:
+                cell.number_format = pct_fmt
+        for col, w in zip('ABCDEF', [16, 10, 18, 18, 18, 12]):
+            ws.column_dimensions[col].width = w
+
+    # ── Hoja 6: Evolución margen ─────────────────────────────────────────────
     ws4 = wb.create_sheet('Evolución Margen')
     _hrow(ws4, ['Mes', 'Facturado', 'COGS', 'Ganancia', 'Margen %'])
     for e in evol:
@@ -313,7 +381,24 @@ def exportar_excel(fecha_desde, fecha_hasta, origen=None):
 
 # ── Exportar PDF ──────────────────────────────────────────────────────────────
 
-def exportar_pdf(fecha_desde, fecha_hasta, origen=None, empresa='Comenda Deco'):
+def datos_pdf(fecha_desde, fecha_hasta, origen=None, empresa='Comenda Deco', data=None):
+    """Todo lo que muestra el PDF de rentabilidad (ver resumen_service.datos_pdf).
+    `data` como en exportar_excel."""
+    datos_al = actualizado_en('ventas')
+    if data is None:
+        data = get_rentabilidad(fecha_desde, fecha_hasta, origen)
+    return {
+        'fecha_desde': fecha_desde,
+        'fecha_hasta': fecha_hasta,
+        'empresa':     empresa,
+        'data':        data,
+        'datos_al':    datos_al,
+    }
+
+
+def render_pdf(datos):
+    """Bytes del PDF a partir de datos_pdf (no toca la base). Pie con
+    la fecha de los datos (ver resumen_service.render_pdf)."""
     from reportlab.lib import colors
     from reportlab.lib.pagesizes import A4, landscape
     from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
@@ -321,7 +406,8 @@ def exportar_pdf(fecha_desde, fecha_hasta, origen=None, empresa='Comenda Deco'):
     from reportlab.platypus import (Paragraph, SimpleDocTemplate, Spacer,
                                     Table, TableStyle)
 
-    data = get_rentabilidad(fecha_desde, fecha_hasta, origen)
+    fecha_desde, fecha_hasta = datos['fecha_desde'], datos['fecha_hasta']
+    empresa, data = datos['empresa'], datos['data']
 
     buf = BytesIO()
     doc = SimpleDocTemplate(
@@ -383,6 +469,19 @@ def exportar_pdf(fecha_desde, fecha_hasta, origen=None, empresa='Comenda Deco'):
     t_sum.setStyle(ts_sum)
     story.append(t_sum)
 
+    # Por origen (solo si el reporte abarca más de uno)
+    if len(data.get('por_origen', [])) > 1:
+        story.append(Paragraph("Por Origen", sec_st))
+        o_data = [['Origen', 'Ventas', 'Facturado', 'COGS', 'Ganancia', 'Margen %']]
+        for o in data['por_origen']:
+            o_data.append([o['origen'], str(o['cantidad']), _fmt(o['facturado']),
+                           _fmt(o['cogs']), _fmt(o['ganancia']), f"{o['margen_pct']}%"])
+        t_ori = Table(o_data, colWidths=[5*cm, 2.5*cm, 3.5*cm, 3.5*cm, 3.5*cm, 2.5*cm])
+        ts_o = _ts()
+        ts_o.add('ALIGN', (1, 0), (-1, -1), 'RIGHT')
+        t_ori.setStyle(ts_o)
+        story.append(t_ori)
+
     # Top productos
     if data['productos']:
         story.append(Paragraph("Top Productos por Rentabilidad", sec_st))
@@ -416,15 +515,12 @@ def exportar_pdf(fecha_desde, fecha_hasta, origen=None, empresa='Comenda Deco'):
 
     story.append(Spacer(1, .4*cm))
     story.append(Paragraph(
-        "Nota: El costo refleja el valor actual del producto, no necesariamente el costo al momento de la venta.",
+        "Nota: El costo es el del producto al momento de cada venta (promedio de las unidades vendidas).",
         ParagraphStyle('nota', fontSize=8, textColor=colors.grey)
     ))
-    story.append(Spacer(1, .3*cm))
-    story.append(Paragraph(
-        f"Generado el {datetime.now().strftime('%d/%m/%Y %H:%M')} — {empresa}",
-        foot_st
-    ))
+    if datos['datos_al']:
+        story.append(Spacer(1, .3*cm))
+        story.append(Paragraph(f"Datos actualizados al {_fecha_hora(datos['datos_al'])}", foot_st))
 
     doc.build(story)
-    buf.seek(0)
-    return buf
+    return buf.getvalue()
@@ -0,0 +1,105 @@
+# services/reportes_cache.py
+"""Resultados de reportes en memoria del proceso, por parámetros y versión de datos.
+
+La pantalla de un reporte y sus descargas (Excel, PDF) piden los mismos
+cálculos para el mismo período; las funciones marcadas con @memo('ventas', ...)
+guardan su resultado bajo (función, argumentos, base, versión de cada tabla)
+y la siguiente llamada igual lo reutiliza.
+
+La versión de ventas y gastos está en la tabla versiones_datos y sube dentro
+de la transacción de cada escritura (agregados_service.refrescar_*_en_conn),
+así que también vale entre procesos: lo calculado con una versión anterior no
+se vuelve a servir. Las entradas salen por LRU (MAX_ENTRADAS) o por TTL_SEG,
+que acota lo que no mueve la versión (renombrar un producto o un cliente).
+
+Lo devuelto se comparte entre llamadas: no modificarlo.
+"""
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import db
+
+CACHE_ACTIVO = True
+TTL_SEG = 600
+MAX_ENTRADAS = 64
+
+_lock = threading.Lock()
+_entradas = OrderedDict()   # {clave: (resultado, calculado_en)}; la más reciente al final
+
+
+def versiones(*tablas):
+    """Versión actual de cada tabla, en el orden pedido."""
+    conn = db.get_conn_lectura()
+    try:
+        filas = dict(conn.execute(
+            f"SELECT tabla, version FROM versiones_datos WHERE tabla IN ({','.join('?' * len(tablas))})",
+            tablas
+        ).fetchall())
+    finally:
+        conn.close()
+    return tuple(filas.get(t, 0) for t in tablas)
+
+
+def actualizado_en(*tablas):
+    """'YYYY-MM-DD HH:MM:SS' del último cambio en alguna de `tablas`, o None
+    si nunca cambiaron."""
+    conn = db.get_conn_lectura()
+    try:
+        return conn.execute(
+            f"SELECT MAX(actualizado_en) FROM versiones_datos WHERE tabla IN ({','.join('?' * len(tablas))})",
+            tablas
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def subir_version_en_conn(conn, *tablas):
+    """Marca como cambiados los datos de `tablas`. Va antes del commit, en la
+    misma conexión que escribe."""
+    ahora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    conn.executemany(
+        "UPDATE versiones_datos SET version = version + 1, actualizado_en = ? WHERE tabla = ?",
+        [(ahora, t) for t in tablas]
+    )
+
+
+def memo(*tablas):
+    """Decorador: reutiliza el resultado mientras no cambien los datos de `tablas`."""
+    def decorador(fn):
+        firma = inspect.signature(fn)
+        nombre = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            if not CACHE_ACTIVO:
+                return fn(*args, **kwargs)
+            # Con los valores por defecto aplicados: f(a, b) y f(a, b, None) son la misma
+            llamada = firma.bind(*args, **kwargs)
+            llamada.apply_defaults()
+            # La versión se lee antes de calcular: si una escritura se cruza,
+            # el resultado queda bajo la versión vieja y no se vuelve a usar
+            clave = (nombre, tuple(llamada.arguments.items()), db.DB_PATH, versiones(*tablas))
+            with _lock:
+                entrada = _entradas.get(clave)
+                if entrada and time.monotonic() - entrada[1] < TTL_SEG:
+                    _entradas.move_to_end(clave)
+                    return entrada[0]
+            resultado = fn(*args, **kwargs)
+            with _lock:
+                _entradas[clave] = (resultado, time.monotonic())
+                _entradas.move_to_end(clave)
+                while len(_entradas) > MAX_ENTRADAS:
+                    _entradas.popitem(last=False)
+            return resultado
+        return envoltura
+    return decorador
+
+
+def limpiar():
+    """Descarta todo lo guardado (la próxima llamada recalcula)."""
+    with _lock:
+        _entradas.clear()
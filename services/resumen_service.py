@@ -1,10 +1,12 @@
 # services/resumen_service.py
 import calendar
 import logging
-from datetime import date, datetime
+from datetime import date
 from io import BytesIO
 
-from models import get_conn
+from models import get_conn_lectura
+from services.periodos import entre, meses_hasta, rango_mes
+from services.reportes_cache import actualizado_en, memo
 
 logger = logging.getLogger(__name__)
 
@@ -28,42 +30,50 @@ def _fmt(v):
         return str(v)
 
 
+def _fecha_hora(texto):
+    """'YYYY-MM-DD HH:MM:SS' -> 'dd/mm/yyyy HH:MM'."""
+    return f"{texto[8:10]}/{texto[5:7]}/{texto[:4]} {texto[11:16]}"
+
+
 # ── Datos del mes ─────────────────────────────────────────────────────────────
 
+@memo('ventas', 'gastos')
 def get_resumen_mes(year, month):
     fecha_desde, fecha_hasta = _fecha_rango(year, month)
-    conn = get_conn()
+    rango = rango_mes(year, month)
+    conn = get_conn_lectura()
 
-    ing = conn.execute("""
-        SELECT COALESCE(SUM(total), 0) AS total, COUNT(*) AS cantidad
-        FROM ventas WHERE fecha BETWEEN ? AND ? AND (estado IS NULL OR estado != 'cancelada')
-    """, (fecha_desde, fecha_hasta)).fetchone()
+    # Totales desde los agregados diarios (services/agregados_service.py)
+    ing = conn.execute(f"""
+        SELECT COALESCE(SUM(total), 0) AS total, COALESCE(SUM(cantidad), 0) AS cantidad
+        FROM agg_ventas_diarias WHERE {entre('dia')}
+    """, rango).fetchone()
 
-    gas = conn.execute("""
-        SELECT COALESCE(SUM(monto), 0) AS total, COUNT(*) AS cantidad
-        FROM gastos WHERE fecha BETWEEN ? AND ?
-    """, (fecha_desde, fecha_hasta)).fetchone()
+    gas = conn.execute(f"""
+        SELECT COALESCE(SUM(total), 0) AS total, COALESCE(SUM(cantidad), 0) AS cantidad
+        FROM agg_gastos_diarios WHERE {entre('dia')}
+    """, rango).fetchone()
 
-    categorias = conn.execute("""
+    categorias = conn.execute(f"""
         SELECT cg.nombre AS categoria,
-               COALESCE(SUM(g.monto), 0) AS total,
-               COUNT(*) AS cantidad
-        FROM gastos g
+               COALESCE(SUM(g.total), 0) AS total,
+               SUM(g.cantidad) AS cantidad
+        FROM agg_gastos_diarios g
         JOIN categorias_gasto cg ON g.categoria_id = cg.id
-        WHERE g.fecha BETWEEN ? AND ?
+        WHERE {entre('g.dia')}
         GROUP BY cg.nombre
         ORDER BY total DESC
-    """, (fecha_desde, fecha_hasta)).fetchall()
+    """, rango).fetchall()
 
-    ultimas_ventas = conn.execute("""
+    ultimas_ventas = conn.execute(f"""
         SELECT v.id, v.fecha, c.nombre AS cliente, v.total, v.metodo_pago
         FROM ventas v
         JOIN clientes c ON v.cliente_id = c.id
-        WHERE v.fecha BETWEEN ? AND ?
+        WHERE {entre('v.fecha')}
           AND (v.estado IS NULL OR v.estado != 'cancelada')
         ORDER BY v.total DESC
         LIMIT 15
-    """, (fecha_desde, fecha_hasta)).fetchall()
+    """, rango).fetchall()
 
     conn.close()
 
@@ -99,35 +109,22 @@ def get_resumen_mes(year, month):
 
 # ── Evolución 12 meses ────────────────────────────────────────────────────────
 
+@memo('ventas', 'gastos')
 def get_evolucion_12meses(year, month):
-    months_list = []
-    for i in range(11, -1, -1):
-        m = month - i
-        y = year
-        while m <= 0:
-            m += 12
-            y -= 1
-        months_list.append((y, m))
-
-    ini_y, ini_m   = months_list[0]
-    fin_y, fin_m   = months_list[-1]
-    fecha_desde_t  = f"{ini_y}-{ini_m:02d}-01"
-    last_day_fin   = calendar.monthrange(fin_y, fin_m)[1]
-    fecha_hasta_t  = f"{fin_y}-{fin_m:02d}-{last_day_fin}"
-
-    conn = get_conn()
-    ventas_rows = conn.execute("""
-        SELECT strftime('%Y-%m', fecha) AS mes, COALESCE(SUM(total), 0) AS total
-        FROM ventas WHERE fecha BETWEEN ? AND ?
-          AND (estado IS NULL OR estado != 'cancelada')
+    months_list, desde, hasta = meses_hasta(year, month)
+
+    conn = get_conn_lectura()
+    ventas_rows = conn.execute(f"""
+        SELECT substr(dia, 1, 7) AS mes, COALESCE(SUM(total), 0) AS total
+        FROM agg_ventas_diarias WHERE {entre('dia')}
         GROUP BY mes
-    """, (fecha_desde_t, fecha_hasta_t)).fetchall()
+    """, (desde, hasta)).fetchall()
 
-    gastos_rows = conn.execute("""
-        SELECT strftime('%Y-%m', fecha) AS mes, COALESCE(SUM(monto), 0) AS total
-        FROM gastos WHERE fecha BETWEEN ? AND ?
+    gastos_rows = conn.execute(f"""
+        SELECT substr(dia, 1, 7) AS mes, COALESCE(SUM(total), 0) AS total
+        FROM agg_gastos_diarios WHERE {entre('dia')}
         GROUP BY mes
-    """, (fecha_desde_t, fecha_hasta_t)).fetchall()
+    """, (desde, hasta)).fetchall()
     conn.close()
 
     ventas_dict = {r['mes']: r['total'] for r in ventas_rows}
@@ -245,7 +242,28 @@ def exportar_excel(year, month):
 
 # ── Exportar PDF ──────────────────────────────────────────────────────────────
 
-def exportar_pdf(year, month, empresa='Comenda Deco'):
+def datos_pdf(year, month, empresa='Comenda Deco'):
+    """Todo lo que muestra el PDF del resumen, sin objetos de la base (se
+    manda a otro proceso y se hashea para la caché de services/pdf_pool)."""
+    # Sin las filas sqlite3.Row de ultimas_ventas, que el PDF no muestra (copia:
+    # el resultado de get_resumen_mes se comparte, ver services/reportes_cache)
+    # Se lee antes que los datos, igual que la versión en reportes_cache.memo
+    datos_al = actualizado_en('ventas', 'gastos')
+    data = {k: v for k, v in get_resumen_mes(year, month).items() if k != 'ultimas_ventas'}
+    return {
+        'year':     year,
+        'month':    month,
+        'empresa':  empresa,
+        'data':     data,
+        'evol':     get_evolucion_12meses(year, month),
+        'datos_al': datos_al,
+    }
+
+
+def render_pdf(datos):
+    """Bytes del PDF a partir de datos_pdf (no toca la base). El pie lleva el
+    momento del último cambio de los datos, no el de generación: services/pdf_pool
+    reusa el PDF mientras los datos no cambien."""
     from reportlab.lib import colors
     from reportlab.lib.pagesizes import A4
     from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
@@ -253,8 +271,8 @@ def exportar_pdf(year, month, empresa='Comenda Deco'):
     from reportlab.platypus import (Paragraph, SimpleDocTemplate, Spacer,
                                     Table, TableStyle)
 
-    data = get_resumen_mes(year, month)
-    evol = get_evolucion_12meses(year, month)
+    year, month, empresa = datos['year'], datos['month'], datos['empresa']
+    data, evol = datos['data'], datos['evol']
 
     buf = BytesIO()
     doc = SimpleDocTemplate(buf, pagesize=A4,
@@ -333,11 +351,9 @@ def exportar_pdf(year, month, empresa='Comenda Deco'):
     t_evol.setStyle(_table_style())
     story.append(t_evol)
 
-    story.append(Spacer(1, 0.5*cm))
-    story.append(Paragraph(
-        f"Generado el {datetime.now().strftime('%d/%m/%Y %H:%M')}", foot_st
-    ))
+    if datos['datos_al']:
+        story.append(Spacer(1, 0.5*cm))
+        story.append(Paragraph(f"Datos actualizados al {_fecha_hora(datos['datos_al'])}", foot_st))
 
     doc.build(story)
-    buf.seek(0)
-    return buf
+    return buf.getvalue()
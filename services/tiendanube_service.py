@@ -1,104 +1,214 @@
 # services/tiendanube_service.py
 import logging
 import os
-import sqlite3
+from datetime import datetime
 
 import requests
-from dotenv import load_dotenv
 
-load_dotenv()
+from db import get_conn
+from services import tn_client
+from services.tn_client import STORE_ID, TOKEN  # noqa: F401  (re-export)
 
 logger = logging.getLogger(__name__)
 
-TOKEN = os.getenv("TN_ACCESS_TOKEN")
-STORE_ID = os.getenv("TN_STORE_ID")
 
-# Ruta absoluta a la DB (services/ está un nivel dentro del proyecto)
-_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-_DB_PATH = os.path.join(_BASE_DIR, 'negocio.db')
-
-
-def _get_conn():
-    conn = sqlite3.connect(_DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# ==========================================
+# IMPORTAR PRODUCTOS DESDE TIENDANUBE
+# ==========================================
 
+# Tamaño de página de GET /products (200 es el máximo que admite TN)
+POR_PAGINA_PRODUCTOS = int(os.getenv("TN_POR_PAGINA", "200") or "200")
+_CLAVE_MARCA_PRODUCTOS = "productos_updated_at"
+
+_SQL_UPSERT_PRODUCTO = """
+    INSERT INTO productos
+    (sku, descripcion, precio, stock, variant_id, product_id,
+     promotional_price, barcode, imagen_url)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(sku) DO UPDATE SET
+        descripcion       = excluded.descripcion,
+        precio            = excluded.precio,
+        stock             = excluded.stock,
+        variant_id        = excluded.variant_id,
+        product_id        = excluded.product_id,
+        promotional_price = excluded.promotional_price,
+        barcode           = excluded.barcode,
+        imagen_url        = excluded.imagen_url
+"""
+
+
+class ErrorTN(Exception):
+    """Falla de red o respuesta inesperada de la API de TiendaNube."""
+
+
+def _paginas_productos(desde=None):
+    """Genera las páginas de GET /products (listas de productos) de a una.
+
+    Con `desde` solo pide los productos modificados a partir de ese updated_at.
+    """
+    params = {"per_page": POR_PAGINA_PRODUCTOS, "page": 1}
+    if desde:
+        params["updated_at_min"] = desde
+
+    while True:
+        try:
+            response = tn_client.get("products", endpoint="products", params=params)
+        except requests.RequestException as e:
+            raise ErrorTN(str(e)) from e
+        # Pasada la última página TN responde 404 ("Last page is N")
+        if response.status_code == 404 and params["page"] > 1:
+            return
+        if response.status_code != 200:
+            raise ErrorTN(f"TiendaNube respondió {response.status_code}: {response.text}")
+
+        productos = response.json()
+        if productos:
+            yield productos
+        if len(productos) < POR_PAGINA_PRODUCTOS:
+            return
+        params["page"] += 1
+
+
+def _filas_producto(p):
+    """Filas para _SQL_UPSERT_PRODUCTO, una por variante del producto TN."""
+    nombre = p["name"].get("es") or list(p["name"].values())[0]
+    imagen_url = None
+    if p.get("images"):
+        for img in p["images"]:
+            if str(img.get("product_id")) == str(p.get("id")):
+                imagen_url = img.get("src")
+                break
+
+    for variante in p.get("variants", []):
+        variant_id = str(variante.get("id"))
+        sku = variante.get("sku") or f"TN_{variant_id}"
+        precio = float(variante.get("price") or 0)
+        stock_raw = variante.get("stock")
+        product_id = str(variante.get("product_id"))
+        p_price = variante.get("promotional_price")
+        promotional_price = float(p_price) if p_price is not None else None
+        barcode = variante.get("barcode") or ""
+        stock = int(stock_raw) if stock_raw is not None else None
+        yield (sku, nombre, precio, stock, variant_id, product_id,
+               promotional_price, barcode, imagen_url)
+
+
+def _leer_marca(conn, clave):
+    row = conn.execute("SELECT valor FROM tn_sync_estado WHERE clave = ?", (clave,)).fetchone()
+    return row["valor"] if row else None
+
+
+def _guardar_marca(conn, clave, valor):
+    conn.execute("""
+        INSERT INTO tn_sync_estado (clave, valor, actualizado_en)
+        VALUES (?, ?, ?)
+        ON CONFLICT(clave) DO UPDATE SET
+            valor = excluded.valor, actualizado_en = excluded.actualizado_en
+    """, (clave, valor, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+
+def importar_productos_tn(completo=False):
+    """Importa el catálogo de TN página por página.
+
+    Por defecto es incremental: solo trae lo modificado desde el updated_at
+    más reciente del import anterior. completo=True recorre todo el catálogo.
+    Cada página se guarda con un executemany y su propio commit; la marca
+    solo avanza si se recorrieron todas las páginas.
+    """
+    conn = get_conn()
+    try:
+        desde = None if completo else _leer_marca(conn, _CLAVE_MARCA_PRODUCTOS)
+        marca = desde
+        count = 0
+        for pagina in _paginas_productos(desde):
+            filas = [f for p in pagina for f in _filas_producto(p)]
+            conn.executemany(_SQL_UPSERT_PRODUCTO, filas)
+            conn.commit()
+            count += len(filas)
+            # Formato ISO con el mismo huso en todos: se comparan como texto
+            for p in pagina:
+                if p.get("updated_at") and (marca is None or p["updated_at"] > marca):
+                    marca = p["updated_at"]
+
+        if marca and marca != desde:
+            _guardar_marca(conn, _CLAVE_MARCA_PRODUCTOS, marca)
+            conn.commit()
+    except ErrorTN as e:
+        logger.error("Error importando productos de TiendaNube: %s", e)
+        return {"ok": False, "error": str(e)}
+    finally:
+        conn.close()
 
-_HEADERS = {
-    "Authentication": f"bearer {TOKEN}",
-    "User-Agent": "Comenda App (mateopatatian@gmail.com)",
-    "Content-Type": "application/json",
-}
+    logger.info("Importación completada: %d productos sincronizados (desde %s)", count, desde or "el inicio")
+    return {"ok": True, "mensaje": f"{count} productos sincronizados correctamente 🚀"}
 
 
 # ==========================================
-# IMPORTAR PRODUCTOS DESDE TIENDANUBE
+# PATCH products/stock-price
 # ==========================================
 
-def importar_productos_tn():
-    headers = {
-        "Authentication": f"bearer {TOKEN}",
-        "User-Agent": "Comenda App (mateopatatian@gmail.com)",
-    }
-
-    url = f"https://api.tiendanube.com/v1/{STORE_ID}/products"
+def _patch_stock_price(data, que):
+    """PATCH al endpoint stock-price. Devuelve {"ok": bool, "error"?: str}."""
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = tn_client.patch("products/stock-price", endpoint="stock_price",
+                                   version="2025-03", json=data)
     except requests.RequestException as e:
-        logger.error("Error conectando con TiendaNube: %s", e)
+        logger.error("Error actualizando %s en TN: %s", que, e)
         return {"ok": False, "error": str(e)}
 
-    if response.status_code != 200:
-        logger.error("TiendaNube respondió %s: %s", response.status_code, response.text)
+    if response.status_code not in (200, 204):
+        logger.error("Error actualizando %s en TN: %s", que, response.text)
         return {"ok": False, "error": response.text}
-
-    productos = response.json()
-    conn = _get_conn()
-    cursor = conn.cursor()
-    count = 0
-
-    for p in productos:
-        nombre = p["name"].get("es") or list(p["name"].values())[0]
-        imagen_url = None
-        if p.get("images"):
-            for img in p["images"]:
-                if str(img.get("product_id")) == str(p.get("id")):
-                    imagen_url = img.get("src")
-                    break
-
-        for variante in p.get("variants", []):
-            variant_id = str(variante.get("id"))
-            sku = variante.get("sku") or f"TN_{variant_id}"
-            precio = float(variante.get("price") or 0)
-            stock_raw = variante.get("stock")
-            product_id = str(variante.get("product_id"))
-            p_price = variante.get("promotional_price")
-            promotional_price = float(p_price) if p_price is not None else None
-            barcode = variante.get("barcode") or ""
-            stock = int(stock_raw) if stock_raw is not None else None
-
-            cursor.execute("""
-                INSERT INTO productos
-                (sku, descripcion, precio, stock, variant_id, product_id,
-                 promotional_price, barcode, imagen_url)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(sku) DO UPDATE SET
-                    descripcion       = excluded.descripcion,
-                    precio            = excluded.precio,
-                    stock             = excluded.stock,
-                    variant_id        = excluded.variant_id,
-                    product_id        = excluded.product_id,
-                    promotional_price = excluded.promotional_price,
-                    barcode           = excluded.barcode,
-                    imagen_url        = excluded.imagen_url
-            """, (sku, nombre, precio, stock, variant_id, product_id,
-                  promotional_price, barcode, imagen_url))
-            count += 1
-
-    conn.commit()
-    conn.close()
-    logger.info("Importación completada: %d productos sincronizados", count)
-    return {"ok": True, "mensaje": f"{count} productos sincronizados correctamente 🚀"}
+    return {"ok": True}
+
+
+# Máximo de variantes que acepta un PATCH a products/stock-price
+MAX_VARIANTES_STOCK_PRICE = int(os.getenv("TN_MAX_VARIANTES_PATCH", "50") or "50")
+
+
+def _lotes_stock_price(cambios):
+    """Agrupa cambios por producto y los parte en lotes de a lo sumo
+    MAX_VARIANTES_STOCK_PRICE variantes. Devuelve [(data, [variant_id, ...])].
+    """
+    por_producto = {}
+    for c in cambios:
+        variant_id = int(c["variant_id"])
+        variante = por_producto.setdefault(int(c["product_id"]), {}).setdefault(
+            variant_id, {"id": variant_id}
+        )
+        if c.get("stock") is not None:
+            variante["inventory_levels"] = [{"stock": c["stock"]}]
+        if c.get("precio") is not None:
+            variante["price"] = str(c["precio"])
+
+    lotes, data, variant_ids = [], [], []
+    for product_id, variantes in por_producto.items():
+        variantes = list(variantes.values())
+        while variantes:
+            lugar = MAX_VARIANTES_STOCK_PRICE - len(variant_ids)
+            tramo, variantes = variantes[:lugar], variantes[lugar:]
+            data.append({"id": product_id, "variants": tramo})
+            variant_ids.extend(v["id"] for v in tramo)
+            if len(variant_ids) >= MAX_VARIANTES_STOCK_PRICE:
+                lotes.append((data, variant_ids))
+                data, variant_ids = [], []
+    if data:
+        lotes.append((data, variant_ids))
+    return lotes
+
+
+def enviar_stock_precio_lote(cambios):
+    """Envía stock y/o precio de muchas variantes en la menor cantidad de PATCH.
+
+    cambios: iterable de dicts {product_id, variant_id, stock?, precio?}.
+    No toca la base local. Devuelve [(variant_ids, resultado)] por cada PATCH.
+    """
+    resultados = []
+    for data, variant_ids in _lotes_stock_price(cambios):
+        resultados.append((variant_ids, _patch_stock_price(data, "stock/precio")))
+    logger.info("TN stock-price: %d variantes en %d llamadas",
+                sum(len(v) for v, _ in resultados), len(resultados))
+    return resultados
 
 
 # ==========================================
@@ -106,7 +216,7 @@ def importar_productos_tn():
 # ==========================================
 
 def actualizar_stock_tn_service(variant_id, nuevo_stock):
-    conn = _get_conn()
+    conn = get_conn()
     row = conn.execute(
         "SELECT product_id FROM productos WHERE variant_id = ?", (variant_id,)
     ).fetchone()
@@ -118,7 +228,6 @@ def actualizar_stock_tn_service(variant_id, nuevo_stock):
 
     product_id = row["product_id"]
 
-    url = f"https://api.tiendanube.com/2025-03/{STORE_ID}/products/stock-price"
     data = [{
         "id": int(product_id),
         "variants": [{
@@ -126,18 +235,11 @@ def actualizar_stock_tn_service(variant_id, nuevo_stock):
             "inventory_levels": [{"stock": nuevo_stock}]
         }]
     }]
+    resultado = _patch_stock_price(data, "stock")
+    if not resultado["ok"]:
+        return resultado
 
-    try:
-        response = requests.patch(url, json=data, headers=_HEADERS, timeout=10)
-    except requests.RequestException as e:
-        logger.error("Error actualizando stock en TN: %s", e)
-        return {"ok": False, "error": str(e)}
-
-    if response.status_code not in (200, 204):
-        logger.error("Error actualizando stock en TN: %s", response.text)
-        return {"ok": False, "error": response.text}
-
-    conn = _get_conn()
+    conn = get_conn()
     conn.execute(
         "UPDATE productos SET stock = ? WHERE variant_id = ?", (nuevo_stock, variant_id)
     )
@@ -147,30 +249,3 @@ def actualizar_stock_tn_service(variant_id, nuevo_stock):
     logger.info("Stock actualizado: variant_id=%s, stock=%s", variant_id, nuevo_stock)
     return {"ok": True, "mensaje": "Stock actualizado correctamente"}
 
-
-# ==========================================
-# ACTUALIZAR PRECIO EN TIENDANUBE
-# ==========================================
-
-def actualizar_precio_tn_service(variant_id, product_id, nuevo_precio):
-    url = f"https://api.tiendanube.com/2025-03/{STORE_ID}/products/stock-price"
-    data = [{
-        "id": int(product_id),
-        "variants": [{
-            "id": int(variant_id),
-            "price": str(nuevo_precio)
-        }]
-    }]
-
-    try:
-        response = requests.patch(url, json=data, headers=_HEADERS, timeout=10)
-    except requests.RequestException as e:
-        logger.error("Error actualizando precio en TN: %s", e)
-        return {"ok": False, "error": str(e)}
-
-    if response.status_code not in (200, 204):
-        logger.error("Error actualizando precio en TN: %s", response.text)
-        return {"ok": False, "error": response.text}
-
-    logger.info("Precio actualizado: variant_id=%s, precio=%s", variant_id, nuevo_precio)
-    return {"ok": True, "mensaje": "Precio actualizado en TiendaNube"}
@@ -0,0 +1,114 @@
+# services/tn_client.py
+"""Cliente HTTP compartido para la API de TiendaNube.
+
+Una sola requests.Session por proceso: las llamadas reutilizan conexiones
+keep-alive en lugar de pagar TCP + TLS cada vez. Ante un 429 se espera lo
+que indique Retry-After (o x-rate-limit-reset) y se pausa a todos los hilos.
+"""
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.tiendanube import TN_CONFIG, TN_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+TOKEN    = TN_CONFIG['token']
+STORE_ID = TN_CONFIG['store_id']
+
+_session = None
+_session_lock = threading.Lock()
+_pausa_lock = threading.Lock()
+_pausa_hasta = 0.0  # time.monotonic() hasta el que no se envían llamadas
+
+
+def configurado():
+    return bool(TOKEN and STORE_ID)
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=TN_CONFIG['pool_maxsize'])
+            s.mount('https://', adapter)
+            s.mount('http://', adapter)
+            s.headers.update({
+                "Authentication": f"bearer {TOKEN}",
+                "User-Agent":     TN_CONFIG['user_agent'],
+                "Content-Type":   "application/json",
+            })
+            _session = s
+        return _session
+
+
+def url(path, version='v1'):
+    return f"{TN_CONFIG['api_base']}/{version}/{STORE_ID}/{path.lstrip('/')}"
+
+
+def _espera_429(response):
+    """Segundos a esperar según Retry-After o x-rate-limit-reset (en ms)."""
+    retry_after = response.headers.get('Retry-After')
+    reset_ms    = response.headers.get('x-rate-limit-reset')
+    try:
+        if retry_after is not None:
+            espera = float(retry_after)
+        elif reset_ms is not None:
+            espera = float(reset_ms) / 1000
+        else:
+            espera = 1.0
+    except ValueError:
+        espera = 1.0
+    return min(max(espera, 0.0), TN_CONFIG['espera_429_max'])
+
+
+def _esperar_pausa():
+    restante = _pausa_hasta - time.monotonic()
+    if restante > 0:
+        time.sleep(restante)
+
+
+def _pausar(segundos):
+    global _pausa_hasta
+    with _pausa_lock:
+        _pausa_hasta = max(_pausa_hasta, time.monotonic() + segundos)
+
+
+def request(metodo, path, endpoint='default', version='v1', **kwargs):
+    """Llamada a la API de TN. Devuelve el Response (como requests).
+
+    Lanza requests.RequestException ante errores de red. `endpoint` elige el
+    timeout de TN_TIMEOUTS.
+    """
+    kwargs.setdefault('timeout', TN_TIMEOUTS.get(endpoint, TN_TIMEOUTS['default']))
+    destino = url(path, version)
+    session = get_session()
+    for intento in range(TN_CONFIG['reintentos_429'] + 1):
+        _esperar_pausa()
+        response = session.request(metodo, destino, **kwargs)
+        if response.status_code != 429 or intento == TN_CONFIG['reintentos_429']:
+            return response
+        espera = _espera_429(response)
+        logger.warning("TN 429 en %s %s: reintento en %.1fs", metodo, path, espera)
+        _pausar(espera)
+    return response
+
+
+def get(path, **kwargs):
+    return request('GET', path, **kwargs)
+
+
+def post(path, **kwargs):
+    return request('POST', path, **kwargs)
+
+
+def patch(path, **kwargs):
+    return request('PATCH', path, **kwargs)
+
+
+def delete(path, **kwargs):
+    return request('DELETE', path, **kwargs)
@@ -0,0 +1,229 @@
+# services/tn_outbox_service.py
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from db import get_conn
+from services import tiendanube_service as tn
+
+logger = logging.getLogger(__name__)
+
+TIPOS_SYNC = ('stock', 'precio')
+MAX_INTENTOS = 10
+BACKOFF_BASE_SEG = 30
+BACKOFF_MAX_SEG = 3600
+INTERVALO_SEG = float(os.getenv('TN_OUTBOX_INTERVALO', '2') or '2')
+LOTE = 200
+# Filas 'procesando' más viejas que esto se consideran de un worker caído
+PROCESANDO_VENCIDO_MIN = 10
+
+
+def _ahora():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _backoff(intentos):
+    return min(BACKOFF_BASE_SEG * 2 ** max(intentos - 1, 0), BACKOFF_MAX_SEG)
+
+
+# ── Encolar ──────────────────────────────────────────────────────────────────
+
+def encolar_sync_tn_en_conn(conn, producto_id, tipos=('stock',)):
+    """Encola la sincronización con TN usando una conexión existente (sin commit).
+    Llamar dentro del mismo try/commit que el cambio de stock o precio.
+
+    Solo encola productos vinculados (con variant_id). Si ya hay un pendiente
+    para el mismo producto y tipo no se duplica: el worker envía el valor vigente.
+    """
+    ahora = _ahora()
+    for tipo in tipos:
+        conn.execute(
+            """INSERT INTO tn_outbox (producto_id, tipo, proximo_intento, creado_en)
+               SELECT id, ?, ?, ? FROM productos
+               WHERE id = ? AND variant_id IS NOT NULL AND variant_id != ''
+               ON CONFLICT(producto_id, tipo) WHERE estado = 'pendiente' DO NOTHING""",
+            (tipo, ahora, ahora, producto_id)
+        )
+
+
+# ── Procesar ─────────────────────────────────────────────────────────────────
+
+def _rescatar_vencidos(conn):
+    limite = (datetime.now() - timedelta(minutes=PROCESANDO_VENCIDO_MIN)).strftime('%Y-%m-%d %H:%M:%S')
+    conn.execute("""
+        UPDATE tn_outbox SET estado = 'reemplazado'
+        WHERE estado = 'procesando' AND procesado_en < ?
+          AND EXISTS (SELECT 1 FROM tn_outbox o2
+                      WHERE o2.producto_id = tn_outbox.producto_id
+                        AND o2.tipo = tn_outbox.tipo AND o2.estado = 'pendiente')
+    """, (limite,))
+    conn.execute(
+        "UPDATE tn_outbox SET estado = 'pendiente' WHERE estado = 'procesando' AND procesado_en < ?",
+        (limite,)
+    )
+
+
+def _tomar_lote(limite):
+    """Marca como 'procesando' hasta `limite` filas vencidas y las devuelve."""
+    conn = get_conn()
+    try:
+        _rescatar_vencidos(conn)
+        ahora = _ahora()
+        filas = conn.execute("""
+            SELECT id, producto_id, tipo, intentos FROM tn_outbox
+            WHERE estado = 'pendiente' AND proximo_intento <= ?
+            ORDER BY id LIMIT ?
+        """, (ahora, limite)).fetchall()
+        tomadas = []
+        for f in filas:
+            cur = conn.execute(
+                "UPDATE tn_outbox SET estado = 'procesando', procesado_en = ?"
+                " WHERE id = ? AND estado = 'pendiente'",
+                (ahora, f['id'])
+            )
+            if cur.rowcount:
+                tomadas.append(f)
+        conn.commit()
+        return tomadas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _registrar_resultado(filas, resultado):
+    conn = get_conn()
+    try:
+        ahora = _ahora()
+        for f in filas:
+            if resultado.get('ok'):
+                conn.execute(
+                    "UPDATE tn_outbox SET estado = 'enviado', procesado_en = ?, ultimo_error = NULL"
+                    " WHERE id = ?", (ahora, f['id'])
+                )
+                continue
+            intentos = f['intentos'] + 1
+            error    = str(resultado.get('error') or '')[:500]
+            if intentos >= MAX_INTENTOS:
+                logger.error("TN outbox: producto %s (%s) descartado tras %s intentos: %s",
+                             f['producto_id'], f['tipo'], intentos, error)
+                conn.execute(
+                    "UPDATE tn_outbox SET estado = 'fallido', intentos = ?, ultimo_error = ?"
+                    " WHERE id = ?", (intentos, error, f['id'])
+                )
+                continue
+            proximo = (datetime.now() + timedelta(seconds=_backoff(intentos))).strftime('%Y-%m-%d %H:%M:%S')
+            try:
+                conn.execute(
+                    "UPDATE tn_outbox SET estado = 'pendiente', intentos = ?, ultimo_error = ?,"
+                    " proximo_intento = ? WHERE id = ?",
+                    (intentos, error, proximo, f['id'])
+                )
+            except sqlite3.IntegrityError:
+                # Ya se encoló un cambio más nuevo para el mismo producto: ese lo cubre
+                conn.execute(
+                    "UPDATE tn_outbox SET estado = 'reemplazado', ultimo_error = ? WHERE id = ?",
+                    (error, f['id'])
+                )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _enviar_lote(filas):
+    """Envía stock/precio vigentes de los productos del lote en PATCH agrupados."""
+    por_producto = {}
+    for f in filas:
+        por_producto.setdefault(f['producto_id'], []).append(f)
+
+    ids  = list(por_producto)
+    conn = get_conn()
+    productos = conn.execute(
+        "SELECT id, variant_id, product_id, stock, precio FROM productos"
+        f" WHERE id IN ({','.join('?' * len(ids))})", ids
+    ).fetchall()
+    conn.close()
+
+    cambios, filas_por_variante, sin_vincular = [], {}, []
+    encontrados = {p['id']: p for p in productos}
+    for producto_id, grupo in por_producto.items():
+        prod = encontrados.get(producto_id)
+        if not prod or not prod['variant_id'] or not prod['product_id']:
+            sin_vincular.extend(grupo)  # desvinculado: nada que sincronizar
+            continue
+        tipos = {f['tipo'] for f in grupo}
+        cambios.append({
+            'product_id': prod['product_id'],
+            'variant_id': prod['variant_id'],
+            'stock':      prod['stock'] if 'stock' in tipos else None,
+            'precio':     prod['precio'] if 'precio' in tipos else None,
+        })
+        filas_por_variante[int(prod['variant_id'])] = grupo
+
+    if sin_vincular:
+        _registrar_resultado(sin_vincular, {'ok': True})
+    if not cambios:
+        return
+
+    try:
+        resultados = tn.enviar_stock_precio_lote(cambios)
+    except Exception as e:
+        logger.exception("TN outbox: error enviando lote")
+        resultados = [(list(filas_por_variante), {'ok': False, 'error': str(e)})]
+    for variant_ids, resultado in resultados:
+        _registrar_resultado(
+            [f for v in variant_ids for f in filas_por_variante.get(v, [])], resultado
+        )
+
+
+def procesar_outbox_tn(limite=LOTE):
+    """Procesa un lote de la cola. Devuelve cuántas filas se tomaron."""
+    if not tn.TOKEN or not tn.STORE_ID:
+        return 0
+    filas = _tomar_lote(limite)
+    if filas:
+        _enviar_lote(filas)
+    return len(filas)
+
+
+# ── Worker en segundo plano ──────────────────────────────────────────────────
+
+_despertar = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def notificar_outbox_tn():
+    """Despierta al worker (llamar después del commit que encoló)."""
+    _despertar.set()
+
+
+def _loop_worker():
+    while True:
+        _despertar.wait(INTERVALO_SEG)
+        _despertar.clear()
+        try:
+            while procesar_outbox_tn() == LOTE:
+                pass
+        except Exception:
+            logger.exception("TN outbox: error en el worker")
+
+
+def iniciar_worker_outbox_tn():
+    """Arranca (una vez por proceso) el hilo que vacía la cola hacia TN."""
+    global _worker
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive():
+            return _worker
+        if not tn.TOKEN or not tn.STORE_ID:
+            logger.info("TN outbox: TN_ACCESS_TOKEN / TN_STORE_ID sin configurar, worker no iniciado")
+            return None
+        _worker = threading.Thread(target=_loop_worker, name='tn-outbox', daemon=True)
+        _worker.start()
+        return _worker
@@ -0,0 +1,461 @@
+# services/tn_webhook_service.py
+"""Procesamiento de los webhooks de TiendaNube.
+
+El endpoint solo encola (order_id, evento) y responde 200; un pool de hilos
+toma los eventos de tn_webhook_eventos, consulta la orden y la aplica. Todo
+el procesamiento es idempotente: reintentar un evento no duplica ventas.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+import requests
+
+from db import get_conn
+from services import agregados_service, dashboard_service, tn_client
+
+logger = logging.getLogger(__name__)
+
+EVENTOS = ('order/paid', 'order/cancelled', 'order/updated')
+MAX_INTENTOS = 8
+BACKOFF_BASE_SEG = 15
+BACKOFF_MAX_SEG = 1800
+INTERVALO_SEG = float(os.getenv('TN_WEBHOOK_INTERVALO', '5') or '5')
+# Filas 'procesando' más viejas que esto se consideran de un worker caído
+PROCESANDO_VENCIDO_MIN = 10
+
+
+def _ahora():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _backoff(intentos):
+    return min(BACKOFF_BASE_SEG * 2 ** max(intentos - 1, 0), BACKOFF_MAX_SEG)
+
+
+class _Reintentar(Exception):
+    """El evento no se pudo aplicar todavía (p. ej. TN no respondió)."""
+
+
+# ── Aplicar órdenes ──────────────────────────────────────────────────────────
+
+def _cancelar_venta_por_orden(order_id):
+    """Cancela la venta local correspondiente a una orden de Tiendanube.
+
+    Mismo flujo que la cancelación manual: estado → stock → caja → auditoría,
+    todo en un único commit. Si la venta no existe o ya está cancelada, no hace nada.
+    """
+    conn = get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        venta = conn.execute(
+            "SELECT id, fecha, total, estado, metodo_pago FROM ventas WHERE order_id = ?",
+            (str(order_id),)
+        ).fetchone()
+
+        if not venta:
+            logger.info("Cancelación TN: orden %s no existe en el sistema, ignorando", order_id)
+            conn.rollback()
+            return
+
+        if venta['estado'] == 'cancelada':
+            logger.info("Cancelación TN: venta #%s (orden %s) ya está cancelada, ignorando",
+                        venta['id'], order_id)
+            conn.rollback()
+            return
+
+        venta_id = venta['id']
+
+        items = conn.execute(
+            "SELECT producto_id, cantidad FROM detalle_venta WHERE venta_id = ?",
+            (venta_id,)
+        ).fetchall()
+
+        conn.execute(
+            "UPDATE ventas SET estado = 'cancelada', motivo_cancelacion = ? WHERE id = ?",
+            ("Cancelación automática por Tiendanube", venta_id)
+        )
+        for item in items:
+            conn.execute(
+                "UPDATE productos SET stock = stock + ? WHERE id = ?",
+                (item['cantidad'], item['producto_id'])
+            )
+
+        from services.caja_service import registrar_movimiento_en_conn
+        registrar_movimiento_en_conn(
+            conn, 'egreso', 'cancelacion', venta_id,
+            f"Cancelación automática Tienda Nube #{order_id}",
+            venta['total'], venta['metodo_pago']
+        )
+        agregados_service.refrescar_ventas_en_conn(conn, venta['fecha'])
+
+        conn.commit()
+        dashboard_service.venta_cancelada(venta_id, venta['fecha'], venta['total'])
+        logger.info("Venta #%s (orden TN %s) cancelada automáticamente, stock revertido", venta_id, order_id)
+
+        try:
+            from services.usuarios_service import registrar_auditoria
+            registrar_auditoria(
+                None, 'tiendanube',
+                'cancelar_venta', 'ventas',
+                detalle=f"Venta #{venta_id} cancelada automáticamente por Tiendanube. "
+                        f"Orden TN: {order_id}. Total: ${venta['total']:.2f}."
+            )
+        except Exception:
+            pass
+
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _fetch_order(order_id):
+    """Obtiene la orden desde la API de Tiendanube. Devuelve el dict o None."""
+    if not tn_client.configurado():
+        logger.error("Variables de entorno TN_STORE_ID / TN_ACCESS_TOKEN no configuradas")
+        return None
+    try:
+        r = tn_client.get(f"orders/{order_id}", endpoint="orders")
+    except requests.RequestException as e:
+        logger.error("Error conectando con TiendaNube para orden %s: %s", order_id, e)
+        return None
+    if r.status_code != 200:
+        logger.error("Error obteniendo orden %s: status %s - %s", order_id, r.status_code, r.text)
+        return None
+    return r.json()
+
+
+def obtener_o_crear_cliente(cursor, order):
+    customer = order.get("customer") or {}
+    if not isinstance(customer, dict):
+        customer = {}
+
+    nombre = str(customer.get("name") or "").strip()
+    email = str(customer.get("email") or order.get("contact_email") or "").strip()
+    telefono = str(customer.get("phone") or order.get("contact_phone") or "").strip()
+    dni = str(customer.get("identification") or "").strip()
+
+    if not nombre:
+        nombre = "Consumidor Final (TN)"
+
+    logger.info("Comprador: %s | DNI: %s | Email: %s", nombre, dni, email)
+
+    # Una sola consulta: primero el que coincide por DNI, si no por email
+    cliente_row = None
+    if dni or email:
+        cursor.execute("""
+            SELECT id FROM clientes WHERE dni = ? OR email = ?
+            ORDER BY (dni = ?) DESC, id LIMIT 1
+        """, (dni or None, email or None, dni or None))
+        cliente_row = cursor.fetchone()
+
+    if cliente_row:
+        logger.info("Cliente existente: id=%s", cliente_row['id'])
+        return cliente_row["id"]
+
+    cursor.execute("""
+        INSERT INTO clientes (nombre, telefono, dni, email, tipo)
+        VALUES (?, ?, ?, ?, 0)
+    """, (nombre, telefono, dni or None, email or None))
+    nuevo_id = cursor.lastrowid
+    logger.info("Nuevo cliente creado: id=%s, nombre=%s", nuevo_id, nombre)
+    return nuevo_id
+
+
+def _registrar_venta_por_orden(order_id, order):
+    """Registra la venta de una orden pagada. No hace nada si ya existe."""
+    conn = get_conn()
+    try:
+        # IMMEDIATE: la verificación y el alta quedan dentro del mismo lock de escritura
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT id FROM ventas WHERE order_id = ?", (str(order_id),))
+        if cursor.fetchone():
+            logger.info("Orden ya procesada: %s", order_id)
+            conn.rollback()
+            return
+
+        cliente_id = obtener_o_crear_cliente(cursor, order)
+
+        fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        total = float(order.get("total", 0))
+
+        cursor.execute("""
+            INSERT INTO ventas (fecha, cliente_id, total, metodo_pago, cuotas, order_id,
+                                subtotal, monto_pagado)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (fecha, cliente_id, total, "Tienda Nube", None, str(order_id), total, total))
+
+        venta_id = cursor.lastrowid
+
+        items = []
+        for item in order.get("products", []):
+            sku = item.get("sku")
+            cantidad = int(item.get("quantity") or 0)
+            precio_unitario = float(item.get("price") or 0)
+
+            if not sku or cantidad == 0:
+                logger.warning("Producto sin SKU o cantidad 0 en orden %s, omitido", order_id)
+                continue
+            items.append((sku, cantidad, precio_unitario))
+
+        # Todos los SKU de la orden en una consulta; el stock se controla en memoria
+        skus = list({sku for sku, _, _ in items})
+        productos = {}
+        if skus:
+            cursor.execute(
+                f"SELECT id, sku, stock, costo FROM productos WHERE sku IN ({','.join('?' * len(skus))})",
+                skus
+            )
+            productos = {r["sku"]: r for r in cursor.fetchall()}
+        disponible = {sku: r["stock"] for sku, r in productos.items()}
+
+        detalles, descuentos = [], {}
+        for sku, cantidad, precio_unitario in items:
+            producto_row = productos.get(sku)
+            if not producto_row:
+                logger.warning("SKU %s no encontrado en DB (orden %s)", sku, order_id)
+                continue
+
+            stock_actual = disponible[sku]
+            if stock_actual is not None and stock_actual < cantidad:
+                logger.warning(
+                    "Stock insuficiente para SKU %s: tiene %s, necesita %s",
+                    sku, stock_actual, cantidad
+                )
+                continue
+            if stock_actual is not None:
+                disponible[sku] = stock_actual - cantidad
+
+            producto_id = producto_row["id"]
+            # subtotal = total en las ventas de TN: el neto es el renglón entero
+            detalles.append((venta_id, producto_id, cantidad, precio_unitario,
+                             producto_row["costo"], cantidad * precio_unitario))
+            descuentos[producto_id] = descuentos.get(producto_id, 0) + cantidad
+
+        cursor.executemany("""
+            INSERT INTO detalle_venta (venta_id, producto_id, cantidad, precio_unitario,
+                                       costo_unitario, neto)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, detalles)
+        cursor.executemany(
+            "UPDATE productos SET stock = stock - ? WHERE id = ?",
+            [(cantidad, producto_id) for producto_id, cantidad in descuentos.items()]
+        )
+
+        # Registrar ingreso en caja (misma transacción)
+        from services.caja_service import registrar_movimiento_en_conn
+        registrar_movimiento_en_conn(
+            conn, 'ingreso', 'venta', venta_id,
+            f"Venta Tienda Nube #{order_id}",
+            total, 'Tienda Nube'
+        )
+        agregados_service.refrescar_ventas_en_conn(conn, fecha)
+
+        conn.commit()
+        dashboard_service.venta_registrada(venta_id, fecha, total, cliente_id)
+        logger.info("Orden %s procesada correctamente", order_id)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def aplicar_evento(order_id, evento):
+    """Aplica un evento de webhook. Lanza _Reintentar si hay que volver a probar."""
+    if evento == "order/cancelled":
+        _cancelar_venta_por_orden(order_id)
+        return
+
+    order = _fetch_order(order_id)
+    if not order:
+        raise _Reintentar("no se pudo obtener la orden")
+
+    if evento == "order/updated":
+        # Verificar si la orden quedó cancelada
+        status         = order.get("status", "")
+        payment_status = order.get("payment_status", "")
+        if status == "cancelled" or payment_status in ("refunded", "voided"):
+            logger.info(
+                "Orden %s figura cancelada en TN (status=%s, payment=%s), procesando",
+                order_id, status, payment_status
+            )
+            _cancelar_venta_por_orden(order_id)
+        return
+
+    if evento == "order/paid":
+        _registrar_venta_por_orden(order_id, order)
+
+
+# ── Cola de eventos ──────────────────────────────────────────────────────────
+
+def encolar_evento(order_id, evento):
+    """Guarda el evento (deduplicado por order_id + evento).
+
+    Un evento repetido no se vuelve a encolar, salvo que el anterior haya
+    fallado o sea un order/updated/cancelled ya procesado (la orden pudo
+    cambiar de nuevo). Si ese anterior se está procesando se marca
+    pendiente_otra_vez y el worker lo vuelve a encolar al terminar. Una orden
+    pagada se registra una sola vez.
+    """
+    ahora = _ahora()
+    conn = get_conn()
+    try:
+        conn.execute("""
+            INSERT INTO tn_webhook_eventos (order_id, evento, proximo_intento, recibido_en)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(order_id, evento) DO UPDATE SET
+                estado = 'pendiente', intentos = 0, ultimo_error = NULL,
+                proximo_intento = excluded.proximo_intento,
+                recibido_en     = excluded.recibido_en
+            WHERE tn_webhook_eventos.estado = 'fallido'
+               OR (tn_webhook_eventos.estado = 'procesado'
+                   AND tn_webhook_eventos.evento != 'order/paid')
+        """, (str(order_id), evento, ahora, ahora))
+        conn.execute("""
+            UPDATE tn_webhook_eventos SET pendiente_otra_vez = 1, recibido_en = ?
+            WHERE order_id = ? AND evento = ? AND evento != 'order/paid'
+              AND estado = 'procesando'
+        """, (ahora, str(order_id), evento))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _tomar_evento():
+    """Marca como 'procesando' el próximo evento listo y lo devuelve (o None).
+
+    Los eventos de una misma orden se procesan de a uno y en orden de llegada.
+    """
+    conn = get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        ahora = _ahora()
+        limite = (datetime.now() - timedelta(minutes=PROCESANDO_VENCIDO_MIN)).strftime('%Y-%m-%d %H:%M:%S')
+        conn.execute(
+            "UPDATE tn_webhook_eventos SET estado = 'pendiente', pendiente_otra_vez = 0"
+            " WHERE estado = 'procesando' AND procesado_en < ?", (limite,)
+        )
+        ev = conn.execute("""
+            SELECT id, order_id, evento, intentos FROM tn_webhook_eventos e
+            WHERE estado = 'pendiente' AND proximo_intento <= ?
+              AND NOT EXISTS (SELECT 1 FROM tn_webhook_eventos e2
+                              WHERE e2.order_id = e.order_id AND e2.id < e.id
+                                AND e2.estado IN ('pendiente', 'procesando'))
+            ORDER BY id LIMIT 1
+        """, (ahora,)).fetchone()
+        if ev:
+            conn.execute(
+                "UPDATE tn_webhook_eventos SET estado = 'procesando', procesado_en = ? WHERE id = ?",
+                (ahora, ev['id'])
+            )
+        conn.commit()
+        return ev
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _registrar_resultado(ev, error=None):
+    """Cierra el evento. Si mientras tanto llegó otro igual (pendiente_otra_vez)
+    queda pendiente para ya, con los intentos en cero."""
+    ahora = _ahora()
+    conn = get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        otra_vez = conn.execute(
+            "SELECT pendiente_otra_vez FROM tn_webhook_eventos WHERE id = ?", (ev['id'],)
+        ).fetchone()
+        if otra_vez and otra_vez['pendiente_otra_vez']:
+            logger.info("Webhook TN: %s de la orden %s llegó de nuevo mientras se procesaba",
+                        ev['evento'], ev['order_id'])
+            conn.execute(
+                "UPDATE tn_webhook_eventos SET estado = 'pendiente', pendiente_otra_vez = 0,"
+                " intentos = 0, ultimo_error = NULL, proximo_intento = ?, procesado_en = ?"
+                " WHERE id = ?", (ahora, ahora, ev['id'])
+            )
+        elif error is None:
+            conn.execute(
+                "UPDATE tn_webhook_eventos SET estado = 'procesado', procesado_en = ?,"
+                " ultimo_error = NULL WHERE id = ?", (ahora, ev['id'])
+            )
+        else:
+            intentos = ev['intentos'] + 1
+            if intentos >= MAX_INTENTOS:
+                logger.error("Webhook TN: %s de la orden %s descartado tras %s intentos: %s",
+                             ev['evento'], ev['order_id'], intentos, error)
+                estado, proximo = 'fallido', ahora
+            else:
+                estado = 'pendiente'
+                proximo = (datetime.now() + timedelta(seconds=_backoff(intentos))).strftime('%Y-%m-%d %H:%M:%S')
+            conn.execute(
+                "UPDATE tn_webhook_eventos SET estado = ?, intentos = ?, ultimo_error = ?,"
+                " proximo_intento = ? WHERE id = ?",
+                (estado, intentos, str(error)[:500], proximo, ev['id'])
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def procesar_evento_tn():
+    """Toma y aplica un evento de la cola. Devuelve False si no había ninguno listo."""
+    ev = _tomar_evento()
+    if ev is None:
+        return False
+    try:
+        aplicar_evento(ev['order_id'], ev['evento'])
+    except _Reintentar as e:
+        _registrar_resultado(ev, e)
+    except Exception as e:
+        logger.exception("Error procesando webhook %s para orden %s", ev['evento'], ev['order_id'])
+        _registrar_resultado(ev, e)
+    else:
+        _registrar_resultado(ev)
+    return True
+
+
+# ── Pool de workers ──────────────────────────────────────────────────────────
+
+_despertar = threading.Condition()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def notificar_webhooks_tn():
+    """Despierta a los workers (llamar después de encolar)."""
+    with _despertar:
+        _despertar.notify_all()
+
+
+def _loop_worker():
+    while True:
+        with _despertar:
+            _despertar.wait(INTERVALO_SEG)
+        try:
+            while procesar_evento_tn():
+                pass
+        except Exception:
+            logger.exception("Webhook TN: error en el worker")
+
+
+def iniciar_workers_webhook_tn(cantidad=2):
+    """Arranca (una vez por proceso) los hilos que procesan los webhooks."""
+    with _workers_lock:
+        vivos = [w for w in _workers if w.is_alive()]
+        for i in range(len(vivos), cantidad):
+            w = threading.Thread(target=_loop_worker, name=f'tn-webhook-{i}', daemon=True)
+            w.start()
+            vivos.append(w)
+        _workers[:] = vivos
+        return vivos
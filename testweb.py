@@ -1,19 +1,6 @@
 # listar_webhooks.py - verificar qué webhooks están registrados en TN
-import os
-import requests
-from dotenv import load_dotenv
+from services import tn_client
 
-load_dotenv()
-
-TOKEN    = os.getenv("TN_ACCESS_TOKEN")
-STORE_ID = os.getenv("TN_STORE_ID")
-
-headers = {
-    "Authentication": f"bearer {TOKEN}",
-    "User-Agent": "Comenda App (mateopatatian@gmail.com)",
-    "Content-Type": "application/json"
-}
-
-r = requests.get(f"https://api.tiendanube.com/v1/{STORE_ID}/webhooks", headers=headers)
+r = tn_client.get("webhooks", endpoint="webhooks")
 print(f"Status: {r.status_code}")
-print(f"Webhooks registrados: {r.json()}")
\ No newline at end of file
+print(f"Webhooks registrados: {r.json()}")
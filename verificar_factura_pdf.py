@@ -0,0 +1,85 @@
+# verificar_factura_pdf.py
+# Uso: python verificar_factura_pdf.py
+#
+# Arma el PDF de una factura encolada con los mismos datos que usa el worker
+# de facturación (_cargar_ventas) sobre una base temporal, sin llamar a AFIP
+# ni escribir en static/facturas. Termina con código 1 si no se puede
+# renderizar. No toca negocio.db.
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import db
+
+
+def _venta_de_prueba():
+    """Crea una venta con dos renglones, la encola y devuelve su id."""
+    from services import facturacion_service
+
+    conn = db.get_conn()
+    try:
+        cur = conn.execute(
+            "INSERT INTO clientes (nombre, condicion_iva, cuit) VALUES ('Cliente Prueba', 'responsable_inscripto', '20-11111111-2')"
+        )
+        cliente_id = cur.lastrowid
+        productos = [
+            conn.execute("INSERT INTO productos (sku, descripcion, precio, stock) VALUES (?, ?, ?, 10)",
+                         (sku, desc, precio)).lastrowid
+            for sku, desc, precio in [('VFP-1', 'Producto uno', 1000.0), ('VFP-2', 'Producto dos', 250.5)]
+        ]
+        venta_id = conn.execute(
+            "INSERT INTO ventas (fecha, cliente_id, total, metodo_pago) VALUES ('2026-03-10 10:00:00', ?, 1501.0, 'Efectivo')",
+            (cliente_id,)
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO detalle_venta (venta_id, producto_id, cantidad, precio_unitario) VALUES (?, ?, ?, ?)",
+            [(venta_id, productos[0], 1, 1000.0), (venta_id, productos[1], 2, 250.5)]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    facturacion_service.encolar_factura(venta_id)
+    return venta_id
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__).parse_args()
+
+    from models import init_db
+
+    tmp_dir = tempfile.mkdtemp(prefix='factura_pdf_')
+    try:
+        db.configurar(os.path.join(tmp_dir, 'factura_pdf.db'))
+        init_db()
+
+        from services import facturacion_service
+        from services.afip_service import _render_pdf_factura
+
+        venta_id = _venta_de_prueba()
+        _, filas = facturacion_service._tomar_lote(facturacion_service.LOTE)
+        ventas, clientes, productos = facturacion_service._cargar_ventas([f['venta_id'] for f in filas])
+        assert [v['id'] for v in ventas] == [venta_id], "la venta encolada no se tomó"
+
+        venta = ventas[0]
+        factura = {
+            'tipo': 'A', 'numero': 1, 'cae': '00000000000000', 'cae_vto': '2026-03-20',
+            'fecha': '2026-03-10 10:00:00', 'cbte_tipo': 1, 'punto_venta': 1,
+            'imp_neto': 1240.5, 'imp_iva': 260.5,
+        }
+        contenido = _render_pdf_factura(venta_id, venta, clientes[venta['cliente_id']],
+                                        productos.get(venta_id, []), factura)
+        if not contenido.startswith(b'%PDF'):
+            print("FALLA: el resultado no es un PDF")
+            return 1
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"PDF de factura encolada ok: {len(productos[venta_id])} renglones, {len(contenido)} bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# verificar_planes.py
+# Uso: python verificar_planes.py [-v]
+#
+# Corre los reportes por período sobre una base temporal y pide a SQLite el
+# plan (EXPLAIN QUERY PLAN) de cada consulta que filtra por fecha. Termina con
+# código 1 si alguna recorre entera (SCAN) una tabla grande: un strftime() o
+# LIKE sobre la fecha, o un índice que falta. No toca negocio.db.
+
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+import db
+
+# Tablas que crecen con el uso; las chicas (clientes, categorías) pueden recorrerse
+TABLAS_GRANDES = {'ventas', 'detalle_venta', 'gastos', 'importacion_pagos', 'movimientos_caja',
+                  'agg_ventas_diarias', 'agg_cogs_diario', 'agg_gastos_diarios'}
+
+_PALABRAS = {'WHERE', 'JOIN', 'LEFT', 'INNER', 'CROSS', 'ON', 'GROUP', 'ORDER', 'LIMIT', 'USING'}
+_TABLA_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.I)
+_WHERE = re.compile(r'\bWHERE\b(.*?)(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|$)', re.I | re.S)
+
+
+def _reportes():
+    """(nombre, función) de cada reporte a revisar. Se importan después de
+    db.configurar() para que no abran la base real."""
+    from services import (dashboard_service, facturacion_service, facturas_export_service,
+                          gastos_service, importaciones_service, rentabilidad_service,
+                          resumen_service)
+
+    return [
+        ('inicio',                 dashboard_service.kpis_ventas),
+        ('resumen mes',            lambda: resumen_service.get_resumen_mes(2026, 3)),
+        ('resumen 12 meses',       lambda: resumen_service.get_evolucion_12meses(2026, 3)),
+        ('rentabilidad',           lambda: rentabilidad_service.get_rentabilidad('2026-03-01', '2026-03-31')),
+        ('rentabilidad TN',        lambda: rentabilidad_service.get_rentabilidad('2026-03-01', '2026-03-31',
+                                                                                'tiendanube')),
+        ('margen 12 meses',        lambda: rentabilidad_service.get_evolucion_margen_12meses(2026, 3)),
+        ('margen 12 meses TN',     lambda: rentabilidad_service.get_evolucion_margen_12meses(2026, 3,
+                                                                                            'tiendanube')),
+        ('gastos por categoría',   lambda: gastos_service.get_totales_por_categoria('2026-03-01', '2026-03-31')),
+        ('gastos del mes',         lambda: gastos_service.get_total_mes(2026, 3)),
+        ('importaciones',          importaciones_service.get_dashboard_data),
+        ('sin facturar',           lambda: facturacion_service.contar_sin_facturar('2026-03-01', '2026-03-31')),
+        ('ZIP de comprobantes',    lambda: facturas_export_service.comprobantes_en_rango('2026-03-01',
+                                                                                         '2026-03-31')),
+        ('reporte excel',          _reporte_excel),
+    ]
+
+
+def _reporte_excel():
+    from app import create_app
+
+    client = create_app().test_client()
+    with client.session_transaction() as sess:
+        sess['user_id']   = 1
+        sess['username']  = 'verificar'
+        sess['rol_nivel'] = 1
+        sess['permisos']  = []
+    resp = client.get('/reporte/excel')
+    assert resp.status_code == 200, resp.status_code
+
+
+def _filtra_por_fecha(sql):
+    where = _WHERE.search(sql)
+    return bool(where and re.search(r'fecha|\bdia\b', where.group(1), re.I))
+
+
+def _recorridos(conn, sql):
+    """Tablas grandes que el plan recorre enteras."""
+    alias = {}
+    for tabla, nombre in _TABLA_ALIAS.findall(sql):
+        alias[tabla.lower()] = tabla.lower()
+        if nombre and nombre.upper() not in _PALABRAS:
+            alias[nombre.lower()] = tabla.lower()
+    recorridas = []
+    for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+        partes = fila[3].split()
+        if partes[0] == 'SCAN' and alias.get(partes[1].lower(), partes[1].lower()) in TABLAS_GRANDES:
+            recorridas.append(fila[3])
+    return recorridas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-v', '--verbose', action='store_true', help="muestra cada consulta revisada")
+    args = parser.parse_args()
+
+    from models import init_db
+
+    tmp_dir = tempfile.mkdtemp(prefix='planes_')
+    try:
+        db.configurar(os.path.join(tmp_dir, 'planes.db'))
+        init_db()
+
+        consultas = []
+        configurar_original = db._configurar_conexion
+
+        def _con_traza(conn):
+            configurar_original(conn)
+            conn.set_trace_callback(consultas.append)
+
+        db._configurar_conexion = _con_traza
+        db.configurar(os.path.join(tmp_dir, 'planes.db'))  # descarta conexiones sin traza
+
+        from services import reportes_cache
+        reportes_cache.CACHE_ACTIVO = False  # cada reporte tiene que llegar a la base
+
+        conn = sqlite3.connect(os.path.join(tmp_dir, 'planes.db'))
+        fallas = revisadas = 0
+        for nombre, reporte in _reportes():
+            del consultas[:]
+            reporte()
+            for sql in consultas:
+                if not sql.lstrip().upper().startswith('SELECT') or not _filtra_por_fecha(sql):
+                    continue
+                revisadas += 1
+                recorridas = _recorridos(conn, sql)
+                if recorridas:
+                    fallas += 1
+                    print(f"FALLA {nombre}: {'; '.join(recorridas)}\n{sql.strip()}\n")
+                elif args.verbose:
+                    print(f"ok    {nombre}: {' '.join(sql.split())[:100]}")
+        conn.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"{revisadas} consultas por período revisadas, {fallas} con SCAN sobre tablas grandes")
+    return 1 if fallas or not revisadas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())